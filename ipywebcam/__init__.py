@@ -7,6 +7,11 @@
 from .webcam import WebCamWidget
 from .recorder import WebCamRecorder, Record, RecordFactory, FileListFactory, SingleFileFactory, TrackStrategy, RecordPlayer, Nothing, NOTHING
 from .common import ContextHelper
+from .executors import TransformerProcessPool, TransformerThreadPool
+from .remote import RemoteTransformer, RemoteWorker
+from .graph import TransformerGraph, GraphNode
+from .overlay import Overlay
+from .viewer import WebCamViewer
 from ._version import __version__, version_info
 
 def _jupyter_labextension_paths():
@@ -1,11 +1,15 @@
 from __future__ import annotations
 
+import asyncio
 import bisect
 import os
 import sys
+import traceback
+from contextvars import ContextVar
 from logging import Logger
 from os import path
-from typing import TYPE_CHECKING, Any, Callable, TypeVar, cast
+from threading import Lock
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, TypeVar, cast
 
 from av import AudioFrame, VideoFrame
 
@@ -17,6 +21,8 @@ from traitlets import Unicode
 
 from ._frontend import module_name, module_version
 from .easyqueue import EasyQueue
+from .frames import FrameConversionCache
+from .overlay import Overlay
 
 
 def normpath(p: str) -> str:
@@ -48,6 +54,16 @@ def bin_search(seq: list[V], target_key: SupportsRichComparisonT, key_func: Call
     else:
         return -1
 
+# the loop only keeps a weak reference to the tasks, so the ones nobody awaits are kept here until they finish
+_background_tasks: set[asyncio.Future] = set()
+
+def run_in_background(coro: Awaitable[Any]) -> asyncio.Future:
+    """Schedule the coroutine on the running loop, and keep its task alive until it finishes."""
+    task = asyncio.ensure_future(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
 Answer = Callable[[str, str, dict], None]
 
 class BaseWidget(Widget):
@@ -102,43 +118,102 @@ class BaseWidget(Widget):
             self.log_info(f'Unhandled custom message: {content}')
             
             
-class OutputStdoutStream:
-    output: Output
+# the sinks of the output contexts entered by the current task, inherited by the tasks and the pool threads it starts
+_output_sinks: ContextVar[tuple[Any, ...]] = ContextVar('ipywebcam_output_sinks', default=())
+
+
+class CaptureStream:
+    """Installed as sys.stdout or sys.stderr while any output context is entered.
     
-    def __init__(self, output: Output) -> None:
-        self.output = output
+    The texts written by a task in an output context go to the sink of its innermost context, and the others to the original stream.
+    """
+    name: str
+    original: Any
+    
+    def __init__(self, name: str, original: Any) -> None:
+        self.name = name
+        self.original = original
         
     def write(self, text: Any):
-        self.output.append_stdout(text)
-        
-    def flush(*args, **kargs):
-        pass
+        sinks = _output_sinks.get()
+        if not sinks:
+            return self.original.write(text)
+        sinks[-1].write(self.name, str(text))
         
-class OutputStderrStream:
-    output: Output
+    def flush(self) -> None:
+        if not _output_sinks.get():
+            self.original.flush()
+            
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.original, name)
+
+
+class StreamCapture:
+    """Swap sys.stdout and sys.stderr once for all the output contexts.
     
-    def __init__(self, output: Output) -> None:
-        self.output = output
+    The contexts of the concurrent posters and pipeline stages are entered and exited in any order, so a context can not restore
+    the streams it replaced. The streams are replaced by the first context and restored by the last one instead.
+    Used as a context, it only routes the texts of the task to sink. Unlike the context of the Output widget, it can stay entered for long.
+    """
+    _lock = Lock()
+    _depth = 0
+    _stdout: Any = None
+    _stderr: Any = None
+    sink: Any
+    
+    def __init__(self, sink: Any) -> None:
+        self.sink = sink
         
-    def write(self, text: Any):
-        self.output.append_stderr(text)
+    def __enter__(self):
+        StreamCapture.enter(self.sink)
+        return None
+    
+    async def __aenter__(self):
+        return self.__enter__()
+    
+    def __exit__(self, type, value, traceback):
+        StreamCapture.exit()
         
-    def flush(*args, **kargs):
-        pass
+    async def __aexit__(self, type, value, traceback):
+        return self.__exit__(type, value, traceback)
+    
+    @classmethod
+    def enter(cls, sink: Any) -> None:
+        _output_sinks.set(_output_sinks.get() + (sink,))
+        with cls._lock:
+            if cls._depth == 0:
+                cls._stdout = sys.stdout
+                sys.stdout = CaptureStream("stdout", cls._stdout)
+                cls._stderr = sys.stderr
+                sys.stderr = CaptureStream("stderr", cls._stderr)
+            cls._depth += 1
+            
+    @classmethod
+    def exit(cls) -> None:
+        _output_sinks.set(_output_sinks.get()[:-1])
+        with cls._lock:
+            cls._depth -= 1
+            if cls._depth == 0:
+                sys.stdout = cls._stdout
+                cls._stdout = None
+                sys.stderr = cls._stderr
+                cls._stderr = None
+
             
 class OutputContextManager:
     output: Output
-    stdout: Any
-    stderr: Any
     
     def __init__(self, output: Output) -> None:
         self.output = output
         
+    def write(self, name: str, text: str) -> None:
+        if name == "stdout":
+            self.output.append_stdout(text)
+        else:
+            self.output.append_stderr(text)
+        
     def __enter__(self):
-        self.stdout = sys.stdout
-        sys.stdout = OutputStdoutStream(self.output)
-        self.stderr = sys.stderr
-        sys.stderr = OutputStderrStream(self.output)
+        StreamCapture.enter(self)
         self.output.__enter__()
         return None
         
@@ -147,18 +222,97 @@ class OutputContextManager:
     
     def __exit__(self, type, value, traceback):
         self.output.__exit__(type, value, traceback)
-        sys.stdout = self.stdout
-        self.stdout = None
-        sys.stderr = self.stderr
-        self.stderr = None
+        StreamCapture.exit()
         
     async def __aexit__(self, type, value, traceback):
         return self.__exit__(type, value, traceback)
             
+class BufferedOutput:
+    """Capture the stdout and stderr into a bounded ring buffer and append them to the output widget at a fixed rate.
+    
+    Entering the context only routes the stdout and stderr of the task to the buffer, so nothing is sent to the frontend for the frames printing nothing.
+    When the buffer is full, the oldest texts are dropped and counted in dropped.
+    """
+    output: Output
+    interval: float
+    dropped: int
+    
+    def __init__(self, output: Output, maxsize: int = 256, interval: float = 0.5) -> None:
+        self.output = output
+        self.interval = interval
+        self.dropped = 0
+        self._buffer: EasyQueue[tuple[str, str]] = EasyQueue(maxsize=maxsize)
+        self._lock = Lock()
+        self._depth = 0
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._scheduled = False
+        
+    def write(self, name: str, text: str) -> None:
+        if not text:
+            return
+        with self._lock:
+            if self._buffer.put((name, text)) is not None:
+                self.dropped += 1
+            schedule = not self._scheduled
+            self._scheduled = True
+        if schedule:
+            loop = self._loop
+            if loop is None or loop.is_closed():
+                self.flush()
+            else:
+                # write may be called from the worker threads of the transformers
+                loop.call_soon_threadsafe(loop.call_later, self.interval, self.flush)
+                
+    def flush(self) -> None:
+        with self._lock:
+            items = self._buffer.list()
+            self._buffer = EasyQueue(maxsize=self._buffer.maxsize)
+            dropped, self.dropped = self.dropped, 0
+            self._scheduled = False
+        if dropped > 0:
+            self.output.append_stderr(f'[{dropped} outputs dropped]\n')
+        name: str | None = None
+        texts: list[str] = []
+        for item_name, text in items + [("", "")]:
+            if item_name != name:
+                if name == "stdout":
+                    self.output.append_stdout("".join(texts))
+                elif name == "stderr":
+                    self.output.append_stderr("".join(texts))
+                name = item_name
+                texts = []
+            texts.append(text)
+            
+    def __enter__(self):
+        if self._depth == 0:
+            try:
+                self._loop = asyncio.get_running_loop()
+            except RuntimeError:
+                self._loop = None
+        self._depth += 1
+        StreamCapture.enter(self)
+        return None
+    
+    async def __aenter__(self):
+        return self.__enter__()
+    
+    def __exit__(self, type, value, tb):
+        if type is not None and not issubclass(type, asyncio.CancelledError):
+            self.write("stderr", "".join(traceback.format_exception(type, value, tb)))
+        self._depth -= 1
+        StreamCapture.exit()
+            
+    async def __aexit__(self, type, value, tb):
+        return self.__exit__(type, value, tb)
+            
 class ContextHelper:
     context: dict
     KEY_MEET_TIME = '__meet_times'
     KEY_ORG_FRAME = '__org_frame'
+    KEY_FRAME_CACHE = '__frame_cache'
+    KEY_TRANSFORM_TRACK = '__transform_track'
+    # the overlay layer of the transformer, set when the callback gets a copy of its context
+    KEY_OVERLAY_LAYER = '__overlay_layer'
     KEY_LAST_TIME = '__last_time'
     KEY_LAST_TIME_TEMP = '__last_time_temp'
     KEY_LAST_FRAME = '__last_frame'
@@ -207,6 +361,28 @@ class ContextHelper:
     
     def get_org_frame(self) -> VideoFrame | AudioFrame:
         return self.context.get(self.KEY_ORG_FRAME)
+    
+    def get_frame_cache(self) -> FrameConversionCache:
+        cache = self.context.get(self.KEY_FRAME_CACHE)
+        if cache is None:
+            raise Exception('The frame conversion cache is only available for the video frames.')
+        return cache
+    
+    def get_org_ndarray(self, format: str = 'bgr24', width: int | None = None, height: int | None = None, roi: tuple[int, int, int, int] | None = None) -> Any:
+        """Get the original frame converted to a read only ndarray of the format and size.
+        The conversion is shared by all the transformers and posters of the same frame, so it is done only once per frame.
+        """
+        return self.get_frame_cache().get_ndarray(format=format, width=width, height=height, roi=roi)
+    
+    def get_overlay(self) -> Overlay:
+        """Get the overlay of the original frame for the current transformer.
+        The shapes added to it are drawn over the video by the frontend, so the frame does not need to be modified.
+        The overlay of a transformer is kept on the frames it skips because of every_n_frames and max_hz.
+        """
+        track = self.context.get(self.KEY_TRANSFORM_TRACK)
+        if track is None or track.kind != 'video':
+            raise Exception('The overlay is only available for the video frames.')
+        return track.get_overlay(self.get_org_frame(), self.context.get(self.KEY_OVERLAY_LAYER, id(self.context)))
         
     def is_first_time_meet(self) -> bool:
         return self.get_meet_times() == 1
@@ -0,0 +1,227 @@
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import functools
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing.context import BaseContext
+from multiprocessing.shared_memory import SharedMemory
+from typing import TYPE_CHECKING
+from typing import Any as AnyType
+from typing import Callable, TypeVar
+
+if TYPE_CHECKING:
+    import numpy as np
+
+R = TypeVar('R')
+
+class TransformerThreadPool:
+    """A bounded thread pool used to run the sync transformer callbacks out of the event loop.
+
+    NumPy and OpenCV release the GIL, so the heavy callbacks run in parallel and the event loop stays free for ICE, DTLS and RTCP.
+    At most ``max_pending`` calls are submitted to the threads at the same time, the others wait in the event loop.
+    """
+    max_workers: int
+    max_pending: int
+    pending: int
+    waiting: int
+    peak_queued: int
+    completed: int
+
+    def __init__(self, max_workers: int | None = None, max_pending: int | None = None) -> None:
+        self.max_workers = max_workers if max_workers is not None else min(4, os.cpu_count() or 1)
+        if self.max_workers <= 0:
+            raise ValueError('max_workers must be greater than 0')
+        self.max_pending = max_pending if max_pending is not None else self.max_workers * 2
+        if self.max_pending < self.max_workers:
+            raise ValueError('max_pending must be greater or equal than max_workers')
+        self.pending = 0
+        self.waiting = 0
+        self.peak_queued = 0
+        self.completed = 0
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='ipywebcam-transformer')
+        self._semaphore = asyncio.Semaphore(self.max_pending)
+
+    @property
+    def queued(self) -> int:
+        """The number of calls waiting for a free worker thread, including the ones waiting to be submitted."""
+        return max(0, self.pending - self.max_workers) + self.waiting
+
+    async def run(self, func: Callable[..., R], *args: AnyType) -> R:
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.pending += 1
+        self.peak_queued = max(self.peak_queued, self.queued)
+        try:
+            ctx = contextvars.copy_context()
+            call = functools.partial(ctx.run, func, *args)
+            return await asyncio.get_running_loop().run_in_executor(self._executor, call)
+        finally:
+            self.pending -= 1
+            self.completed += 1
+            self._semaphore.release()
+
+    def stats(self) -> dict[str, int]:
+        """Get a snapshot of the pool state, which can be used to size the pool.
+
+        Returns:
+            dict[str, int]: workers, max_pending, running, queued, peak_queued and completed
+        """
+        return {
+            "workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "running": min(self.pending, self.max_workers),
+            "queued": self.queued,
+            "peak_queued": self.peak_queued,
+            "completed": self.completed,
+        }
+
+    def reset_stats(self) -> None:
+        self.peak_queued = self.queued
+        self.completed = 0
+
+    def shutdown(self, wait: bool = False) -> None:
+        self._executor.shutdown(wait=wait)
+
+
+# the shared memory blocks attached by a worker process by slot. The workers only serve their pool, so a new name for a slot means
+# the parent grew the slot and unlinked the old block, whose mapping is closed at once instead of keeping the memory alive
+_attached: dict[int, SharedMemory] = {}
+
+def _attach(slot: int, name: str) -> SharedMemory:
+    shm = _attached.get(slot)
+    if shm is not None and shm.name == name:
+        return shm
+    if shm is not None:
+        try:
+            shm.close()
+        except BufferError:
+            # still viewed by a result being sent back, the mapping is closed when it is collected
+            pass
+    shm = _attached[slot] = SharedMemory(name=name)
+    return shm
+
+def _call_in_worker(func: Callable[..., AnyType], slot: int, name: str, shape: tuple[int, ...], dtype: str, args: tuple) -> tuple[bool, AnyType]:
+    import numpy as np
+    img = np.ndarray(shape, dtype=dtype, buffer=_attach(slot, name).buf)
+    try:
+        result = func(img, *args)
+        if result is None or result is img:
+            return True, None
+        if isinstance(result, np.ndarray) and result.shape == img.shape and result.dtype == img.dtype:
+            img[...] = result
+            return True, None
+        return False, result
+    finally:
+        del img
+
+
+class TransformerProcessPool:
+    """A pool of worker processes used to run the pure Python callbacks, which hold the GIL and do not scale with threads.
+    
+    The images are not pickled. Each call copies the image into a free slot of a preallocated ring of shared memory blocks,
+    the worker modifies the slot in place, and the slot is copied back. Only the callback, the slot name and the result are pickled,
+    so the callback must be picklable, i.e. defined in an importable module, or in the notebook before the pool starts with the fork start method.
+    A slot grows when a larger image arrives. There are ``slots`` slots, so at most ``slots`` calls are in flight.
+    """
+    max_workers: int
+    slots: int
+    pending: int
+    waiting: int
+    completed: int
+    
+    def __init__(self, max_workers: int | None = None, slots: int | None = None, mp_context: BaseContext | None = None) -> None:
+        self.max_workers = max_workers if max_workers is not None else max(1, (os.cpu_count() or 1) - 1)
+        if self.max_workers <= 0:
+            raise ValueError('max_workers must be greater than 0')
+        self.slots = slots if slots is not None else self.max_workers * 2
+        if self.slots < self.max_workers:
+            raise ValueError('slots must be greater or equal than max_workers')
+        self.pending = 0
+        self.waiting = 0
+        self.completed = 0
+        self._closed = False
+        self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=mp_context)
+        self._blocks: list[SharedMemory | None] = [None] * self.slots
+        self._free: asyncio.Queue[int] = asyncio.Queue()
+        for i in range(self.slots):
+            self._free.put_nowait(i)
+            
+    def _get_block(self, slot: int, size: int) -> SharedMemory:
+        if self._closed:
+            raise RuntimeError('The process pool is shut down.')
+        block = self._blocks[slot]
+        if block is None or block.size < size:
+            self._release_block(slot)
+            block = self._blocks[slot] = SharedMemory(create=True, size=max(size, 1))
+        return block
+    
+    async def run(self, func: Callable[..., AnyType], img: np.ndarray, *args: AnyType, out: np.ndarray | None = None) -> AnyType:
+        """Call func(shared_img, *args) in a worker process, where shared_img is a copy of img in the shared memory.
+
+        When func returns None or an ndarray of the same shape, the modified image is copied into out, or into img when out is None, and None is returned.
+        Otherwise the returned value is sent back by pickle and returned, and the image is not copied back.
+        """
+        import numpy as np
+        self.waiting += 1
+        try:
+            slot = await self._free.get()
+        finally:
+            self.waiting -= 1
+        self.pending += 1
+        try:
+            block = self._get_block(slot, img.nbytes)
+            shared = np.ndarray(img.shape, dtype=img.dtype, buffer=block.buf)
+            try:
+                np.copyto(shared, img)
+                call = functools.partial(_call_in_worker, func, slot, block.name, img.shape, img.dtype.str, args)
+                in_place, result = await asyncio.get_running_loop().run_in_executor(self._executor, call)
+                if in_place:
+                    np.copyto(out if out is not None else img, shared)
+                return result
+            finally:
+                del shared
+        finally:
+            self.pending -= 1
+            self.completed += 1
+            if self._closed:
+                self._release_block(slot)
+            self._free.put_nowait(slot)
+            
+    def _release_block(self, slot: int) -> None:
+        block = self._blocks[slot]
+        if block is not None:
+            block.close()
+            block.unlink()
+            self._blocks[slot] = None
+            
+    def stats(self) -> dict[str, int]:
+        """Get a snapshot of the pool state.
+
+        Returns:
+            dict[str, int]: workers, slots, running, queued and completed
+        """
+        return {
+            "workers": self.max_workers,
+            "slots": self.slots,
+            "running": min(self.pending, self.max_workers),
+            "queued": max(0, self.pending - self.max_workers) + self.waiting,
+            "completed": self.completed,
+        }
+        
+    def reset_stats(self) -> None:
+        self.completed = 0
+            
+    def shutdown(self, wait: bool = False) -> None:
+        self._closed = True
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+        for slot in range(self.slots):
+            try:
+                self._release_block(slot)
+            except BufferError:
+                # still used by a running call, released when the call returns
+                pass
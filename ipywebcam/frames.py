@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from threading import Lock
+from typing import TYPE_CHECKING
+
+from av import VideoFrame
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# the packed pixel formats whose only plane can be viewed as a (height, width, channels) array
+PACKED_FORMATS: dict[str, int] = {
+    'gray': 1,
+    'rgb24': 3,
+    'bgr24': 3,
+    'rgba': 4,
+    'bgra': 4,
+    'argb': 4,
+    'abgr': 4,
+}
+
+def check_packed_format(format: str) -> int:
+    channels = PACKED_FORMATS.get(format)
+    if channels is None:
+        raise ValueError(f'Unsupported format {format}, only the packed formats {", ".join(PACKED_FORMATS.keys())} are supported.')
+    return channels
+
+def ndarray_view(frame: VideoFrame) -> np.ndarray:
+    """Get a writable ndarray sharing the memory of the frame. Unlike frame.to_ndarray, nothing is copied.
+
+    Args:
+        frame (VideoFrame): a frame in one of the packed formats
+
+    Returns:
+        np.ndarray: an array of shape (height, width, channels), or (height, width) for gray frames
+    """
+    import numpy as np
+    channels = check_packed_format(frame.format.name)
+    plane = frame.planes[0]
+    if channels == 1:
+        return np.ndarray(shape=(frame.height, frame.width), dtype=np.uint8, buffer=plane, strides=(plane.line_size, 1))
+    else:
+        return np.ndarray(shape=(frame.height, frame.width, channels), dtype=np.uint8, buffer=plane, strides=(plane.line_size, channels, 1))
+
+class VideoFramePool:
+    """Reuse the frames of the same size and format across the frames of the pipeline.
+
+    The ownership is explicit. A frame handed out by acquire, or created by the pipeline and passed to adopt, is leased to the pipeline,
+    which may write it in place. release gives a frame nobody else references back to the pool, and disown forgets a frame
+    leaving the pipeline, so a frame still waiting in the relay or being encoded is never handed out or overwritten again.
+    At most maxlease frames are leased at the same time, the oldest leases are forgotten beyond that.
+    """
+    maxsize: int
+    maxlease: int
+    _frames: dict[tuple[int, int, str], list[VideoFrame]]
+    _leased: OrderedDict[int, VideoFrame]
+
+    def __init__(self, maxsize: int = 4, maxlease: int = 64) -> None:
+        self.maxsize = maxsize
+        self.maxlease = maxlease
+        self._frames = {}
+        self._leased = OrderedDict()
+        self._lock = Lock()
+
+    def _lease(self, frame: VideoFrame) -> None:
+        # the leased frames are referenced, so their ids are not reused by other frames
+        self._leased[id(frame)] = frame
+        while len(self._leased) > self.maxlease:
+            self._leased.popitem(last=False)
+
+    def acquire(self, width: int, height: int, format: str) -> VideoFrame:
+        """Get a frame leased to the caller, a released one of the same size and format if any, or a new one."""
+        with self._lock:
+            frames = self._frames.get((width, height, format))
+            frame = frames.pop() if frames else VideoFrame(width, height, format)
+            self._lease(frame)
+            return frame
+
+    def adopt(self, frame: VideoFrame) -> None:
+        """Lease a frame created by the pipeline, so it can be written in place and released like the acquired ones."""
+        with self._lock:
+            self._lease(frame)
+
+    def owns(self, frame: VideoFrame) -> bool:
+        """Whether the frame is leased to the pipeline, and can be written in place."""
+        with self._lock:
+            return self._leased.get(id(frame)) is frame
+
+    def release(self, frame: VideoFrame) -> None:
+        """Give the frame back to the pool. The caller must not use the frame any more, and nothing else may reference it."""
+        with self._lock:
+            if self._leased.get(id(frame)) is frame:
+                del self._leased[id(frame)]
+            frames = self._frames.setdefault((frame.width, frame.height, frame.format.name), [])
+            if len(frames) < self.maxsize and not any(f is frame for f in frames):
+                frames.append(frame)
+
+    def disown(self, frame: VideoFrame) -> None:
+        """Forget the frame leaving the pipeline. It is never handed out or written in place by the pipeline again."""
+        with self._lock:
+            if self._leased.get(id(frame)) is frame:
+                del self._leased[id(frame)]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._frames = {}
+            self._leased = OrderedDict()
+
+def copy_frame(frame: VideoFrame, pool: VideoFramePool | None = None) -> VideoFrame:
+    """Copy the pixels of the frame into a new frame, or a frame of the pool for the packed formats. pts and time_base are kept."""
+    if frame.format.name in PACKED_FORMATS:
+        out_frame = pool.acquire(frame.width, frame.height, frame.format.name) if pool is not None else VideoFrame(frame.width, frame.height, frame.format.name)
+        ndarray_view(out_frame)[...] = ndarray_view(frame)
+    else:
+        out_frame = VideoFrame.from_ndarray(frame.to_ndarray(), format=frame.format.name)
+    out_frame.pts = frame.pts
+    if frame.time_base is not None:
+        out_frame.time_base = frame.time_base
+    return out_frame
+
+ROI = tuple[int, int, int, int]
+
+class FrameConversionCache:
+    """Memoize the conversions of one original frame, shared by all the transformers and posters working on it.
+
+    The cache is reachable from the context by ContextHelper.get_frame_cache and is cleared once the frame has gone through the pipeline.
+    The cached frames and arrays are shared, so they must not be modified. The arrays are read only.
+    """
+    frame: VideoFrame
+    _frames: dict[tuple[str | None, int | None, int | None, ROI | None], VideoFrame]
+    _arrays: dict[tuple[str, int | None, int | None, ROI | None], np.ndarray]
+
+    def __init__(self, frame: VideoFrame) -> None:
+        self.frame = frame
+        self._frames = {}
+        self._arrays = {}
+        self._lock = Lock()
+
+    def _convert(self, format: str | None, width: int | None, height: int | None, roi: ROI | None) -> VideoFrame:
+        if roi is None:
+            if format is None and width is None and height is None:
+                return self.frame
+            return self.frame.reformat(width=width, height=height, format=format)
+        import numpy as np
+        format = format if format is not None else 'bgr24'
+        x, y, w, h = roi
+        cropped = np.ascontiguousarray(self._get_ndarray(format, None, None, None)[y:y + h, x:x + w])
+        frame = VideoFrame.from_ndarray(cropped, format=format)
+        if width is not None or height is not None:
+            frame = frame.reformat(width=width, height=height)
+        return frame
+
+    def _get_frame(self, format: str | None, width: int | None, height: int | None, roi: ROI | None) -> VideoFrame:
+        key = (format, width, height, roi)
+        frame = self._frames.get(key)
+        if frame is None:
+            frame = self._frames[key] = self._convert(format, width, height, roi)
+        return frame
+
+    def _get_ndarray(self, format: str, width: int | None, height: int | None, roi: ROI | None) -> np.ndarray:
+        key = (format, width, height, roi)
+        array = self._arrays.get(key)
+        if array is None:
+            array = self._get_frame(format, width, height, roi).to_ndarray(format=format)
+            array.flags.writeable = False
+            self._arrays[key] = array
+        return array
+
+    def get_frame(self, format: str | None = None, width: int | None = None, height: int | None = None, roi: ROI | None = None) -> VideoFrame:
+        """Get the original frame converted to the format and size.
+
+        Args:
+            format (str | None, optional): The target format. None means keep the format. Defaults to None.
+            width (int | None, optional): The target width. None means keep the width. Defaults to None.
+            height (int | None, optional): The target height. None means keep the height. Defaults to None.
+            roi (tuple[int, int, int, int] | None, optional): The region (x, y, width, height) of the original frame to crop before resizing. Only supported for packed formats. Defaults to None.
+
+        Returns:
+            VideoFrame: the converted frame, shared with the other transformers
+        """
+        if roi is not None:
+            check_packed_format(format if format is not None else 'bgr24')
+        with self._lock:
+            return self._get_frame(format, width, height, roi)
+
+    def get_ndarray(self, format: str = 'bgr24', width: int | None = None, height: int | None = None, roi: ROI | None = None) -> np.ndarray:
+        """The same as get_frame, but return a read only ndarray."""
+        if roi is not None:
+            check_packed_format(format)
+        with self._lock:
+            return self._get_ndarray(format, width, height, roi)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._frames = {}
+            self._arrays = {}
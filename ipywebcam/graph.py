@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import asyncio
+import inspect
+import time
+from dataclasses import dataclass, field
+from typing import Any as AnyType
+from typing import Callable
+
+from aiortc.contrib.media import MediaStreamTrack
+from av import VideoFrame
+
+from .common import ContextHelper
+from .executors import TransformerThreadPool
+from .frames import FrameConversionCache
+from .stats import CallStats
+from .webcam import MediaTransformer
+
+
+@dataclass
+class GraphNode:
+    name: str
+    callback: Callable[..., AnyType]
+    inputs: tuple[str, ...]
+    format: str | None
+    width: int | None
+    height: int | None
+    iscoroutinefunction: bool
+    stats: CallStats = field(default_factory=CallStats)
+
+
+def _passthrough(frame: VideoFrame) -> None:
+    return None
+
+
+class TransformerGraph(MediaTransformer[VideoFrame]):
+    """A video transformer running a small graph of analysis nodes on each frame, and joining their results into the display frame.
+
+    Each node declares the format and size of its input, so the nodes needing only a small image never touch the full resolution frame.
+    The conversions are shared with the other nodes and transformers by the frame cache. A node accept the read only converted image
+    followed by the results of its input nodes, and return its result. The nodes start as soon as their inputs are ready,
+    so independent branches run at the same time, the async ones in the event loop and the sync ones in the thread pool when the graph runs in thread.
+    The join callback accept the full resolution frame and the dict of the results of all the nodes, and return the display frame or None to keep it.
+    Like apply_result, the join runs on every frame, reusing the last results on the frames skipped by every_n_frames and max_hz.
+    """
+    nodes: dict[str, GraphNode]
+
+    def __init__(
+        self,
+        join: Callable[[VideoFrame, dict[str, AnyType]], VideoFrame | None] | None = None,
+        run_in_thread: bool | None = None,
+        every_n_frames: int | None = None,
+        max_hz: float | None = None,
+    ) -> None:
+        super().__init__(_passthrough, run_in_thread=run_in_thread, every_n_frames=every_n_frames, max_hz=max_hz, apply_result=join)
+        self.name = 'graph'
+        self.nodes = {}
+
+    def add_node(
+        self,
+        name: str,
+        callback: Callable[..., AnyType],
+        inputs: list[str] | tuple[str, ...] = (),
+        format: str | None = 'bgr24',
+        width: int | None = None,
+        height: int | None = None,
+    ) -> GraphNode:
+        """Add an analysis node.
+
+        Args:
+            name (str): The unique name of the node, which is also the key of its result passed to join.
+            callback (Callable[..., Any]): a callback accept the converted image and the results of the inputs in order, and return the result. Support sync and async function.
+            inputs (list[str], optional): The names of the nodes whose results are required. They must be added before. Defaults to ().
+            format (str | None, optional): The format of the image. A packed format gives a read only ndarray, None gives the frame itself. Defaults to 'bgr24'.
+            width (int | None, optional): Resize the image to the width. None means keep the width. Defaults to None.
+            height (int | None, optional): Resize the image to the height. None means keep the height. Defaults to None.
+
+        Returns:
+            GraphNode: the node
+        """
+        if name in self.nodes:
+            raise ValueError(f'The node {name} already exists.')
+        for input in inputs:
+            if input not in self.nodes:
+                raise ValueError(f'The input {input} of the node {name} does not exist, the inputs must be added before.')
+        node = GraphNode(
+            name=name,
+            callback=callback,
+            inputs=tuple(inputs),
+            format=format,
+            width=width,
+            height=height,
+            iscoroutinefunction=inspect.iscoroutinefunction(callback),
+        )
+        # the nodes are kept in a topological order, because the inputs are added before
+        self.nodes = { **self.nodes, name: node }
+        return node
+
+    def set_join(self, join: Callable[[VideoFrame, dict[str, AnyType]], VideoFrame | None] | None) -> None:
+        self.apply_result = join
+
+    async def _run_node(self, node: GraphNode, frame_cache: FrameConversionCache, inputs: list[asyncio.Future], pool: TransformerThreadPool | None) -> AnyType:
+        args = [await input for input in inputs]
+        if node.format is None:
+            img = frame_cache.get_frame(width=node.width, height=node.height)
+        else:
+            img = frame_cache.get_ndarray(format=node.format, width=node.width, height=node.height)
+        start = time.perf_counter()
+        try:
+            if node.iscoroutinefunction:
+                result = await node.callback(img, *args)
+            elif pool is not None:
+                result = await pool.run(node.callback, img, *args)
+            else:
+                result = node.callback(img, *args)
+        except Exception as e:
+            node.stats.record(time.perf_counter() - start, e)
+            raise
+        node.stats.record(time.perf_counter() - start)
+        return result
+
+    async def transform(self, frame: VideoFrame, track: MediaStreamTrack, pool: TransformerThreadPool | None = None) -> AnyType:
+        if not self.enabled:
+            return frame
+        frame_cache = self.call_context.get(ContextHelper.KEY_FRAME_CACHE)
+        if frame_cache is None or frame_cache.frame is not frame:
+            # the frame is changed by the former transformers, so the conversions of the original frame do not apply
+            frame_cache = FrameConversionCache(frame)
+        tasks: dict[str, asyncio.Future] = {}
+        for node in self.nodes.values():
+            tasks[node.name] = asyncio.ensure_future(self._run_node(node, frame_cache, [tasks[input] for input in node.inputs], pool))
+        try:
+            results = await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            raise
+        return dict(zip(tasks.keys(), results))
+
+    def node_stats(self) -> dict[str, dict[str, AnyType]]:
+        return { name: node.stats.snapshot() for name, node in self.nodes.items() }
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+from array import array
+from fractions import Fraction
+from typing import Any as AnyType
+from typing import Iterable
+
+# the clock of the rtp timestamps of the video, used by the frontend to match the overlays with the frames
+VIDEO_CLOCK_RATE = 90000
+
+
+class Overlay:
+    """The boxes, polylines and texts drawn by the frontend on a canvas over the video, instead of being burned into the frame.
+
+    The coordinates are in pixels of the frame of pts, and scaled by the frontend to the displayed size.
+    They are sent as float32 buffers, so thousands of points cost little. An overlay replaces the former one
+    from the frame of its pts, so an empty overlay clears the canvas.
+    """
+    pts: int | None
+    time_base: Fraction | None
+    width: int
+    height: int
+
+    def __init__(self, pts: int | None, time_base: Fraction | None, width: int, height: int) -> None:
+        self.pts = pts
+        self.time_base = time_base
+        self.width = width
+        self.height = height
+        self._boxes = array('f')
+        self._box_labels: list[str | None] = []
+        self._box_colors: list[str] = []
+        self._points = array('f')
+        self._polyline_lengths: list[int] = []
+        self._polyline_colors: list[str] = []
+        self._polyline_closed: list[bool] = []
+        self._texts: list[dict[str, AnyType]] = []
+
+    def add_box(self, x: float, y: float, w: float, h: float, label: str | None = None, color: str = '#00ff00') -> None:
+        self._boxes.extend((x, y, w, h))
+        self._box_labels.append(label)
+        self._box_colors.append(color)
+
+    def add_polyline(self, points: Iterable[tuple[float, float]], color: str = '#00ff00', closed: bool = False) -> None:
+        n = 0
+        for x, y in points:
+            self._points.extend((x, y))
+            n += 1
+        self._polyline_lengths.append(n)
+        self._polyline_colors.append(color)
+        self._polyline_closed.append(closed)
+
+    def add_text(self, x: float, y: float, text: str, color: str = '#00ff00') -> None:
+        self._texts.append({ "x": x, "y": y, "text": text, "color": color })
+
+    def extend(self, other: Overlay) -> None:
+        """Add the shapes of another overlay of the same frame size."""
+        self._boxes.extend(other._boxes)
+        self._box_labels.extend(other._box_labels)
+        self._box_colors.extend(other._box_colors)
+        self._points.extend(other._points)
+        self._polyline_lengths.extend(other._polyline_lengths)
+        self._polyline_colors.extend(other._polyline_colors)
+        self._polyline_closed.extend(other._polyline_closed)
+        self._texts.extend(other._texts)
+
+    def is_empty(self) -> bool:
+        return len(self._box_labels) == 0 and len(self._polyline_lengths) == 0 and len(self._texts) == 0
+
+    @property
+    def timestamp(self) -> int | None:
+        """The pts in the clock of the rtp timestamps, computed like the encoders of aiortc."""
+        if self.pts is None or self.time_base is None:
+            return None
+        return int(self.pts * self.time_base * VIDEO_CLOCK_RATE)
+
+    def encode(self) -> tuple[dict[str, AnyType], list[bytes]]:
+        """Get the message args and the buffers, the boxes (x, y, w, h) and the points (x, y) of all the polylines in float32."""
+        args = {
+            "timestamp": self.timestamp,
+            "width": self.width,
+            "height": self.height,
+            "boxes": { "labels": self._box_labels, "colors": self._box_colors },
+            "polylines": { "lengths": self._polyline_lengths, "colors": self._polyline_colors, "closed": self._polyline_closed },
+            "texts": self._texts,
+        }
+        return args, [self._boxes.tobytes(), self._points.tobytes()]
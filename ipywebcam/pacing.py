@@ -0,0 +1,69 @@
+from typing import Any as AnyType
+
+from .stats import LatencyHistogram
+
+
+class FramePacer:
+    """Schedule the frames at the cadence of their timestamps, so the bursts caused by the variable transformer latency are smoothed.
+
+    The first frame fixes the offset between the frame time and the clock, plus the delay budget. Each next frame is emitted
+    at its frame time plus the offset. A frame arriving after that point exceeded the budget and is dropped.
+    After max_late_frames drops in a row, or a jump of the timestamps, the offset is fixed again from the current frame.
+    The pacing error is the difference between the actual and the scheduled emit time.
+    """
+    delay: float
+    max_late_frames: int
+    max_gap: float
+    dropped: int
+    reanchors: int
+    error: LatencyHistogram
+
+    def __init__(self, delay: float = 0.1, max_late_frames: int = 5, max_gap: float = 1.0) -> None:
+        if delay < 0:
+            raise ValueError('delay must be greater or equal than 0')
+        self.delay = delay
+        self.max_late_frames = max_late_frames
+        self.max_gap = max_gap
+        self.error = LatencyHistogram()
+        self.reset()
+
+    def reset(self) -> None:
+        self.dropped = 0
+        self.reanchors = 0
+        self.error.reset()
+        self._offset: float | None = None
+        self._last_time: float | None = None
+        self._late = 0
+
+    def schedule(self, frame_time: float, now: float) -> float | None:
+        """Get the clock time to emit the frame at, or None to drop it."""
+        last_time = self._last_time
+        self._last_time = frame_time
+        if self._offset is None or last_time is None or not (0 <= frame_time - last_time <= self.max_gap):
+            if self._offset is not None:
+                self.reanchors += 1
+            self._offset = now + self.delay - frame_time
+            self._late = 0
+        target = frame_time + self._offset
+        if now > target:
+            self._late += 1
+            if self._late >= self.max_late_frames:
+                # the transformers are slower than the budget for a while, accept the latency instead of dropping everything
+                self.reanchors += 1
+                self._offset = now + self.delay - frame_time
+                self._late = 0
+                return now + self.delay
+            self.dropped += 1
+            return None
+        self._late = 0
+        return target
+
+    def record(self, target: float, emitted: float) -> None:
+        self.error.record(abs(emitted - target))
+
+    def snapshot(self) -> dict[str, AnyType]:
+        return {
+            "dropped": self.dropped,
+            "reanchors": self.reanchors,
+            "error": self.error.snapshot(),
+        }
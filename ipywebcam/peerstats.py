@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Any as AnyType
+from typing import Callable
+
+from aiortc import RTCPeerConnection
+
+from .easyqueue import EasyQueue
+
+logger = logging.getLogger("ipywebcam")
+
+# the clock rate of the rtp timestamps of the video, the unit of the jitter of the inbound stats
+VIDEO_CLOCK_RATE = 90000
+
+SAMPLE_FIELDS: tuple[str, ...] = (
+    "time",
+    # the camera stream received from the browser
+    "inbound_fps",
+    "inbound_bitrate",
+    "inbound_jitter",
+    "inbound_loss",
+    # the processed stream sent back to the browser
+    "outbound_fps",
+    "outbound_bitrate",
+    "rtt",
+    "encode_time",
+    # reported by the browser
+    "decode_time",
+    "client_encode_time",
+    "client_fps",
+)
+
+
+class PeerStatsRecorder:
+    """Poll the stats of a peer connection every interval seconds into a fixed size time series.
+
+    Each sample is a dict of SAMPLE_FIELDS, the rates and the mean times are computed over the interval, and a field is None
+    when its source is not available yet. The network fields come from getStats of the peer, the frame rates and the encode time
+    from the transformed and outbound tracks, and the decode time from the stats reported by the browser, see record_client.
+    """
+    interval: float
+    samples: EasyQueue[dict[str, AnyType]]
+    client: dict[str, AnyType]
+
+    def __init__(self, maxsize: int = 300, interval: float = 1.0) -> None:
+        self.interval = interval
+        self.samples = EasyQueue(maxsize=maxsize)
+        self.client = {}
+        self._last: dict[str, float] = {}
+        self._task: asyncio.Task | None = None
+
+    def start(self, pc: RTCPeerConnection, get_tracks: Callable[[], tuple[list[AnyType], list[AnyType]]]) -> None:
+        """Start polling. get_tracks returns the current transformed and outbound tracks of the peer."""
+        self.stop()
+        self._last = {}
+        self._task = asyncio.ensure_future(self._poll(pc, get_tracks))
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def record_client(self, stats: dict[str, AnyType]) -> None:
+        self.client = stats
+
+    def _rate(self, key: str, value: float | int | None, now: float) -> float | None:
+        """The change of a counter per second since the last poll."""
+        if value is None:
+            return None
+        last = self._last.get(key)
+        last_time = self._last.get("time")
+        self._last[key] = value
+        if last is None or last_time is None or now <= last_time:
+            return None
+        return (value - last) / (now - last_time)
+
+    async def _poll(self, pc: RTCPeerConnection, get_tracks: Callable[[], tuple[list[AnyType], list[AnyType]]]) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            if pc.connectionState == "closed":
+                return
+            try:
+                report = await pc.getStats()
+                self.samples.put(self.sample(report.values(), *get_tracks()))
+            except Exception as e:
+                logger.exception(e)
+
+    def sample(self, stats: AnyType, transformed: list[AnyType], outbound: list[AnyType], now: float | None = None) -> dict[str, AnyType]:
+        now = time.monotonic() if now is None else now
+        inbound = next((s for s in stats if s.type == "inbound-rtp" and s.kind == "video"), None)
+        sent = next((s for s in stats if s.type == "outbound-rtp" and s.kind == "video"), None)
+        remote = next((s for s in stats if s.type == "remote-inbound-rtp" and s.kind == "video"), None)
+        received_frames = sum(track.received_frames for track in transformed if track.kind == "video") if transformed else None
+        sent_frames = sum(track.sent_frames for track in outbound) if outbound else None
+        encoded_frames = sum(track.encoded_frames for track in outbound) if outbound else None
+        encode_seconds = sum(track.encode_seconds for track in outbound) if outbound else None
+        inbound_loss = None
+        if inbound is not None:
+            lost = self._rate("packets_lost", inbound.packetsLost, now)
+            received = self._rate("packets_received", inbound.packetsReceived, now)
+            if lost is not None and received is not None and lost + received > 0:
+                inbound_loss = max(0.0, lost / (lost + received))
+        outbound_bitrate = self._rate("bytes_sent", sent.bytesSent if sent is not None else None, now)
+        encoded = self._rate("encoded_frames", encoded_frames, now)
+        encode_time_rate = self._rate("encode_seconds", encode_seconds, now)
+        sample = {
+            "time": time.time(),
+            "inbound_fps": self._rate("received_frames", received_frames, now),
+            "inbound_bitrate": self.client.get("bitrate"),
+            "inbound_jitter": inbound.jitter / VIDEO_CLOCK_RATE if inbound is not None else None,
+            "inbound_loss": inbound_loss,
+            "outbound_fps": self._rate("sent_frames", sent_frames, now),
+            "outbound_bitrate": outbound_bitrate * 8 if outbound_bitrate is not None else None,
+            "rtt": remote.roundTripTime if remote is not None else None,
+            "encode_time": encode_time_rate / encoded if encoded and encode_time_rate is not None else None,
+            "decode_time": self.client.get("decode_time"),
+            "client_encode_time": self.client.get("encode_time"),
+            "client_fps": self.client.get("fps"),
+        }
+        self._last["time"] = now
+        return sample
+
+    def snapshot(self) -> list[dict[str, AnyType]]:
+        return self.samples.heads(len(self.samples))
@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any as AnyType
+
+from aiortc import RTCRtpSender
+from aiortc.rtp import RTCP_PSFB_APP, RtcpPsfbPacket, unpack_remb_fci
+
+logger = logging.getLogger("ipywebcam")
+
+# the private members of RTCRtpSender used to read the REMB, the supported versions of aiortc are pinned in pyproject.toml
+_RTCP_MEMBERS = ('_handle_rtcp_packet', '_ssrc')
+_missing_rtcp_logged = False
+
+def _has_rtcp_members(sender: RTCRtpSender) -> bool:
+    global _missing_rtcp_logged
+    missing = [name for name in _RTCP_MEMBERS if not hasattr(sender, name)]
+    if missing and not _missing_rtcp_logged:
+        _missing_rtcp_logged = True
+        logger.warning(f'RTCRtpSender has no {", ".join(missing)} in this version of aiortc, the quality is adapted without the REMB.')
+    return not missing
+
+
+@dataclass(frozen=True)
+class QualityLevel:
+    # divide the width and height by scale
+    scale: float
+    # None means the frame rate of the source
+    framerate: float | None
+    # the max bitrate in bits per second
+    bitrate: int
+
+
+DEFAULT_LEVELS: tuple[QualityLevel, ...] = (
+    QualityLevel(scale=1.0, framerate=None, bitrate=1500000),
+    QualityLevel(scale=1.0, framerate=None, bitrate=1000000),
+    QualityLevel(scale=1.5, framerate=None, bitrate=700000),
+    QualityLevel(scale=2.0, framerate=15, bitrate=450000),
+    QualityLevel(scale=3.0, framerate=10, bitrate=250000),
+)
+
+
+class QualityController:
+    """Adapt the quality of the video sent to a peer to the congestion signals of its receiver.
+
+    Every interval seconds, the controller reads the latest receiver report of the sender (the fraction lost and the round trip time),
+    the bitrate sent since the last report, and the last bitrate estimated by the receiver (REMB). The link is congested when the loss
+    or the rtt is too high, or when more is sent than the estimated bitrate, e.g. because the encoder does not go below its minimum bitrate. On congestion, it steps one level down the ladder of levels,
+    each one lowering the bitrate, then the resolution and the frame rate. After recover_after clean reports in a row,
+    it steps one level up. A level change is held for hold_reports reports, so its effect is measured before the next one.
+    The decisions are kept in a bounded log, see snapshot.
+    """
+    levels: tuple[QualityLevel, ...]
+    interval: float
+    max_loss: float
+    max_rtt: float
+    recover_loss: float
+    recover_rtt: float
+    recover_after: int
+    hold_reports: int
+    level: int
+    loss: float | None
+    rtt: float | None
+    remb: int | None
+    sent_bitrate: float | None
+
+    def __init__(
+        self,
+        levels: tuple[QualityLevel, ...] = DEFAULT_LEVELS,
+        interval: float = 1.0,
+        max_loss: float = 0.05,
+        max_rtt: float = 0.3,
+        recover_loss: float = 0.01,
+        recover_rtt: float = 0.15,
+        recover_after: int = 5,
+        hold_reports: int = 2,
+        max_decisions: int = 100,
+    ) -> None:
+        if len(levels) == 0:
+            raise ValueError('levels must not be empty')
+        self.levels = levels
+        self.interval = interval
+        self.max_loss = max_loss
+        self.max_rtt = max_rtt
+        self.recover_loss = recover_loss
+        self.recover_rtt = recover_rtt
+        self.recover_after = recover_after
+        self.hold_reports = hold_reports
+        self.level = 0
+        self.loss = None
+        self.rtt = None
+        self.remb = None
+        self.sent_bitrate = None
+        self.decisions: deque[dict[str, AnyType]] = deque(maxlen=max_decisions)
+        self._clean_reports = 0
+        self._hold = 0
+        self._last_report: AnyType = None
+        self._last_sent: tuple[float, int] | None = None
+        self._task: asyncio.Task | None = None
+
+    @property
+    def current(self) -> QualityLevel:
+        return self.levels[self.level]
+
+    def _congested(self, loss: float, rtt: float | None) -> str | None:
+        if loss > self.max_loss:
+            return f'loss {loss:.1%}'
+        if rtt is not None and rtt > self.max_rtt:
+            return f'rtt {rtt * 1000:.0f}ms'
+        if self.remb is not None and self.sent_bitrate is not None and self.sent_bitrate > self.remb * 1.2:
+            return f'sent {self.sent_bitrate:.0f}bps over remb {self.remb}'
+        return None
+
+    def _recovered(self, loss: float, rtt: float | None) -> bool:
+        if loss > self.recover_loss or (rtt is not None and rtt > self.recover_rtt):
+            return False
+        # the receiver must be able to take more than what is sent now
+        return self.remb is None or self.sent_bitrate is None or self.remb >= self.sent_bitrate * 1.5
+
+    def update(self, loss: float, rtt: float | None, sent_bitrate: float | None = None, now: float | None = None) -> dict[str, AnyType] | None:
+        """Handle a receiver report, and return the decision if the level changed."""
+        self.loss = loss
+        self.rtt = rtt
+        self.sent_bitrate = sent_bitrate
+        if self._hold > 0:
+            self._hold -= 1
+            return None
+        reason = self._congested(loss, rtt)
+        if reason is not None:
+            self._clean_reports = 0
+            if self.level < len(self.levels) - 1:
+                return self._change(self.level + 1, reason, now)
+            return None
+        if self.level > 0 and self._recovered(loss, rtt):
+            self._clean_reports += 1
+            if self._clean_reports >= self.recover_after:
+                self._clean_reports = 0
+                return self._change(self.level - 1, 'recovered', now)
+        else:
+            self._clean_reports = 0
+        return None
+
+    def _change(self, level: int, reason: str, now: float | None) -> dict[str, AnyType]:
+        decision = {
+            "time": time.time() if now is None else now,
+            "from": self.level,
+            "to": level,
+            "reason": reason,
+            "loss": self.loss,
+            "rtt": self.rtt,
+            "remb": self.remb,
+            "sent_bitrate": self.sent_bitrate,
+        }
+        self.level = level
+        self._hold = self.hold_reports
+        self.decisions.append(decision)
+        logger.info(f"Quality level {decision['from']} -> {level}: {reason}")
+        return decision
+
+    def attach(self, sender: RTCRtpSender) -> None:
+        """Record the REMB received by the sender, and start polling its stats.
+        The REMB is read from private members of RTCRtpSender. Without them, it is skipped, which is logged once,
+        and the level still follows the stats.
+        """
+        if _has_rtcp_members(sender):
+            self._record_remb(sender)
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._poll(sender))
+
+    def _record_remb(self, sender: RTCRtpSender) -> None:
+        handle_rtcp_packet = sender._handle_rtcp_packet
+        ssrc = sender._ssrc
+
+        async def _handle_rtcp_packet(packet) -> None:
+            if isinstance(packet, RtcpPsfbPacket) and packet.fmt == RTCP_PSFB_APP:
+                try:
+                    bitrate, ssrcs = unpack_remb_fci(packet.fci)
+                    if ssrc in ssrcs:
+                        self.remb = bitrate
+                except ValueError:
+                    pass
+            await handle_rtcp_packet(packet)
+
+        sender._handle_rtcp_packet = _handle_rtcp_packet # type: ignore
+
+    async def _poll(self, sender: RTCRtpSender) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                report = await sender.getStats()
+            except Exception as e:
+                logger.exception(e)
+                continue
+            remote = next((s for s in report.values() if s.type == 'remote-inbound-rtp'), None)
+            outbound = next((s for s in report.values() if s.type == 'outbound-rtp'), None)
+            sent_bitrate = None
+            if outbound is not None:
+                now = time.monotonic()
+                if self._last_sent is not None and now > self._last_sent[0]:
+                    sent_bitrate = (outbound.bytesSent - self._last_sent[1]) * 8 / (now - self._last_sent[0])
+                self._last_sent = (now, outbound.bytesSent)
+            if remote is None or remote is self._last_report:
+                # no new receiver report since the last poll
+                continue
+            self._last_report = remote
+            # fractionLost is the 8 bits fixed point fraction of the receiver report
+            self.update(remote.fractionLost / 256, remote.roundTripTime, sent_bitrate)
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def snapshot(self) -> dict[str, AnyType]:
+        level = self.current
+        return {
+            "level": self.level,
+            "scale": level.scale,
+            "framerate": level.framerate,
+            "bitrate": level.bitrate,
+            "loss": self.loss,
+            "rtt": self.rtt,
+            "remb": self.remb,
+            "sent_bitrate": self.sent_bitrate,
+            "decisions": list(self.decisions),
+        }
@@ -0,0 +1,339 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import importlib
+import inspect
+import json
+import logging
+import struct
+from fractions import Fraction
+from typing import TYPE_CHECKING
+from typing import Any as AnyType
+from typing import Callable
+
+import av
+from aiortc.contrib.media import MediaStreamTrack
+from av import VideoFrame
+
+from .executors import TransformerThreadPool
+from .frames import check_packed_format
+from .webcam import MediaTransformer
+
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger("ipywebcam")
+
+# A message is a 4 bytes big endian length of the json header, the json header, and header["size"] bytes of payload.
+# The request header contains id, encoding, format, width and height, the payload is the image.
+# The response header contains id and kind, one of frame, result, none and error. A frame response has the same fields and payload as a request.
+_LENGTH = struct.Struct('>I')
+ENCODINGS = ('raw', 'jpeg')
+
+async def read_message(reader: asyncio.StreamReader) -> tuple[dict[str, AnyType], bytes]:
+    (length,) = _LENGTH.unpack(await reader.readexactly(_LENGTH.size))
+    header = json.loads(await reader.readexactly(length))
+    size = header.get('size', 0)
+    payload = await reader.readexactly(size) if size > 0 else b''
+    return header, payload
+
+def write_message(writer: asyncio.StreamWriter, header: dict[str, AnyType], payload: bytes = b'') -> None:
+    header = { **header, 'size': len(payload) }
+    data = json.dumps(header).encode()
+    writer.write(_LENGTH.pack(len(data)))
+    writer.write(data)
+    if payload:
+        writer.write(payload)
+
+
+class FrameCodec:
+    """Convert the frames to the payloads of the protocol and back. The jpeg codecs are kept for each size."""
+    def __init__(self) -> None:
+        self._encoders: dict[tuple[int, int], av.CodecContext] = {}
+        self._decoder: av.CodecContext | None = None
+
+    def encode(self, frame: VideoFrame, encoding: str, format: str) -> tuple[dict[str, AnyType], bytes]:
+        if encoding == 'jpeg':
+            encoder = self._encoders.get((frame.width, frame.height))
+            if encoder is None:
+                encoder = av.CodecContext.create('mjpeg', 'w')
+                encoder.width = frame.width
+                encoder.height = frame.height
+                encoder.pix_fmt = 'yuvj420p'
+                encoder.time_base = Fraction(1, 30)
+                self._encoders[(frame.width, frame.height)] = encoder
+            payload = b''.join(bytes(packet) for packet in encoder.encode(frame.reformat(format='yuvj420p')))
+        elif encoding == 'raw':
+            payload = frame.to_ndarray(format=format).tobytes()
+        else:
+            raise ValueError(f'Unsupported encoding {encoding}, only {", ".join(ENCODINGS)} are supported.')
+        return { 'encoding': encoding, 'format': format, 'width': frame.width, 'height': frame.height }, payload
+
+    def decode_ndarray(self, header: dict[str, AnyType], payload: bytes) -> np.ndarray:
+        import numpy as np
+        format = header['format']
+        if header['encoding'] == 'jpeg':
+            if self._decoder is None:
+                self._decoder = av.CodecContext.create('mjpeg', 'r')
+            return self._decoder.decode(av.Packet(payload))[0].to_ndarray(format=format)
+        channels = check_packed_format(format)
+        shape = (header['height'], header['width']) if channels == 1 else (header['height'], header['width'], channels)
+        return np.frombuffer(payload, dtype=np.uint8).reshape(shape)
+
+    def decode(self, header: dict[str, AnyType], payload: bytes) -> VideoFrame:
+        return VideoFrame.from_ndarray(self.decode_ndarray(header, payload), format=header['format'])
+
+
+def _passthrough(frame: VideoFrame) -> VideoFrame:
+    return frame
+
+
+class RemoteTransformer(MediaTransformer[VideoFrame]):
+    """A video transformer sending the frames to a RemoteWorker and waiting for the returned frame or result.
+
+    The frames are sent as raw packed planes or as jpeg. When max_in_flight frames are already waiting, when the worker does not answer in timeout seconds
+    or when the connection is broken, the frame passes through unchanged, so a slow or dead worker never stalls the track.
+    A broken connection is retried after retry_interval seconds. A returned result is passed to apply_result with the frame.
+    """
+    host: str
+    port: int
+    encoding: str
+    format: str
+    max_in_flight: int
+    timeout: float
+    retry_interval: float
+    timeouts: int
+    overloaded: int
+    connection_errors: int
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        encoding: str = 'raw',
+        format: str = 'bgr24',
+        max_in_flight: int = 2,
+        timeout: float = 0.5,
+        retry_interval: float = 1.0,
+        apply_result: Callable[[VideoFrame, AnyType], VideoFrame | None] | None = None,
+    ) -> None:
+        super().__init__(_passthrough, apply_result=apply_result)
+        if encoding not in ENCODINGS:
+            raise ValueError(f'Unsupported encoding {encoding}, only {", ".join(ENCODINGS)} are supported.')
+        check_packed_format(format)
+        if max_in_flight <= 0:
+            raise ValueError('max_in_flight must be integer greater than 0')
+        self.name = f'remote {host}:{port}'
+        self.host = host
+        self.port = port
+        self.encoding = encoding
+        self.format = format
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.retry_interval = retry_interval
+        self.timeouts = 0
+        self.overloaded = 0
+        self.connection_errors = 0
+        self._codec = FrameCodec()
+        self._writer: asyncio.StreamWriter | None = None
+        self._reader_task: asyncio.Task | None = None
+        self._connecting: asyncio.Future | None = None
+        self._retry_at = 0.0
+        self._pending: dict[int, asyncio.Future[tuple[dict[str, AnyType], bytes]]] = {}
+        self._next_id = 0
+
+    async def _connect(self) -> asyncio.StreamWriter | None:
+        if self._writer is not None:
+            return self._writer
+        loop = asyncio.get_running_loop()
+        if self._connecting is None:
+            if loop.time() < self._retry_at:
+                return None
+            self._connecting = asyncio.ensure_future(asyncio.open_connection(self.host, self.port))
+        connecting = self._connecting
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.shield(connecting), self.timeout)
+        except asyncio.TimeoutError:
+            return None
+        except OSError as e:
+            if self._connecting is connecting:
+                self._connecting = None
+                self._retry_at = loop.time() + self.retry_interval
+                self.connection_errors += 1
+                logger.warning(f'Unable to connect to the remote worker {self.host}:{self.port}: {e}')
+            return None
+        if self._connecting is connecting:
+            self._connecting = None
+            self._writer = writer
+            self._reader_task = asyncio.create_task(self._read(reader))
+        return self._writer
+
+    async def _read(self, reader: asyncio.StreamReader) -> None:
+        try:
+            while True:
+                header, payload = await read_message(reader)
+                future = self._pending.pop(header.get('id', -1), None)
+                if future is not None and not future.done():
+                    future.set_result((header, payload))
+        except (asyncio.IncompleteReadError, OSError) as e:
+            logger.warning(f'The connection to the remote worker {self.host}:{self.port} is broken: {e!r}')
+        finally:
+            self._disconnect()
+
+    def _disconnect(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+            self.connection_errors += 1
+            self._retry_at = asyncio.get_running_loop().time() + self.retry_interval
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError('The connection to the remote worker is broken.'))
+        self._pending = {}
+
+    async def transform(self, frame: VideoFrame, track: MediaStreamTrack, pool: TransformerThreadPool | None = None) -> AnyType:
+        if not self.enabled:
+            return frame
+        if len(self._pending) >= self.max_in_flight:
+            self.overloaded += 1
+            return frame
+        writer = await self._connect()
+        if writer is None:
+            return frame
+        request_id = self._next_id
+        self._next_id += 1
+        header, payload = self._codec.encode(frame, self.encoding, self.format)
+        future: asyncio.Future[tuple[dict[str, AnyType], bytes]] = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            write_message(writer, { **header, 'id': request_id }, payload)
+            await writer.drain()
+            response, response_payload = await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            return frame
+        except OSError:
+            return frame
+        finally:
+            self._pending.pop(request_id, None)
+        kind = response.get('kind')
+        if kind == 'frame':
+            out_frame = self._codec.decode(response, response_payload)
+            out_frame.pts = frame.pts
+            out_frame.time_base = frame.time_base
+            return out_frame
+        elif kind == 'result':
+            return response.get('result')
+        elif kind == 'error':
+            raise RuntimeError(f'The remote worker {self.host}:{self.port} failed: {response.get("error")}')
+        return frame
+
+    def remote_stats(self) -> dict[str, int]:
+        return {
+            "in_flight": len(self._pending),
+            "timeouts": self.timeouts,
+            "overloaded": self.overloaded,
+            "connection_errors": self.connection_errors,
+        }
+
+    def close(self) -> None:
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            self._reader_task = None
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+class RemoteWorker:
+    """A worker service answering the requests of RemoteTransformer.
+
+    The callback accept the decoded ndarray and the request header, and return an ndarray sent back as the new frame,
+    None to keep the frame, or a json serializable result passed to apply_result on the kernel side. Support sync and async function.
+    The sync callback runs in a thread, so the requests of several connections are processed at the same time.
+    """
+    host: str
+    port: int
+
+    def __init__(self, callback: Callable[..., AnyType], host: str = '127.0.0.1', port: int = 0) -> None:
+        self.callback = callback
+        self.host = host
+        self.port = port
+        self.iscoroutinefunction = inspect.iscoroutinefunction(callback)
+        self._server: asyncio.AbstractServer | None = None
+
+    async def start(self) -> int:
+        """Start listening, and return the port, which is useful when port is 0."""
+        self._server = await asyncio.start_server(self._serve, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def serve_forever(self) -> None:
+        if self._server is None:
+            await self.start()
+        assert self._server is not None
+        await self._server.serve_forever()
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        codec = FrameCodec()
+        lock = asyncio.Lock()
+        tasks: set[asyncio.Task] = set()
+        try:
+            while True:
+                header, payload = await read_message(reader)
+                task = asyncio.create_task(self._handle(codec, header, payload, writer, lock))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (asyncio.IncompleteReadError, OSError):
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+            writer.close()
+
+    async def _handle(self, codec: FrameCodec, header: dict[str, AnyType], payload: bytes, writer: asyncio.StreamWriter, lock: asyncio.Lock) -> None:
+        response: dict[str, AnyType] = { 'id': header.get('id') }
+        response_payload = b''
+        try:
+            img = codec.decode_ndarray(header, payload)
+            if self.iscoroutinefunction:
+                result = await self.callback(img, header)
+            else:
+                result = await asyncio.to_thread(self.callback, img, header)
+            if result is None:
+                response['kind'] = 'none'
+            elif hasattr(result, 'shape') and hasattr(result, 'dtype'):
+                frame_header, response_payload = codec.encode(VideoFrame.from_ndarray(result, format=header['format']), header['encoding'], header['format'])
+                response.update(frame_header, kind='frame')
+            else:
+                response.update(kind='result', result=result)
+        except Exception as e:
+            logger.exception(e)
+            response.update(kind='error', error=repr(e))
+        async with lock:
+            write_message(writer, response, response_payload)
+            await writer.drain()
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Run a RemoteWorker, for example: python -m ipywebcam.remote my_package.my_module:detect --port 9000"""
+    parser = argparse.ArgumentParser(prog='python -m ipywebcam.remote', description='Serve a callback to the RemoteTransformer of ipywebcam.')
+    parser.add_argument('callback', help='the callback to serve, in the form module:function')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9000)
+    args = parser.parse_args(argv)
+    module_name, _, func_name = args.callback.partition(':')
+    callback = getattr(importlib.import_module(module_name), func_name)
+    worker = RemoteWorker(callback, host=args.host, port=args.port)
+    asyncio.run(worker.serve_forever())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+import math
+from typing import Any as AnyType
+
+
+class LatencyHistogram:
+    """A fixed memory histogram of latencies in seconds.
+
+    The buckets are log spaced between min_value and max_value, so the percentiles have a relative error
+    about 10 ** (1 / buckets_per_decade) - 1, around 12% with the default setting, whatever the number of the records.
+    """
+    min_value: float
+    max_value: float
+    buckets_per_decade: int
+    count: int
+    total: float
+    max: float
+
+    def __init__(self, min_value: float = 1e-5, max_value: float = 100.0, buckets_per_decade: int = 20) -> None:
+        if min_value <= 0 or max_value <= min_value:
+            raise ValueError('min_value should be greater than 0 and less than max_value')
+        self.min_value = min_value
+        self.max_value = max_value
+        self.buckets_per_decade = buckets_per_decade
+        self._buckets = [0] * (math.ceil(math.log10(max_value / min_value) * buckets_per_decade) + 1)
+        self.reset()
+
+    def reset(self) -> None:
+        for i in range(len(self._buckets)):
+            self._buckets[i] = 0
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def _index(self, value: float) -> int:
+        if value <= self.min_value:
+            return 0
+        return min(len(self._buckets) - 1, int(math.log10(value / self.min_value) * self.buckets_per_decade) + 1)
+
+    def _upper_bound(self, index: int) -> float:
+        return self.min_value * 10 ** (index / self.buckets_per_decade)
+
+    def record(self, value: float) -> None:
+        self._buckets[self._index(value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    @property
+    def mean(self) -> float | None:
+        return self.total / self.count if self.count > 0 else None
+
+    def percentile(self, p: float) -> float | None:
+        """Get the p-th percentile. p is between 0 and 100. Return None if nothing is recorded."""
+        if self.count == 0:
+            return None
+        rank = max(1, math.ceil(self.count * p / 100))
+        seen = 0
+        for i, n in enumerate(self._buckets):
+            seen += n
+            if seen >= rank:
+                # the last bucket collects everything above max_value
+                return self.max if i == len(self._buckets) - 1 else min(self._upper_bound(i), self.max)
+        return self.max
+
+    def snapshot(self) -> dict[str, AnyType]:
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "max": self.max if self.count > 0 else None,
+        }
+
+
+class CallStats:
+    """The call count, exception count and latency histogram of a transformer or poster."""
+    calls: int
+    skipped: int
+    exceptions: int
+    last_exception: str | None
+    latency: LatencyHistogram
+
+    def __init__(self) -> None:
+        self.latency = LatencyHistogram()
+        self.reset()
+
+    def reset(self) -> None:
+        self.calls = 0
+        self.skipped = 0
+        self.exceptions = 0
+        self.last_exception = None
+        self.latency.reset()
+
+    def record(self, elapsed: float, error: BaseException | None = None) -> None:
+        self.calls += 1
+        self.latency.record(elapsed)
+        if error is not None:
+            self.exceptions += 1
+            self.last_exception = repr(error)
+
+    def record_skip(self) -> None:
+        self.skipped += 1
+
+    def snapshot(self) -> dict[str, AnyType]:
+        latency = self.latency.snapshot()
+        del latency["count"]
+        return {
+            "calls": self.calls,
+            "skipped": self.skipped,
+            "exceptions": self.exceptions,
+            "last_exception": self.last_exception,
+            **latency,
+        }
@@ -4,7 +4,14 @@
 # Copyright (c) Xiaojing Chen.
 # Distributed under the terms of the Modified BSD License.
 
+import asyncio
+from fractions import Fraction
+
+import numpy as np
 import pytest
+from aiortc import RTCSessionDescription
+from aiortc.mediastreams import MediaStreamError, MediaStreamTrack
+from av import VideoFrame
 
 from ipykernel.comm import Comm
 from ipywidgets import Widget
@@ -52,3 +59,46 @@ def mock_comm():
             delattr(Widget, attr)
         else:
             setattr(Widget, attr, value)
+
+
+class Camera(MediaStreamTrack):
+    """A fake video source. The n-th frame is filled with n % 256, and its pts is n in the time base 1 / fps,
+    or in the time base 1 / clock_rate when clock_rate is given. Once stopped, recv raises MediaStreamError like a real track.
+    With realtime, the frames are produced at fps like a real camera, e.g. to be sent by a peer connection.
+    """
+    kind = 'video'
+
+    def __init__(self, width: int = 32, height: int = 24, fps: int = 30, clock_rate: int | None = None, realtime: bool = False):
+        super().__init__()
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.clock_rate = clock_rate
+        self.realtime = realtime
+        self.count = 0
+
+    @property
+    def pts(self) -> int:
+        """The pts of the next frame."""
+        return self.count * self.clock_rate // self.fps if self.clock_rate is not None else self.count
+
+    async def recv(self):
+        await asyncio.sleep(1 / self.fps if self.realtime else 0)
+        if self.readyState != 'live':
+            raise MediaStreamError
+        frame = VideoFrame.from_ndarray(np.full((self.height, self.width, 3), self.count % 256, np.uint8), format='bgr24')
+        frame.pts = self.pts
+        frame.time_base = Fraction(1, self.clock_rate if self.clock_rate is not None else self.fps)
+        self.count += 1
+        return frame
+
+
+async def negotiate(widget, client, renegotiate: bool = False):
+    """Exchange the offer of the client peer with the state of the current view of the widget, and return the state."""
+    answers = {}
+    widget.answer = lambda cmd, id, res: answers.__setitem__(id, res)
+    await client.setLocalDescription(await client.createOffer())
+    state = widget.get_current_state()
+    await state.exchange_peer({ "sdp": client.localDescription.sdp, "type": client.localDescription.type }, renegotiate=renegotiate)
+    await client.setRemoteDescription(RTCSessionDescription(**answers[state.id]))
+    return state
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) Xiaojing Chen.
+# Distributed under the terms of the Modified BSD License.
+
+import asyncio
+import time
+from fractions import Fraction
+
+import numpy as np
+from av import VideoFrame
+
+from ..webcam import BatchTransformer
+
+
+def create_frame(value: int, width: int = 32) -> VideoFrame:
+    frame = VideoFrame.from_ndarray(np.full((24, width, 3), value, np.uint8), format='bgr24')
+    frame.pts = value
+    frame.time_base = Fraction(1, 30)
+    return frame
+
+
+def test_batch_flushed_by_size():
+    shapes = []
+
+    def first_pixels(imgs):
+        shapes.append(imgs.shape)
+        return [int(img[0, 0, 0]) for img in imgs]
+
+    transformer = BatchTransformer(first_pixels, batch_size=3, max_delay=10)
+
+    async def main():
+        start = time.perf_counter()
+        results = await asyncio.gather(*[transformer.transform(create_frame(i), None) for i in (5, 7, 9)])
+        assert time.perf_counter() - start < 1
+        return results
+
+    # each frame gets its own result back
+    assert asyncio.run(main()) == [5, 7, 9]
+    assert shapes == [(3, 24, 32, 3)]
+    assert transformer.batches == 1
+
+
+def test_batch_flushed_by_timeout():
+    shapes = []
+
+    async def invert(imgs):
+        shapes.append(imgs.shape)
+        return [255 - img for img in imgs]
+
+    transformer = BatchTransformer(invert, batch_size=8, max_delay=0.02)
+
+    async def main():
+        start = time.perf_counter()
+        # the frames of another size go to another batch
+        frames = await asyncio.gather(*[transformer.transform(create_frame(i, width), None) for i, width in ((1, 32), (2, 16), (3, 32))])
+        return frames, time.perf_counter() - start
+
+    frames, elapsed = asyncio.run(main())
+    assert elapsed >= 0.02
+    assert sorted(shapes) == [(1, 24, 16, 3), (2, 24, 32, 3)]
+    assert transformer.batches == 2
+    # the ndarray results become the frames, with the pts of their frames
+    assert [frame.pts for frame in frames] == [1, 2, 3]
+    assert [int(frame.to_ndarray(format='bgr24')[0, 0, 0]) for frame in frames] == [254, 253, 252]
+    assert [frame.width for frame in frames] == [32, 16, 32]
+
+
+def test_batch_exception_reaches_every_frame():
+    def fail(imgs):
+        raise RuntimeError('model failed')
+
+    def too_few(imgs):
+        return [None]
+
+    async def main(callback):
+        transformer = BatchTransformer(callback, batch_size=3, max_delay=10)
+        return await asyncio.gather(*[transformer.transform(create_frame(i), None) for i in range(3)], return_exceptions=True)
+
+    results = asyncio.run(main(fail))
+    assert all(isinstance(result, RuntimeError) for result in results)
+    results = asyncio.run(main(too_few))
+    assert all(isinstance(result, ValueError) for result in results)
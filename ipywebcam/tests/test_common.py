@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) Xiaojing Chen.
+# Distributed under the terms of the Modified BSD License.
+
+import asyncio
+import sys
+
+from ..common import BufferedOutput
+
+
+class FakeOutput:
+    def __init__(self):
+        self.outputs = []
+
+    def append_stdout(self, text):
+        self.outputs.append(("stdout", text))
+
+    def append_stderr(self, text):
+        self.outputs.append(("stderr", text))
+
+
+def test_buffered_output_merge_and_drop():
+    output = FakeOutput()
+    buffered = BufferedOutput(output, maxsize=3, interval=0.01) # type: ignore
+
+    async def main():
+        stdout = sys.stdout
+        with buffered:
+            with buffered:
+                print("a", end="")
+            assert sys.stdout is not stdout
+            print("b", end="")
+        assert sys.stdout is stdout
+        await asyncio.sleep(0)
+        assert output.outputs == []
+        await asyncio.sleep(0.05)
+        assert output.outputs == [("stdout", "ab")]
+        output.outputs.clear()
+        buffered.write("stdout", "1")
+        buffered.write("stdout", "2")
+        buffered.write("stderr", "3")
+        buffered.write("stderr", "4")
+        buffered.flush()
+        assert output.outputs == [("stderr", "[1 outputs dropped]\n"), ("stdout", "2"), ("stderr", "34")]
+
+    asyncio.run(main())
@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) Xiaojing Chen.
+# Distributed under the terms of the Modified BSD License.
+
+import asyncio
+import contextvars
+import random
+import threading
+import time
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+import pytest
+from av import VideoFrame
+
+from .. import executors
+from ..executors import TransformerProcessPool, TransformerThreadPool
+from ..webcam import VideoTransformTrack, WebCamWidget
+from .conftest import Camera
+
+
+def invert(img):
+    img[...] = 255 - img
+
+
+def mean(img):
+    return float(img.mean())
+
+
+def test_process_pool_shared_memory():
+    pool = TransformerProcessPool(max_workers=2)
+
+    async def main():
+        img = np.zeros((4, 6, 3), dtype=np.uint8)
+        out = np.zeros_like(img)
+        assert await pool.run(invert, img, out=out) is None
+        assert (out == 255).all() and (img == 0).all()
+        assert await pool.run(mean, out) == 255.0
+        # a larger image grows the slot
+        big = np.ones((32, 32, 3), dtype=np.uint8)
+        await asyncio.gather(*[pool.run(invert, big.copy()) for _ in range(6)])
+        assert pool.stats()["completed"] == 8
+
+    try:
+        asyncio.run(main())
+    finally:
+        pool.shutdown()
+
+
+def test_thread_pool_bounds_and_stats():
+    pool = TransformerThreadPool(max_workers=2, max_pending=3)
+    lock = threading.Lock()
+    running = [0, 0]
+    var = contextvars.ContextVar('var', default=None)
+
+    def work(i):
+        with lock:
+            running[0] += 1
+            running[1] = max(running[1], running[0])
+        time.sleep(0.02)
+        with lock:
+            running[0] -= 1
+        # the context of the caller is propagated to the thread
+        return i, var.get(), threading.current_thread().name
+
+    async def main():
+        var.set('caller')
+        results = await asyncio.gather(*[pool.run(work, i) for i in range(8)])
+        assert [i for i, _, _ in results] == list(range(8))
+        assert all(value == 'caller' for _, value, _ in results)
+        assert all(name.startswith('ipywebcam-transformer') for _, _, name in results)
+        stats = pool.stats()
+        assert stats["completed"] == 8
+        assert stats["running"] == 0 and stats["queued"] == 0
+        # at most 2 running and the 6 others waiting for them
+        assert 0 < stats["peak_queued"] <= 6
+        pool.reset_stats()
+        assert pool.stats()["peak_queued"] == 0 and pool.stats()["completed"] == 0
+
+    try:
+        asyncio.run(main())
+    finally:
+        pool.shutdown()
+    assert running[1] == 2
+
+
+def test_thread_pool_shutdown():
+    pool = TransformerThreadPool(max_workers=1)
+
+    async def main():
+        assert await pool.run(lambda: 1) == 1
+        pool.shutdown(wait=True)
+        with pytest.raises(RuntimeError):
+            await pool.run(lambda: 2)
+        # the failed call does not hold a slot
+        assert pool.pending == 0 and pool.waiting == 0
+
+    asyncio.run(main())
+    with pytest.raises(ValueError):
+        TransformerThreadPool(max_workers=0)
+    with pytest.raises(ValueError):
+        TransformerThreadPool(max_workers=2, max_pending=1)
+
+
+def test_thread_pool_keeps_the_frame_order():
+    widget = WebCamWidget()
+    widget.run_in_thread = True
+    threads = set()
+
+    def jitter(frame):
+        threads.add(threading.current_thread().name)
+        time.sleep(random.uniform(0, 0.005))
+        return VideoFrame.from_ndarray(np.full((24, 32, 3), frame.pts, np.uint8), format='bgr24')
+
+    transformer = widget.add_video_transformer(jitter)
+
+    async def main():
+        track = VideoTransformTrack(Camera(), widget, None)
+        frames = [await track.recv() for _ in range(10)]
+        track.stop()
+        return frames
+
+    try:
+        frames = asyncio.run(main())
+        assert [frame.pts for frame in frames] == list(range(10))
+        assert [int(frame.to_ndarray(format='bgr24')[0, 0, 0]) for frame in frames] == list(range(10))
+        assert all(name.startswith('ipywebcam-transformer') for name in threads)
+        # the calls in the threads are recorded per transformer
+        assert transformer.stats.calls == 10
+        assert widget.get_thread_pool().stats()["completed"] == 10
+    finally:
+        widget.get_thread_pool().shutdown()
+
+
+def test_worker_replaces_the_mapping_of_a_grown_slot():
+    small = SharedMemory(create=True, size=16)
+    large = SharedMemory(create=True, size=64)
+    try:
+        shm = executors._attach(0, small.name)
+        assert executors._attach(0, small.name) is shm
+        # the parent grew the slot, the old mapping is closed instead of being kept
+        grown = executors._attach(0, large.name)
+        assert grown is not shm and grown.size >= 64
+        assert shm.buf is None
+        assert executors._attach(1, small.name) is not shm
+    finally:
+        for attached in executors._attached.values():
+            attached.close()
+        executors._attached.clear()
+        for block in (small, large):
+            block.close()
+            block.unlink()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) Xiaojing Chen.
+# Distributed under the terms of the Modified BSD License.
+
+import numpy as np
+import pytest
+from av import VideoFrame
+
+from ..frames import FrameConversionCache, VideoFramePool, copy_frame
+
+
+def test_pool_reuses_only_the_released_frames():
+    pool = VideoFramePool(maxsize=1)
+    frame = pool.acquire(32, 24, 'bgr24')
+    assert pool.owns(frame)
+    # a frame still in use is never handed out twice
+    other = pool.acquire(32, 24, 'bgr24')
+    assert other is not frame
+    pool.release(frame)
+    assert not pool.owns(frame)
+    assert pool.acquire(32, 24, 'bgr24') is frame
+    # the size and the format are part of the key
+    pool.release(other)
+    assert pool.acquire(32, 24, 'rgb24') is not other
+    assert pool.acquire(16, 24, 'bgr24') is not other
+    assert pool.acquire(32, 24, 'bgr24') is other
+
+
+def test_pool_disown_and_adopt():
+    pool = VideoFramePool(maxlease=2)
+    frame = pool.acquire(32, 24, 'bgr24')
+    pool.disown(frame)
+    assert not pool.owns(frame)
+    # a disowned frame is not kept, so it is not handed out again
+    assert pool.acquire(32, 24, 'bgr24') is not frame
+    created = VideoFrame(32, 24, 'bgr24')
+    pool.adopt(created)
+    assert pool.owns(created)
+    # the oldest leases are forgotten
+    pool.acquire(32, 24, 'bgr24')
+    pool.acquire(32, 24, 'bgr24')
+    assert not pool.owns(created)
+
+
+def test_copy_frame_from_the_pool():
+    pool = VideoFramePool()
+    frame = VideoFrame(32, 24, 'bgr24')
+    frame.pts = 7
+    copied = copy_frame(frame, pool)
+    assert copied is not frame and copied.pts == 7
+    assert pool.owns(copied)
+
+
+def test_conversion_cache_per_format():
+    frame = VideoFrame.from_ndarray(np.arange(24 * 32 * 3, dtype=np.uint8).reshape((24, 32, 3)), format='bgr24')
+    cache = FrameConversionCache(frame)
+    bgr = cache.get_ndarray()
+    assert cache.get_ndarray('bgr24') is bgr
+    assert not bgr.flags.writeable
+    rgb = cache.get_ndarray('rgb24')
+    assert rgb is not bgr and (rgb == bgr[..., ::-1]).all()
+    gray = cache.get_ndarray('gray', width=16, height=12)
+    assert gray.shape == (12, 16)
+    assert cache.get_ndarray('gray', width=16, height=12) is gray
+    assert cache.get_ndarray('gray') is not gray
+    roi = cache.get_ndarray(roi=(2, 3, 4, 5))
+    assert (roi == bgr[3:8, 2:6]).all()
+    assert cache.get_ndarray(roi=(2, 3, 4, 5)) is roi
+    # the unconverted frame is the original one
+    assert cache.get_frame() is frame
+    assert cache.get_frame('rgb24') is cache.get_frame('rgb24')
+    with pytest.raises(ValueError):
+        cache.get_ndarray('yuv420p', roi=(0, 0, 2, 2))
+    cache.clear()
+    assert cache.get_ndarray() is not bgr
@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) Xiaojing Chen.
+# Distributed under the terms of the Modified BSD License.
+
+import asyncio
+
+import numpy as np
+import pytest
+from av import VideoFrame
+
+from ..graph import TransformerGraph
+
+
+async def shape(img):
+    await asyncio.sleep(0.05)
+    return img.shape
+
+
+def test_graph_branches_and_join():
+    graph = TransformerGraph(join=lambda frame, results: None)
+    graph.add_node("small", shape, width=4, height=2)
+    graph.add_node("gray", shape, format="gray")
+    graph.add_node("both", lambda img, a, b: (a, b), inputs=["small", "gray"], format=None)
+    with pytest.raises(ValueError):
+        graph.add_node("broken", shape, inputs=["missing"])
+    frame = VideoFrame.from_ndarray(np.zeros((8, 16, 3), dtype=np.uint8), format="bgr24")
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        results = await graph.transform(frame, None)  # type: ignore
+        # the independent branches run at the same time
+        assert loop.time() - start < 0.09
+        return results
+
+    results = asyncio.run(main())
+    assert results == {"small": (2, 4, 3), "gray": (8, 16), "both": ((2, 4, 3), (8, 16))}
+    assert graph.node_stats()["both"]["calls"] == 1
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) Xiaojing Chen.
+# Distributed under the terms of the Modified BSD License.
+
+import asyncio
+import gc
+import logging
+import tracemalloc
+
+from aiortc import RTCPeerConnection
+
+from .. import common
+from ..webcam import (OutboundVideoTrack, State, VideoTransformTrack,
+                      WebCamWidget)
+from .conftest import Camera, negotiate
+
+
+async def connect_and_disconnect(widget: WebCamWidget, frames: list[int]) -> None:
+    """Connect a client peer to the view of the widget, wait for frames going through the transformer, and remove the last view."""
+    client = RTCPeerConnection()
+    client.addTrack(Camera(64, 48, realtime=True))
+    await negotiate(widget, client)
+    received = frames[0]
+    while frames[0] < received + 2:
+        await asyncio.sleep(0.01)
+    widget._view_count = 1
+    widget._view_count = 0
+    await asyncio.gather(*common._background_tasks)
+    await client.close()
+
+
+def count_instances(*types: type) -> int:
+    gc.collect()
+    return sum(1 for o in gc.get_objects() if isinstance(o, types))
+
+
+def test_memory_is_flat_over_connect_cycles(monkeypatch):
+    # the records captured by pytest are not retained by the widget
+    monkeypatch.setattr(logging.getLogger("ipywebcam"), "propagate", False)
+
+    async def main():
+        widget = WebCamWidget()
+        frames = [0]
+        widget.add_video_transformer(lambda frame: frames.__setitem__(0, frames[0] + 1))
+        for _ in range(5):
+            await connect_and_disconnect(widget, frames)
+        gc.collect()
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            for _ in range(30):
+                await connect_and_disconnect(widget, frames)
+            gc.collect()
+            growth = tracemalloc.get_traced_memory()[0] - before
+        finally:
+            tracemalloc.stop()
+        assert widget.state_map == {}
+        # nothing of the closed connections is kept
+        assert count_instances(RTCPeerConnection, State, VideoTransformTrack, OutboundVideoTrack) == 0
+        assert growth < 512 * 1024, f'{growth} bytes retained by 30 cycles'
+        await widget.aclose()
+
+    asyncio.run(main())
+
+
+def test_idle_states_and_aclose():
+    async def main():
+        widget = WebCamWidget()
+        idle = widget.get_or_create_state('idle')
+        active = widget.get_or_create_state('active')
+        idle.last_active -= 10
+        assert idle.is_idle(5) and not active.is_idle(5)
+        # the selector displayed somewhere keeps the state
+        active.video_input_selector._view_count = 1
+        active.last_active -= 10
+        widget.get_or_create_state('other').last_active -= 10
+        # the sweeper restarts with the new timeout
+        widget.idle_timeout = 0.1
+        await asyncio.sleep(1.2)
+        assert list(widget.state_map) == ['active']
+        pool = widget.get_thread_pool()
+        await widget.aclose()
+        assert widget.state_map == {}
+        assert widget.thread_pool is None
+        assert pool._executor._shutdown
+
+    asyncio.run(main())
+
+
+def test_close_peers_and_del():
+    async def main():
+        widget = WebCamWidget()
+        state = widget.get_or_create_state('x')
+        state.pc = RTCPeerConnection()
+        # still a sync call, the peers are closed in the background by a task kept until it finishes
+        assert widget.close_peers() is None
+        assert len(common._background_tasks) == 1
+        await asyncio.sleep(0.05)
+        assert state.pc is None
+        assert common._background_tasks == set()
+        track = VideoTransformTrack(Camera(), widget, None)
+        widget.get_or_create_state('y').track_map.transformed.append(track)
+        tasks = asyncio.all_tasks()
+        # the finalizer schedules nothing holding the widget, and only stops the tracks
+        widget.__del__()
+        assert asyncio.all_tasks() <= tasks
+        assert track.readyState == 'ended'
+        assert widget.state_map == {}
+
+    asyncio.run(main())
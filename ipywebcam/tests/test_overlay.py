@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) Xiaojing Chen.
+# Distributed under the terms of the Modified BSD License.
+
+import asyncio
+from array import array
+from fractions import Fraction
+from types import SimpleNamespace
+
+from ..common import ContextHelper
+from ..overlay import Overlay
+from ..webcam import VideoTransformTrack, WebCamWidget
+from .conftest import Camera
+
+
+def test_overlay_encode():
+    overlay = Overlay(3, Fraction(1, 30), 640, 480)
+    overlay.add_box(1, 2, 3, 4, label="face")
+    other = Overlay(3, Fraction(1, 30), 640, 480)
+    other.add_polyline([(0, 0), (5, 6), (7, 8)], closed=True)
+    overlay.extend(other)
+    args, buffers = overlay.encode()
+    assert args["timestamp"] == 9000
+    assert args["boxes"]["labels"] == ["face"]
+    assert args["polylines"]["lengths"] == [3] and args["polylines"]["closed"] == [True]
+    assert array("f", buffers[0]).tolist() == [1, 2, 3, 4]
+    assert array("f", buffers[1]).tolist() == [0, 0, 5, 6, 7, 8]
+    assert not overlay.is_empty() and Overlay(0, None, 1, 1).is_empty()
+
+
+def create_widget() -> tuple[WebCamWidget, list]:
+    widget = WebCamWidget()
+    sent = []
+    widget.send_command = lambda cmd, target_id, args, buffers=None, on_result=None: sent.append((target_id, args))
+    return widget, sent
+
+
+def test_track_overlays_go_to_their_view():
+    widget, sent = create_widget()
+    viewer = SimpleNamespace(sent=[])
+    viewer.send_command = lambda cmd, target_id, args, buffers=None: viewer.sent.append(args["timestamp"])
+    widget.add_viewer(viewer)
+
+    def detect(frame, ctx):
+        ContextHelper(ctx).get_overlay().add_box(frame.pts, 0, 4, 4, label=f"face {frame.pts}")
+
+    def caption(frame, ctx):
+        if frame.pts < 3:
+            ContextHelper(ctx).get_overlay().add_text(0, 0, f"frame {frame.pts}")
+
+    widget.add_video_transformer(detect, every_n_frames=2)
+    widget.add_video_transformer(caption)
+
+    async def main():
+        tracks = [VideoTransformTrack(Camera(), widget, None, state_id=id) for id in ("view-1", "view-2")]
+        # the viewers show the track of view-2
+        widget.get_or_create_state("view-2").track_map.transformed.append(tracks[1])
+        for _ in range(5):
+            for track in tracks:
+                await track.recv()
+        widget.remove_viewer(viewer)
+        await widget.aclose()
+
+    asyncio.run(main())
+    assert sorted(set(target for target, _ in sent)) == ["view-1", "view-2"]
+    for id in ("view-1", "view-2"):
+        overlays = [args for target, args in sent if target == id]
+        assert [args["timestamp"] for args in overlays] == [0, 3000, 6000, 9000, 12000]
+        # the frames skipped by every_n_frames keep the box of the last call, and the layers are merged
+        assert [args["boxes"]["labels"] for args in overlays] == [["face 0"], ["face 0"], ["face 2"], ["face 2"], ["face 4"]]
+        assert [[text["text"] for text in args["texts"]] for args in overlays] == [["frame 0"], ["frame 1"], ["frame 2"], [], []]
+    assert viewer.sent == [0, 3000, 6000, 9000, 12000]
+
+
+def test_track_overlay_is_cleared_once():
+    widget, sent = create_widget()
+
+    def detect(frame, ctx):
+        if frame.pts < 2:
+            ContextHelper(ctx).get_overlay().add_box(0, 0, 4, 4)
+
+    widget.add_video_transformer(detect)
+
+    async def main():
+        track = VideoTransformTrack(Camera(), widget, None, state_id="view")
+        for _ in range(5):
+            await track.recv()
+
+    asyncio.run(main())
+    # an empty overlay clears the canvas once the layer is gone, then nothing is sent
+    assert [(args["timestamp"], len(args["boxes"]["labels"])) for _, args in sent] == [(0, 1), (3000, 1), (6000, 0)]
@@ -0,0 +1,27 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) Xiaojing Chen.
+# Distributed under the terms of the Modified BSD License.
+
+from ..pacing import FramePacer
+
+
+def test_pacer_schedule_drop_and_reanchor():
+    pacer = FramePacer(delay=0.1, max_late_frames=3)
+    assert pacer.schedule(0.0, 10.0) == 10.1
+    # a burst is spread at the cadence of the timestamps
+    assert abs(pacer.schedule(0.04, 10.0) - 10.14) < 1e-9
+    assert abs(pacer.schedule(0.08, 10.0) - 10.18) < 1e-9
+    # later than the budget
+    assert pacer.schedule(0.12, 10.3) is None
+    assert pacer.schedule(0.16, 10.3) is None
+    assert pacer.dropped == 2
+    # too many late frames in a row, the offset is fixed again
+    assert abs(pacer.schedule(0.20, 10.4) - 10.5) < 1e-9
+    assert pacer.reanchors == 1
+    # a jump of the timestamps
+    assert pacer.schedule(5.0, 10.5) == 10.6
+    assert pacer.reanchors == 2
+    pacer.record(10.6, 10.601)
+    assert pacer.snapshot()["error"]["count"] == 1
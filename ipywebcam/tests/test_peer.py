@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) Xiaojing Chen.
+# Distributed under the terms of the Modified BSD License.
+
+import asyncio
+
+from aiortc import RTCPeerConnection
+
+from ..webcam import WebCamWidget
+from .conftest import Camera, negotiate
+
+
+async def wait_for(condition, timeout: float = 5) -> None:
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not condition():
+        assert loop.time() < deadline, 'timed out'
+        await asyncio.sleep(0.01)
+
+
+def test_receive_only_pulls_the_frames_by_the_sink():
+    async def main():
+        widget = WebCamWidget()
+        widget.receive_only = True
+        transformed = []
+        posted = []
+        widget.add_video_transformer(lambda frame: transformed.append(frame.pts))
+        widget.add_video_poster(lambda frame: posted.append(frame.pts))
+        client = RTCPeerConnection()
+        # like the frontend, the camera is only sent
+        client.addTransceiver(Camera(64, 48, realtime=True), direction='sendonly')
+        state = await negotiate(widget, client)
+        await wait_for(lambda: len(posted) >= 3)
+        # nothing is sent back
+        assert state.pc is not None
+        assert [t.sender.track for t in state.pc.getTransceivers() if t.sender.track is not None] == []
+        assert state.track_map.outbound == []
+        assert len(state.track_map.transformed) == 1
+        assert transformed[:3] == posted[:3]
+        await client.close()
+        await widget.aclose()
+
+    asyncio.run(main())
+
+
+def test_renegotiate_keeps_the_peer_and_the_tracks():
+    async def main():
+        widget = WebCamWidget()
+        setups = []
+        transformed = []
+        widget.add_video_transformer(lambda frame: transformed.append(frame.pts), setup=setups.append)
+        client = RTCPeerConnection()
+        client.addTrack(Camera(64, 48, realtime=True))
+        state = await negotiate(widget, client)
+        await wait_for(lambda: len(transformed) >= 3)
+        pc = state.pc
+        tracks = list(state.track_map.transformed)
+        outbound = list(state.track_map.outbound)
+        assert len(tracks) == 1 and len(setups) == 1
+
+        assert await negotiate(widget, client, renegotiate=True) is state
+        assert client.signalingState == 'stable'
+        assert state.pc is pc and pc.connectionState not in ('closed', 'failed')
+        assert state.track_map.transformed == tracks
+        assert state.track_map.outbound == outbound
+        assert tracks[0].readyState == 'live'
+        # the frames keep flowing through the same track, without a new setup
+        count = len(transformed)
+        await wait_for(lambda: len(transformed) >= count + 3)
+        assert setups == [tracks[0].track]
+        await client.close()
+        await widget.aclose()
+
+    asyncio.run(main())
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) Xiaojing Chen.
+# Distributed under the terms of the Modified BSD License.
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+from ..peerstats import SAMPLE_FIELDS, PeerStatsRecorder
+from ..webcam import OutboundVideoTrack, WebCamWidget
+from .conftest import Camera
+
+
+def test_recorder_rates_and_history():
+    recorder = PeerStatsRecorder(maxsize=2)
+    track = SimpleNamespace(kind='video', received_frames=0)
+    outbound = SimpleNamespace(sent_frames=0, encoded_frames=0, encode_seconds=0.0)
+
+    def stats(lost, received, sent):
+        return [
+            SimpleNamespace(type='inbound-rtp', kind='video', packetsLost=lost, packetsReceived=received, jitter=900),
+            SimpleNamespace(type='outbound-rtp', kind='video', bytesSent=sent),
+            SimpleNamespace(type='remote-inbound-rtp', kind='video', roundTripTime=0.05),
+        ]
+
+    first = recorder.sample(stats(0, 0, 0), [track], [outbound], now=0.0)
+    assert set(first.keys()) == set(SAMPLE_FIELDS)
+    assert first["inbound_fps"] is None
+    assert first["inbound_jitter"] == 0.01
+    track.received_frames = 30
+    outbound.sent_frames = outbound.encoded_frames = 30
+    outbound.encode_seconds = 0.15
+    recorder.record_client({ "decode_time": 0.002 })
+    second = recorder.sample(stats(10, 90, 125000), [track], [outbound], now=1.0)
+    recorder.samples.put(first)
+    recorder.samples.put(second)
+    assert second["inbound_fps"] == 30
+    assert second["inbound_loss"] == 0.1
+    assert second["outbound_bitrate"] == 1000000
+    assert abs(second["encode_time"] - 0.005) < 1e-9
+    assert second["decode_time"] == 0.002
+    assert second["rtt"] == 0.05
+    # the history is bounded
+    recorder.samples.put(second)
+    assert recorder.snapshot() == [second, second]
+
+
+class Encoder:
+    def encode(self, frame, force_keyframe=False):
+        time.sleep(0.002)
+        return [], 0
+
+
+class Peer:
+    """A stub of RTCPeerConnection, only the stats of the outbound video."""
+
+    def __init__(self):
+        self.connectionState = 'connected'
+        self.polls = 0
+
+    async def getStats(self):
+        self.polls += 1
+        if self.polls == 2:
+            raise RuntimeError('stats failed')
+        return {'outbound': SimpleNamespace(type='outbound-rtp', kind='video', bytesSent=1000 * self.polls)}
+
+
+def test_recorder_polls_the_peer(caplog):
+    recorder = PeerStatsRecorder(interval=0.01)
+    pc = Peer()
+    # the encoder created by aiortc in the sender, timed by the outbound track
+    sender = SimpleNamespace(_RTCRtpSender__encoder=Encoder())
+    outbound = OutboundVideoTrack(Camera(), WebCamWidget())
+    outbound.sender = sender  # type: ignore
+    transformed = SimpleNamespace(kind='video', received_frames=0)
+
+    async def main():
+        recorder.start(pc, lambda: ([transformed], [outbound]))  # type: ignore
+        for _ in range(10):
+            frame = await outbound.recv()
+            sender._RTCRtpSender__encoder.encode(frame)
+            transformed.received_frames += 1
+            await asyncio.sleep(0.005)
+        pc.connectionState = 'closed'
+        await asyncio.sleep(0.03)
+        # the polling ends with the peer
+        assert recorder._task is not None and recorder._task.done()
+
+    asyncio.run(main())
+    samples = recorder.snapshot()
+    # one poll failed, and was only logged
+    assert 0 < len(samples) == pc.polls - 1
+    assert any('stats failed' in record.getMessage() for record in caplog.records)
+    assert outbound.encoded_frames == 10
+    encode_times = [sample["encode_time"] for sample in samples if sample["encode_time"] is not None]
+    assert encode_times and all(t >= 0.002 for t in encode_times)
+    assert any(sample["outbound_bitrate"] is not None for sample in samples)
@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) Xiaojing Chen.
+# Distributed under the terms of the Modified BSD License.
+
+import asyncio
+import random
+import sys
+
+import pytest
+from ipywidgets import Output
+
+from ..common import ContextHelper
+from ..webcam import VideoTransformTrack, WebCamWidget
+from .conftest import Camera
+
+
+def create_widget(queue_size: int = 1) -> WebCamWidget:
+    widget = WebCamWidget()
+    widget.pipelined = True
+    widget.pipeline_queue_size = queue_size
+    return widget
+
+
+def test_pipeline_keeps_the_order():
+    widget = create_widget()
+    seen = []
+
+    async def jitter(frame):
+        await asyncio.sleep(random.uniform(0, 0.005))
+
+    async def record(frame):
+        seen.append(frame.pts)
+
+    widget.add_video_transformer(jitter).concurrency = 4
+    widget.add_video_transformer(record)
+
+    async def main():
+        track = VideoTransformTrack(Camera(), widget, None)
+        frames = [await track.recv() for _ in range(20)]
+        track.stop()
+        return [frame.pts for frame in frames]
+
+    assert asyncio.run(main()) == list(range(20))
+    # the second stage gets the frames in order too
+    assert seen[:20] == list(range(20))
+
+
+def test_pipeline_backpressure():
+    widget = create_widget(queue_size=1)
+    widget.add_video_transformer(lambda frame: None)
+    widget.add_video_transformer(lambda frame: None)
+
+    async def main():
+        source = Camera()
+        track = VideoTransformTrack(source, widget, None)
+        await track.recv()
+        await asyncio.sleep(0.05)
+        # nothing is consumed, so the reader stops once the queues of the 3 stages and the frames held by the stages are full
+        read = source.count
+        await asyncio.sleep(0.05)
+        assert source.count == read
+        assert read <= 1 + 3 * 2
+        track.stop()
+
+    asyncio.run(main())
+
+
+def test_pipeline_concurrency_isolates_the_context():
+    widget = create_widget()
+    running = [0]
+    peak = [0]
+    mismatches = []
+
+    async def slow(frame, ctx):
+        running[0] += 1
+        peak[0] = max(peak[0], running[0])
+        await asyncio.sleep(0.02)
+        # the other frames in flight do not replace the original frame of this call
+        if ContextHelper(ctx).get_org_frame().pts != frame.pts:
+            mismatches.append(frame.pts)
+        running[0] -= 1
+
+    transformer = widget.add_video_transformer(slow)
+    transformer.concurrency = 3
+
+    async def main():
+        track = VideoTransformTrack(Camera(), widget, None)
+        frames = [await track.recv() for _ in range(9)]
+        track.stop()
+        return [frame.pts for frame in frames]
+
+    assert asyncio.run(main()) == list(range(9))
+    assert peak[0] == 3
+    assert mismatches == []
+
+
+def test_pipeline_captures_the_output_once():
+    widget = create_widget()
+
+    async def noisy(frame):
+        print(f"frame {frame.pts}")
+        await asyncio.sleep(random.uniform(0, 0.002))
+
+    widget.add_video_transformer(noisy)
+    widget.add_video_transformer(noisy).concurrency = 2
+    output = Output()
+
+    async def main():
+        stdout = sys.stdout
+        track = VideoTransformTrack(Camera(), widget, output)
+        for _ in range(5):
+            await track.recv()
+        track.stop()
+        await asyncio.sleep(0)
+        return stdout
+
+    stdout = asyncio.run(main())
+    assert sys.stdout is stdout
+    texts = "".join(item["text"] for item in output.outputs)
+    # both stages printed the frames sent, from their tasks
+    lines = texts.splitlines()
+    assert all(lines.count(f"frame {pts}") == 2 for pts in range(5))
+
+
+def create_posting_widget(overflow: str):
+    """A widget whose poster waits for the gate, so the frames are queued by the dispatcher meanwhile."""
+    widget = WebCamWidget()
+    widget.async_posters = True
+    widget.poster_queue_size = 2
+    widget.poster_overflow = overflow
+    gate = asyncio.Event()
+    posted = []
+
+    async def poster(frame):
+        await gate.wait()
+        posted.append(frame.pts)
+
+    widget.add_video_poster(poster)
+    return widget, gate, posted
+
+
+async def wait_for_posts(posted: list, count: int) -> None:
+    for _ in range(500):
+        if len(posted) >= count:
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError(f'only {posted} are posted')
+
+
+@pytest.mark.parametrize('overflow, kept', [
+    # the first frame is taken by the poster, then the queue of 2 overflows with the 8 others
+    ('drop_oldest', [0, 8, 9]),
+    ('drop_newest', [0, 1, 2]),
+])
+def test_poster_overflow_drops(overflow, kept):
+    widget, gate, posted = create_posting_widget(overflow)
+
+    async def main():
+        track = VideoTransformTrack(Camera(), widget, None)
+        # recv never waits for the posters
+        frames = [await asyncio.wait_for(track.recv(), 1) for _ in range(10)]
+        assert [frame.pts for frame in frames] == list(range(10))
+        dispatcher = track._poster_dispatcher
+        assert dispatcher is not None and dispatcher.dropped == 7
+        gate.set()
+        await wait_for_posts(posted, 3)
+        await asyncio.sleep(0.05)
+        track.stop()
+        return dispatcher.dropped
+
+    assert asyncio.run(main()) == 7
+    assert posted == kept
+
+
+def test_poster_overflow_blocks():
+    widget, gate, posted = create_posting_widget('block')
+
+    async def main():
+        track = VideoTransformTrack(Camera(), widget, None)
+        # the first frame is taken by the poster and the 2 next ones are queued
+        for _ in range(3):
+            await asyncio.wait_for(track.recv(), 1)
+        pending = asyncio.ensure_future(track.recv())
+        await asyncio.sleep(0.05)
+        assert not pending.done()
+        gate.set()
+        frames = [await pending] + [await track.recv() for _ in range(6)]
+        assert [frame.pts for frame in frames] == list(range(3, 10))
+        await wait_for_posts(posted, 10)
+        dispatcher = track._poster_dispatcher
+        track.stop()
+        return dispatcher.dropped
+
+    assert asyncio.run(main()) == 0
+    # nothing is dropped, and the frames are posted in order
+    assert posted == list(range(10))
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) Xiaojing Chen.
+# Distributed under the terms of the Modified BSD License.
+
+import asyncio
+from fractions import Fraction
+
+import numpy as np
+from av import VideoFrame
+
+from ..remote import RemoteTransformer, RemoteWorker
+
+
+def make_frame(value):
+    frame = VideoFrame.from_ndarray(np.full((8, 8, 3), value, dtype=np.uint8), format="bgr24")
+    frame.pts = 42
+    frame.time_base = Fraction(1, 30)
+    return frame
+
+
+async def handle(img, header):
+    if img[0, 0, 0] == 1:
+        return 255 - img
+    if img[0, 0, 0] == 2:
+        return {"mean": float(img.mean())}
+    await asyncio.sleep(1)
+
+
+def test_remote_transformer_on_localhost():
+    async def main():
+        worker = RemoteWorker(handle)
+        port = await worker.start()
+        transformer = RemoteTransformer("127.0.0.1", port, timeout=0.2)
+        try:
+            out = await transformer.transform(make_frame(1), None)  # type: ignore
+            assert out.pts == 42 and out.to_ndarray(format="bgr24")[0, 0, 0] == 254
+            assert await transformer.transform(make_frame(2), None) == {"mean": 2.0}  # type: ignore
+            # a slow worker falls back to passthrough
+            frame = make_frame(3)
+            assert await transformer.transform(frame, None) is frame  # type: ignore
+            assert transformer.remote_stats()["timeouts"] == 1
+            jpeg = RemoteTransformer("127.0.0.1", port, encoding="jpeg")
+            out = await jpeg.transform(make_frame(1), None)  # type: ignore
+            assert abs(int(out.to_ndarray(format="bgr24")[4, 4, 0]) - 254) < 8
+            jpeg.close()
+        finally:
+            transformer.close()
+            await worker.close()
+        # no worker any more
+        frame = make_frame(1)
+        transformer = RemoteTransformer("127.0.0.1", port, timeout=0.2)
+        assert await transformer.transform(frame, None) is frame  # type: ignore
+        assert transformer.remote_stats()["connection_errors"] == 1
+
+    asyncio.run(main())
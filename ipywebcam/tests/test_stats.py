@@ -0,0 +1,37 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) Xiaojing Chen.
+# Distributed under the terms of the Modified BSD License.
+
+from ..stats import CallStats, LatencyHistogram
+
+
+def test_latency_histogram_percentiles():
+    histogram = LatencyHistogram()
+    assert histogram.percentile(50) is None
+    for i in range(1, 1001):
+        histogram.record(i / 1000)
+    assert histogram.count == 1000
+    assert abs(histogram.mean - 0.5005) < 1e-9
+    assert histogram.max == 1.0
+    for p, expected in [(50, 0.5), (95, 0.95), (99, 0.99)]:
+        value = histogram.percentile(p)
+        assert expected <= value <= expected * 1.13
+    assert histogram.percentile(100) == 1.0
+    histogram.record(1e6)
+    assert histogram.max == 1e6
+    assert histogram.percentile(100) == 1e6
+
+
+def test_call_stats():
+    stats = CallStats()
+    stats.record(0.01)
+    stats.record(0.02, ValueError("boom"))
+    snapshot = stats.snapshot()
+    assert snapshot["calls"] == 2
+    assert snapshot["exceptions"] == 1
+    assert snapshot["last_exception"] == "ValueError('boom')"
+    stats.reset()
+    assert stats.snapshot()["calls"] == 0
+    assert stats.snapshot()["p50"] is None
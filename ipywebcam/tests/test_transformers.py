@@ -0,0 +1,268 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) Xiaojing Chen.
+# Distributed under the terms of the Modified BSD License.
+
+import asyncio
+
+import numpy as np
+import pytest
+from aiortc.mediastreams import MediaStreamError
+from av import VideoFrame
+
+from ..common import ContextHelper
+from ..webcam import VideoTransformTrack, WebCamWidget
+from .conftest import Camera
+
+
+def run_track(widget: WebCamWidget, n: int, fps: int = 30) -> list[VideoFrame]:
+    async def main():
+        track = VideoTransformTrack(Camera(fps=fps), widget, None)
+        frames = [await track.recv() for _ in range(n)]
+        track.stop()
+        return frames
+
+    return asyncio.run(main())
+
+
+def test_every_n_frames_skips_and_counts():
+    widget = WebCamWidget()
+    calls = []
+    transformer = widget.add_video_transformer(lambda frame: calls.append(frame.pts), every_n_frames=3)
+    run_track(widget, 9)
+    assert calls == [0, 3, 6]
+    assert transformer.stats.calls == 3
+    assert transformer.stats.skipped == 6
+
+
+def test_max_hz_follows_the_frame_time():
+    widget = WebCamWidget()
+    calls = []
+    widget.add_video_transformer(lambda frame: calls.append(frame.pts), max_hz=10)
+    # 30 fps limited to 10 calls per second of the frame time
+    run_track(widget, 12)
+    assert calls == [0, 3, 6, 9]
+
+
+def test_reused_outputs_are_copies():
+    widget = WebCamWidget()
+
+    def invert(frame):
+        return VideoFrame.from_ndarray(255 - frame.to_ndarray(format='bgr24'), format='bgr24')
+
+    widget.add_video_transformer(invert, every_n_frames=3)
+    frames = run_track(widget, 6)
+    assert len(set(id(frame) for frame in frames)) == 6
+    assert [frame.pts for frame in frames] == list(range(6))
+    # the skipped frames get the pixels of the last output
+    assert [int(frame.to_ndarray(format='bgr24')[0, 0, 0]) for frame in frames] == [255, 255, 255, 252, 252, 252]
+
+
+def test_ndarray_transformers_write_in_place():
+    widget = WebCamWidget()
+    views = []
+
+    def first(img, ctx):
+        views.append(img)
+        # the original frame is copied, not modified
+        assert int(ContextHelper(ctx).get_org_frame().to_ndarray(format='bgr24')[0, 0, 0]) == 0
+        img[...] = 1
+
+    def second(img):
+        views.append(img)
+        img += 1
+
+    widget.add_video_ndarray_transformer(first)
+    widget.add_video_ndarray_transformer(second)
+    frame = run_track(widget, 1)[0]
+    # the second transformer got the frame of the first one and modified it in place
+    assert np.shares_memory(views[0], views[1])
+    assert int(frame.to_ndarray(format='bgr24')[0, 0, 0]) == 2
+    # the sent frame leaves the pool
+    assert not widget.frame_pool.owns(frame)
+
+
+def test_ndarray_transformer_releases_the_unused_frame():
+    widget = WebCamWidget()
+    prepared = []
+
+    def replace(img):
+        prepared.append(img)
+        return img + 1
+
+    widget.add_video_ndarray_transformer(replace)
+    frames = run_track(widget, 3)
+    assert [int(frame.to_ndarray(format='bgr24')[0, 0, 0]) for frame in frames] == [1, 2, 3]
+    # the prepared frame is not sent, so the next frame reuses it
+    assert all(np.shares_memory(prepared[0], img) for img in prepared)
+
+
+def test_org_ndarray_is_shared_by_the_frame():
+    widget = WebCamWidget()
+    arrays = []
+
+    def read(frame, ctx):
+        arrays.append(ContextHelper(ctx).get_org_ndarray('gray'))
+
+    widget.add_video_transformer(read)
+    widget.add_video_transformer(read)
+    run_track(widget, 3)
+    # converted once per frame, and never reused by the next frame
+    assert [arrays[i] is arrays[i + 1] for i in range(0, 6, 2)] == [True] * 3
+    assert len(set(id(array) for array in arrays[::2])) == 3
+    assert [int(array[0, 0]) for array in arrays[::2]] == [0, 1, 2]
+
+
+def test_unchanged_frames_reuse_a_copy_of_the_last_output():
+    widget = WebCamWidget()
+    # the frames of the camera brighten by 1 per frame
+    widget.change_threshold = 5
+    calls = []
+
+    def invert(frame):
+        calls.append(frame.pts)
+        return VideoFrame.from_ndarray(255 - frame.to_ndarray(format='bgr24'), format='bgr24')
+
+    widget.add_video_transformer(invert)
+
+    async def main():
+        track = VideoTransformTrack(Camera(), widget, None)
+        frames = [await track.recv() for _ in range(7)]
+        track.stop()
+        return track, frames
+
+    track, frames = asyncio.run(main())
+    # compared with the last processed frame, not the previous one
+    assert calls == [0, 5]
+    assert track.unchanged_frames == 5
+    assert len(set(id(frame) for frame in frames)) == 7
+    assert [frame.pts for frame in frames] == list(range(7))
+    assert [int(frame.to_ndarray(format='bgr24')[0, 0, 0]) for frame in frames] == [255] * 5 + [250] * 2
+
+
+def test_unchanged_frames_keep_the_original_frame():
+    widget = WebCamWidget()
+    widget.change_threshold = 5
+    calls = []
+    widget.add_video_transformer(lambda frame: calls.append(frame.pts))
+    frames = run_track(widget, 3)
+    assert calls == [0]
+    # nothing to reuse, the unchanged frames are sent as they are
+    assert [int(frame.to_ndarray(format='bgr24')[0, 0, 0]) for frame in frames] == [0, 1, 2]
+
+
+
+def test_frames_pass_through_until_the_setup_is_done():
+    widget = WebCamWidget()
+    calls = []
+    setups = []
+    teardowns = []
+
+    async def main():
+        ready = asyncio.Event()
+
+        async def setup(source):
+            setups.append(source)
+            await ready.wait()
+
+        widget.add_video_transformer(lambda frame: calls.append(frame.pts), setup=setup, teardown=teardowns.append)
+        source = Camera()
+        track = VideoTransformTrack(source, widget, None)
+        widget.get_or_create_state('x').track_map.transformed.append(track)
+        frames = [await track.recv() for _ in range(3)]
+        # untransformed while the setup is pending
+        assert calls == []
+        assert [int(frame.to_ndarray(format='bgr24')[0, 0, 0]) for frame in frames] == [0, 1, 2]
+        ready.set()
+        await asyncio.sleep(0)
+        for _ in range(2):
+            await track.recv()
+        assert calls == [3, 4]
+        assert setups == [source]
+        await widget.close_state('x')
+        # the teardown runs once, with the source track, in a thread for a sync hook
+        await track.teardown()
+        assert teardowns == [source]
+        assert track.readyState == 'ended'
+
+    asyncio.run(main())
+
+
+def test_failing_setup():
+    widget = WebCamWidget()
+    calls = []
+    teardowns = []
+
+    def setup(source):
+        raise RuntimeError('no model')
+
+    transformer = widget.add_video_transformer(lambda frame: calls.append(frame.pts), setup=setup, teardown=teardowns.append)
+
+    async def main():
+        track = VideoTransformTrack(Camera(), widget, None)
+        for _ in range(3):
+            await track.recv()
+            await asyncio.sleep(0.01)
+        track.stop()
+        await track.teardown()
+
+    asyncio.run(main())
+    # the frames keep passing through, and nothing is torn down
+    assert calls == []
+    assert transformer.enabled
+    assert teardowns == []
+
+
+def test_pending_setup_is_cancelled_on_stop():
+    widget = WebCamWidget()
+    teardowns = []
+    cancelled = []
+
+    async def setup(source):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(source)
+            raise
+
+    widget.add_video_transformer(lambda frame: None, setup=setup, teardown=teardowns.append)
+
+    async def main():
+        track = VideoTransformTrack(Camera(), widget, None)
+        await track.recv()
+        await asyncio.sleep(0)
+        track.stop()
+        await track.teardown()
+        return track.track
+
+    source = asyncio.run(main())
+    assert cancelled == [source]
+    assert teardowns == []
+
+
+def test_drop_stale_frames():
+    async def main():
+        widget = WebCamWidget()
+        source = Camera()
+        track = VideoTransformTrack(source, widget, None, drop_stale_frames=True)
+        first = await track.recv()
+        # the reader keeps draining the source while nothing is consumed
+        for _ in range(20):
+            await asyncio.sleep(0)
+        read = source.count
+        assert read > first.pts + 2
+        source.stop()
+        await asyncio.sleep(0.01)
+        # the reader ends with the source
+        assert track._reader is not None and track._reader.done()
+        # the newest frame wins over the stale ones
+        latest = await track.recv()
+        assert latest.pts == read - 1
+        assert track.received_frames == read
+        assert track.dropped_frames == read - 2
+        with pytest.raises(MediaStreamError):
+            await track.recv()
+        track.stop()
+
+    asyncio.run(main())
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) Xiaojing Chen.
+# Distributed under the terms of the Modified BSD License.
+
+import asyncio
+from fractions import Fraction
+
+import numpy as np
+from aiortc.mediastreams import MediaStreamTrack
+from av import VideoFrame
+
+from ..viewer import ProcessedTrackProxy
+from ..webcam import VideoTransformTrack, WebCamWidget
+
+
+class CountingTrack(MediaStreamTrack):
+    kind = 'video'
+
+    def __init__(self):
+        super().__init__()
+        self.pts = 0
+
+    async def recv(self):
+        await asyncio.sleep(0.005)
+        frame = VideoFrame.from_ndarray(np.zeros((24, 32, 3), np.uint8), format='bgr24')
+        frame.pts = self.pts
+        frame.time_base = Fraction(1, 30)
+        self.pts += 1
+        return frame
+
+
+def test_viewers_share_the_transformed_frames():
+    async def main():
+        widget = WebCamWidget()
+        calls = []
+        widget.add_video_transformer(lambda frame: calls.append(frame.pts))
+        proxies = [ProcessedTrackProxy(widget) for _ in range(3)]
+
+        async def pull(proxy, n):
+            return [(await proxy.recv()).pts for _ in range(n)]
+
+        # the viewers wait until the widget is connected
+        tasks = [asyncio.ensure_future(pull(proxy, 5)) for proxy in proxies]
+        await asyncio.sleep(0.02)
+        state = widget.get_or_create_state('test')
+        track = VideoTransformTrack(CountingTrack(), widget, None)
+        state.track_map.transformed.append(track)
+        widget.notify_processed_track()
+        results = await asyncio.wait_for(asyncio.gather(*tasks), 5)
+        assert results == [[0, 1, 2, 3, 4]] * 3
+        assert calls == [0, 1, 2, 3, 4]
+        # a reconnected widget is followed by the viewers
+        track.stop()
+        track = VideoTransformTrack(CountingTrack(), widget, None)
+        state.track_map.transformed.append(track)
+        widget.notify_processed_track()
+        assert await asyncio.wait_for(pull(proxies[0], 2), 5) == [0, 1]
+        track.stop()
+
+    asyncio.run(main())
@@ -4,11 +4,127 @@
 # Copyright (c) Xiaojing Chen.
 # Distributed under the terms of the Modified BSD License.
 
+import asyncio
+import sys
+
 import pytest
+from aiortc import RTCPeerConnection
+from ipywidgets import Output
 
-from ..webcam import WebCamWidget
+from .. import webcam
+from ..webcam import (OutboundVideoTrack, VideoTransformTrack, WebCamWidget,
+                      _get_sender_encoder, parse_ice_candidate)
+from .conftest import Camera
 
 
 def test_example_creation_blank():
     w = WebCamWidget()
     assert w.value == 'Hello World'
+
+
+def test_outbound_video_limits():
+    w = WebCamWidget()
+    w.max_framerate = 10
+    w.downscale = 2.5
+    track = OutboundVideoTrack(Camera(640, 480, clock_rate=90000), w)
+
+    async def main():
+        return [await track.recv() for _ in range(4)]
+
+    frames = asyncio.run(main())
+    # 30 fps limited to 10 fps
+    assert [frame.pts for frame in frames] == [0, 9000, 18000, 27000]
+    assert (frames[0].width, frames[0].height) == (256, 192)
+    assert track.skipped_frames == 6
+
+
+def test_ice_mode_and_candidates():
+    w = WebCamWidget()
+    assert w.get_ice_servers(host_only=True) == []
+    assert len(w.get_ice_servers()) == 1
+    w.iceServers = ['stun:stun.example.com']
+    # the configured servers are always used in the auto mode
+    assert len(w.get_ice_servers(host_only=True)) == 1
+    w.ice_mode = 'host'
+    assert w.get_ice_servers() == []
+    candidate = parse_ice_candidate({
+        "candidate": "candidate:1 1 udp 2122260223 192.168.1.2 54321 typ host generation 0",
+        "sdpMid": "0",
+        "sdpMLineIndex": 0,
+    })
+    assert candidate is not None
+    assert (candidate.ip, candidate.port, candidate.type, candidate.sdpMid) == ("192.168.1.2", 54321, "host", "0")
+    assert parse_ice_candidate(None) is None
+    assert parse_ice_candidate({ "candidate": "", "sdpMid": "0" }) is None
+
+
+def test_concurrent_posters_restore_stdout():
+    w = WebCamWidget()
+
+    async def slow(frame):
+        print("slow")
+        await asyncio.sleep(0.02)
+        print("slow done")
+
+    async def fast(frame):
+        print("fast")
+        await asyncio.sleep(0.01)
+
+    w.add_video_poster(slow)
+    w.add_video_poster(fast)
+    output = Output()
+    track = VideoTransformTrack(Camera(), w, output)
+
+    async def main():
+        frame = await Camera().recv()
+        stdout = sys.stdout
+        # the batches of two frames overlap, and exit in another order than they enter
+        await asyncio.gather(
+            track.post(frame, frame, None, concurrent=True),
+            track.post(frame, frame, None, concurrent=True),
+        )
+        print("kernel")
+        return stdout
+
+    stdout = asyncio.run(main())
+    assert sys.stdout is stdout
+    texts = "".join(item["text"] for item in output.outputs)
+    assert sorted(texts.split()) == sorted(["slow", "slow", "slow", "slow", "done", "done", "fast", "fast"])
+    assert "kernel" not in texts
+
+
+class Encoder:
+    target_bitrate = 1000000
+
+    def encode(self, frame, force_keyframe=False):
+        return [], 0
+
+
+def test_sender_encoder(caplog, monkeypatch):
+    monkeypatch.setattr(webcam, '_missing_encoder_logged', False)
+
+    async def main():
+        pc = RTCPeerConnection()
+        sender = pc.addTrack(Camera())
+        # fails when aiortc renames the private encoder, see the pinned versions in pyproject.toml
+        assert hasattr(sender, '_RTCRtpSender__encoder')
+        assert _get_sender_encoder(sender) is None
+        assert caplog.records == []
+        sender._RTCRtpSender__encoder = encoder = Encoder()
+        w = WebCamWidget()
+        w.max_bitrate = 300000
+        track = OutboundVideoTrack(Camera(640, 480, clock_rate=90000), w)
+        track.sender = sender
+        for _ in range(2):
+            await track.recv()
+            encoder.encode(None)
+        # clamped, and wrapped only once
+        assert encoder.target_bitrate == 300000
+        assert track.encoded_frames == 2
+        await pc.close()
+
+    asyncio.run(main())
+    # without the attribute, the encoder is skipped and logged once
+    assert _get_sender_encoder(object()) is None
+    assert _get_sender_encoder(object()) is None
+    assert len([record for record in caplog.records if '_RTCRtpSender__encoder' in record.getMessage()]) == 1
@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any as AnyType
+from typing import cast
+
+from aiortc import (RTCConfiguration, RTCPeerConnection,
+                    RTCSessionDescription)
+from aiortc.contrib.media import MediaStreamTrack
+from aiortc.mediastreams import MediaStreamError
+from av import VideoFrame
+from ipywidgets import DOMWidget
+from traitlets import Any, Bool, Enum, Float, List, Unicode, dlink
+
+from .common import BaseWidget, run_in_background
+from .quality import QualityController
+from .webcam import MediaTransformTrack, OutboundVideoTrack, WebCamWidget
+
+logger = logging.getLogger("ipywebcam")
+
+
+class ProcessedTrackProxy(MediaStreamTrack):
+    """A video track following the processed track of a widget through a relay subscription.
+
+    The transformers run once in the track of the widget, the proxy only receives the results. When the widget reconnects,
+    the proxy moves to the new processed track, so the viewer peers do not need to reconnect. Until the widget is connected, recv waits.
+    """
+    kind = 'video'
+
+    def __init__(self, source: WebCamWidget) -> None:
+        super().__init__()
+        self.source = source
+        self._current: MediaTransformTrack | None = None
+        self._subscription: MediaStreamTrack | None = None
+
+    async def recv(self) -> VideoFrame:
+        while True:
+            track = self.source.get_processed_track(self.kind)
+            if track is None or (track is self._current and self._subscription is None):
+                await self.source.wait_processed_track(self.kind, exclude=self._current)
+                continue
+            if track is not self._current:
+                self._current = track
+                # unbuffered, a slow viewer only skips frames and never delays the others
+                self._subscription = track.relay.subscribe(track, buffered=False)
+            assert self._subscription is not None
+            try:
+                return cast(VideoFrame, await self._subscription.recv())
+            except MediaStreamError:
+                # the processed track ended, wait for the next one
+                self._subscription = None
+
+    def stop(self) -> None:
+        super().stop()
+        if self._subscription is not None:
+            self._subscription.stop()
+            self._subscription = None
+        self._current = None
+
+
+class WebCamViewer(DOMWidget, BaseWidget):
+    """A receive only view of the processed video of a WebCamWidget.
+
+    Any number of viewers can show the same processed camera. The frames are transformed once by the source widget and
+    published to the peer of each viewer by the relay, so only the encoding is done per viewer. The overlays of the source are forwarded too,
+    and the max_bitrate, max_framerate, downscale and adaptive_quality of the source apply to the video of the viewers as well.
+    """
+    _model_name = Unicode(cast(AnyType, 'WebCamViewerModel')).tag(sync=True)
+    _view_name = Unicode(cast(AnyType, 'WebCamViewerView')).tag(sync=True)
+    iceServers = List(Any(), default_value=[]).tag(sync=True) # type: ignore
+    ice_mode = Enum(set(['auto', 'default', 'host']), default_value='auto').tag(sync=True) # type: ignore
+    autoplay = Bool(True, allow_none=True).tag(sync=True) # type: ignore
+    controls = Bool(True, allow_none=True).tag(sync=True) # type: ignore
+    width = Float(default_value=None, allow_none=True).tag(sync=True) # type: ignore
+    height = Float(default_value=None, allow_none=True).tag(sync=True) # type: ignore
+    playsInline = Bool(True, allow_none=True).tag(sync=True) # type: ignore
+    muted = Bool(True, allow_none=True).tag(sync=True) # type: ignore
+    source: WebCamWidget
+    peers: dict[str, RTCPeerConnection]
+    outbound: dict[str, OutboundVideoTrack]
+
+    def __init__(self, source: WebCamWidget, **kwargs) -> None:
+        super().__init__(logger=logger, **kwargs)
+        self.source = source
+        self.peers = {}
+        self.outbound = {}
+        dlink((source, 'iceServers'), (self, 'iceServers'))
+        dlink((source, 'ice_mode'), (self, 'ice_mode'))
+        self.add_answer("exchange_peer", self.answer_exchange_peer)
+        source.add_viewer(self)
+        # the peers are closed when the last view is removed
+        self._view_count = 0
+        self.observe(self._on_view_count_change, "_view_count")
+
+    def _on_view_count_change(self, change: AnyType) -> None:
+        if change.new == 0 and change.old and self.peers:
+            self.close_peers()
+
+    def answer_exchange_peer(self, id: str, cmd: str, args: dict) -> None:
+        if "desc" in args:
+            asyncio.create_task(self.exchange_peer(id, args["desc"], host_only=bool(args.get("host_only"))))
+
+    async def exchange_peer(self, id: str, client_desc: dict[str, str], host_only: bool = False) -> None:
+        try:
+            await self.close_peer(id)
+            pc = self.peers[id] = RTCPeerConnection(RTCConfiguration(self.source.get_ice_servers(host_only=host_only)))
+
+            @pc.on("connectionstatechange")
+            async def on_connectionstatechange():
+                logger.info(f"[viewer {id}] Connection state is {pc.connectionState}")
+                if pc.connectionState == "failed" and self.peers.get(id) is pc:
+                    await self.close_peer(id)
+
+            await pc.setRemoteDescription(RTCSessionDescription(**client_desc))
+            outbound = OutboundVideoTrack(ProcessedTrackProxy(self.source), self.source)
+            outbound.sender = pc.addTrack(outbound)
+            if self.source.adaptive_quality:
+                outbound.controller = QualityController()
+                outbound.controller.attach(outbound.sender)
+            self.outbound[id] = outbound
+            answer = await pc.createAnswer()
+            assert answer is not None
+            await pc.setLocalDescription(answer)
+            self.answer("exchange_peer", id, { "sdp": pc.localDescription.sdp, "type": pc.localDescription.type })
+        except Exception as e:
+            logger.exception(e)
+
+    async def close_peer(self, id: str) -> None:
+        pc = self.peers.pop(id, None)
+        outbound = self.outbound.pop(id, None)
+        if outbound is not None:
+            outbound.stop()
+        if pc is not None:
+            await pc.close()
+
+    def close_peers(self) -> None:
+        """Close the peers in the background. Await aclose_peers to wait for it."""
+        run_in_background(self.aclose_peers())
+
+    async def aclose_peers(self) -> None:
+        await asyncio.gather(*[self.close_peer(id) for id in list(self.peers.keys())])
+
+    async def aclose(self) -> None:
+        """Close the viewer and wait until its peers are closed."""
+        await self.aclose_peers()
+        self.close()
+
+    def close(self) -> None:
+        self.source.remove_viewer(self)
+        if self.peers:
+            self.close_peers()
+        super().close()
@@ -10,26 +10,41 @@ TODO: Add module docstring
 
 import asyncio
 import inspect
+import html
 import logging
+import time
 import uuid
 from abc import ABCMeta, abstractmethod
 from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
 from dataclasses import dataclass, field
 from os import path
 from threading import RLock
+from weakref import WeakKeyDictionary
 from typing import Any as AnyType
 from typing import Awaitable, Callable, Generic, Optional, TypeVar, Union, cast
 
-from aiortc import (RTCConfiguration, RTCIceServer, RTCPeerConnection,
-                    RTCSessionDescription)
-from aiortc.contrib.media import MediaRelay, MediaStreamTrack
+from aiortc import (RTCConfiguration, RTCIceCandidate, RTCIceServer,
+                    RTCPeerConnection, RTCRtpSender, RTCSessionDescription)
+from aiortc.contrib.media import MediaBlackhole, MediaRelay, MediaStreamTrack
+from aiortc.mediastreams import MediaStreamError
+from aiortc.sdp import candidate_from_sdp
 from av import AudioFrame, VideoFrame
 from IPython import display
-from ipywidgets import DOMWidget, Dropdown, Output
-from traitlets import Any, Bool, Dict, Enum, Float, List, Unicode, link
+from ipywidgets import HTML, DOMWidget, Dropdown, Output
+from traitlets import Any, Bool, Dict, Enum, Float, Int, List, Unicode, link
 
 from ._frontend import module_name, module_version
-from .common import BaseWidget, ContextHelper, OutputContextManager
+from .common import (BaseWidget, BufferedOutput, ContextHelper,
+                     OutputContextManager, StreamCapture, run_in_background)
+from .executors import TransformerProcessPool, TransformerThreadPool
+from .stats import CallStats
+from .frames import (FrameConversionCache, VideoFramePool, check_packed_format,
+                     copy_frame, ndarray_view)
+from .overlay import Overlay
+from .pacing import FramePacer
+from .peerstats import SAMPLE_FIELDS, PeerStatsRecorder
+from .quality import QualityController
 
 logger = logging.getLogger("ipywebcam")
 logger.setLevel(logging.DEBUG)
@@ -39,89 +54,813 @@ logger.addHandler(fh)
 
 logger.info("I am loaded")
 
-relay = MediaRelay()
-
 MT = TypeVar('MT', VideoFrame, AudioFrame)
+
+# the transformer and the copy of its context used by the current task, see MediaTransformTrack.apply_transformer
+_call_context: ContextVar[tuple["MediaTransformer", dict] | None] = ContextVar('ipywebcam_call_context', default=None)
+
+# the setup and teardown hooks of the transformers, called with the source track
+TrackHook = Callable[[MediaStreamTrack], Union[None, Awaitable[None]]]
+
+@dataclass
+class RateState:
+    frame_count: int = 0
+    last_time: float | None = None
+    last_output: AnyType = None
+
 class MediaTransformer(Generic[MT]):
     enabled: bool = True
-    def __init__(self, callback: Callable[[MT, dict, MediaStreamTrack], MT | None | Awaitable[MT | None]], context: dict | None = None) -> None:
+    # the max number of the frames the transformer works on at the same time in the pipelined mode, only for stateless transformers
+    concurrency: int = 1
+    run_in_thread: bool | None
+    name: str
+    stats: CallStats
+    every_n_frames: int | None
+    max_hz: float | None
+    apply_result: Callable[[MT, AnyType], MT | None] | None
+    setup: TrackHook | None
+    teardown: TrackHook | None
+    def __init__(
+        self,
+        callback: Callable[[MT, dict, MediaStreamTrack], MT | None | Awaitable[MT | None]],
+        context: dict | None = None,
+        run_in_thread: bool | None = None,
+        every_n_frames: int | None = None,
+        max_hz: float | None = None,
+        apply_result: Callable[[MT, AnyType], MT | None] | None = None,
+        setup: TrackHook | None = None,
+        teardown: TrackHook | None = None,
+    ) -> None:
+        if every_n_frames is not None and every_n_frames <= 0:
+            raise ValueError('every_n_frames must be integer greater than 0')
+        if max_hz is not None and max_hz <= 0:
+            raise ValueError('max_hz must be greater than 0')
         self.callback = callback
         self.context = context if context is not None else {}
+        self.run_in_thread = run_in_thread
+        self.every_n_frames = every_n_frames
+        self.max_hz = max_hz
+        self.apply_result = apply_result
+        self.setup = setup
+        self.teardown = teardown
+        self.name = getattr(callback, '__qualname__', None) or repr(callback)
+        self.stats = CallStats()
         self.iscoroutinefunction = inspect.iscoroutinefunction(self.callback)
         sig = inspect.signature(self.callback)
         self.require_ctx =  len(sig.parameters) > 1
         self.require_track = len(sig.parameters) > 2
+        self._rate_states: WeakKeyDictionary[MediaStreamTrack, RateState] = WeakKeyDictionary()
+        
+    @property
+    def call_context(self) -> dict:
+        """The context passed to the callback, a copy for each frame when the frames are transformed concurrently."""
+        current = _call_context.get()
+        return current[1] if current is not None and current[0] is self else self.context
         
-    async def transform(self, frame: MT, track: MediaStreamTrack) -> MT | None:
+    @property
+    def has_lifecycle(self) -> bool:
+        return self.setup is not None or self.teardown is not None
+    
+    async def _run_hook(self, hook: TrackHook, track: MediaStreamTrack) -> None:
+        if inspect.iscoroutinefunction(hook):
+            await hook(track)
+        else:
+            # the sync hooks, such as loading a model, must not block the event loop
+            await asyncio.to_thread(hook, track)
+    
+    async def run_setup(self, track: MediaStreamTrack) -> None:
+        if self.setup is None:
+            return
+        try:
+            await self._run_hook(self.setup, track)
+        except Exception:
+            logger.exception(f'The setup of the transformer {self.name} failed, the frames pass through it.')
+            raise
+        
+    async def run_teardown(self, track: MediaStreamTrack) -> None:
+        if self.teardown is None:
+            return
+        try:
+            await self._run_hook(self.teardown, track)
+        except Exception:
+            logger.exception(f'The teardown of the transformer {self.name} failed.')
+        
+    def get_rate_state(self, track: MediaStreamTrack) -> RateState:
+        state = self._rate_states.get(track)
+        if state is None:
+            state = self._rate_states[track] = RateState()
+        return state
+        
+    def should_skip(self, frame: MT, track: MediaStreamTrack) -> bool:
+        """Check whether the callback should be skipped for the frame according to every_n_frames and max_hz.
+        The time of the frame is used for max_hz, or the wall time if the frame has no time.
+        """
+        if self.every_n_frames is None and self.max_hz is None:
+            return False
+        state = self.get_rate_state(track)
+        state.frame_count += 1
+        if self.every_n_frames is not None and (state.frame_count - 1) % self.every_n_frames != 0:
+            return True
+        if self.max_hz is not None:
+            now = frame.time if frame.time is not None else time.monotonic()
+            if state.last_time is not None and 0 <= now - state.last_time < 1.0 / self.max_hz - 1e-6:
+                return True
+            state.last_time = now
+        return False
+    
+    def accept_output(self, frame: MT, output: AnyType, track: MediaStreamTrack) -> MT:
+        """Get the output frame from the return value of the callback.
+        Any return value other than a frame is a result, which is remembered and drawn on the frame by apply_result if provided.
+        """
+        if self.every_n_frames is not None or self.max_hz is not None:
+            self.get_rate_state(track).last_output = output
+        if output is None:
+            return frame
+        if isinstance(output, (VideoFrame, AudioFrame)):
+            return cast(MT, output)
+        return self._apply_result(frame, output)
+    
+    def reuse_output(self, frame: MT, track: MediaStreamTrack, frame_pool: VideoFramePool | None = None) -> MT:
+        """Get the output frame for a skipped frame from the last output of the callback.
+        The last output may still be waiting in the relay or the encoder, so a copy of it gets the pts of the frame.
+        """
+        last_output = self.get_rate_state(track).last_output
+        if last_output is None:
+            return frame
+        if isinstance(last_output, VideoFrame):
+            out_frame: AnyType = copy_frame(last_output, frame_pool)
+        elif isinstance(last_output, AudioFrame):
+            out_frame = AudioFrame.from_ndarray(last_output.to_ndarray(), format=last_output.format.name, layout=last_output.layout.name)
+            out_frame.sample_rate = last_output.sample_rate
+        else:
+            return self._apply_result(frame, last_output)
+        out_frame.pts = frame.pts
+        out_frame.time_base = frame.time_base
+        return cast(MT, out_frame)
+    
+    def _apply_result(self, frame: MT, result: AnyType) -> MT:
+        if self.apply_result is None:
+            return frame
+        out_frame = self.apply_result(frame, result)
+        return out_frame if out_frame is not None else frame
+        
+    def call(self, frame: MT, track: MediaStreamTrack) -> MT | None:
+        if self.require_ctx and self.require_track:
+            out_frame = self.callback(frame, self.call_context, track)
+        elif self.require_ctx:
+            out_frame = self.callback(frame, self.call_context) # type: ignore
+        else:
+            out_frame = self.callback(frame) # type: ignore
+        return cast(MT | None, out_frame)
+        
+    async def transform(self, frame: MT, track: MediaStreamTrack, pool: TransformerThreadPool | None = None) -> MT | None:
         if not self.enabled:
             return frame
         if self.iscoroutinefunction:
             if self.require_ctx and self.require_track:
-                out_frame = await self.callback(frame, self.context, track) # type: ignore
+                out_frame = await self.callback(frame, self.call_context, track) # type: ignore
             elif self.require_ctx:
-                out_frame = await self.callback(frame, self.context) # type: ignore
+                out_frame = await self.callback(frame, self.call_context) # type: ignore
             else:
                 out_frame = await self.callback(frame) # type: ignore
+        elif pool is not None:
+            out_frame = await pool.run(self.call, frame, track)
         else:
-            if self.require_ctx and self.require_track:
-                out_frame = self.callback(frame, self.context, track)
-            elif self.require_ctx:
-                out_frame = self.callback(frame, self.context) # type: ignore
-            else:
-                out_frame = self.callback(frame) # type: ignore
+            out_frame = self.call(frame, track)
         return cast(MT | None, out_frame)
 
 
+NdarrayCallback = Callable[..., AnyType]
+
+class NdarrayTransformer(MediaTransformer[VideoFrame]):
+    """A video transformer whose callback accept a writable ndarray view of the frame and modify it in place.
+    
+    The frame behind the view is converted from the input frame, or comes from the frame pool of the pipeline,
+    so the callback should neither call to_ndarray nor VideoFrame.from_ndarray. pts and time_base are kept by the pipeline.
+    The callback may still return a new ndarray of the same format, which is converted to a new frame.
+    """
+    format: str
+    frame_pool: VideoFramePool
+    
+    def __init__(
+        self,
+        callback: NdarrayCallback,
+        format: str = 'bgr24',
+        context: dict | None = None,
+        run_in_thread: bool | None = None,
+        frame_pool: VideoFramePool | None = None,
+        setup: TrackHook | None = None,
+        teardown: TrackHook | None = None,
+    ) -> None:
+        super().__init__(callback, context=context, run_in_thread=run_in_thread, setup=setup, teardown=teardown)
+        check_packed_format(format)
+        self.format = format
+        self.frame_pool = frame_pool if frame_pool is not None else VideoFramePool()
+        
+    def prepare(self, frame: VideoFrame) -> VideoFrame:
+        """Get a frame in the target format owned by the pipeline, which can be written in place."""
+        if frame.format.name != self.format:
+            out_frame = frame.reformat(format=self.format)
+            self.frame_pool.adopt(out_frame)
+        elif self.frame_pool.owns(frame):
+            out_frame = frame
+        else:
+            out_frame = self.frame_pool.acquire(frame.width, frame.height, self.format)
+            ndarray_view(out_frame)[...] = ndarray_view(frame)
+        out_frame.pts = frame.pts
+        out_frame.time_base = frame.time_base
+        return out_frame
+        
+    async def transform(self, frame: VideoFrame, track: MediaStreamTrack, pool: TransformerThreadPool | None = None) -> VideoFrame | None:
+        if not self.enabled:
+            return frame
+        out_frame = self.prepare(frame)
+        img = ndarray_view(out_frame)
+        out_img = await super().transform(img, track, pool) # type: ignore
+        if out_img is not None and out_img is not img:
+            # the prepared frame is not sent, and nothing else references it
+            self.frame_pool.release(out_frame)
+            out_frame = VideoFrame.from_ndarray(out_img, format=self.format)
+            out_frame.pts = frame.pts
+            out_frame.time_base = frame.time_base
+        return out_frame
+
+
+class ProcessTransformer(MediaTransformer[VideoFrame]):
+    """A video transformer whose sync callback runs in a worker process of a TransformerProcessPool.
+    
+    The callback accept an ndarray of shape (height, width, channels) living in the shared memory, and modify it in place and return None,
+    or return a small picklable result, which is passed to apply_result with the frame. The callback must be picklable, see TransformerProcessPool.
+    The frames are still sent in order. In the pipelined mode, up to concurrency frames, the number of the workers by default, are processed at the same time.
+    """
+    format: str
+    process_pool: TransformerProcessPool
+    frame_pool: VideoFramePool
+    
+    def __init__(
+        self,
+        callback: Callable[..., AnyType],
+        process_pool: TransformerProcessPool,
+        format: str = 'bgr24',
+        frame_pool: VideoFramePool | None = None,
+        apply_result: Callable[[VideoFrame, AnyType], VideoFrame | None] | None = None,
+    ) -> None:
+        if inspect.iscoroutinefunction(callback):
+            raise ValueError('The callback of a process transformer must be a sync function.')
+        super().__init__(callback, apply_result=apply_result)
+        check_packed_format(format)
+        self.format = format
+        self.process_pool = process_pool
+        self.frame_pool = frame_pool if frame_pool is not None else VideoFramePool()
+        self.concurrency = process_pool.max_workers
+        
+    async def transform(self, frame: VideoFrame, track: MediaStreamTrack, pool: TransformerThreadPool | None = None) -> AnyType:
+        if not self.enabled:
+            return frame
+        src_frame = frame if frame.format.name == self.format else frame.reformat(format=self.format)
+        out_frame = self.frame_pool.acquire(frame.width, frame.height, self.format)
+        result = await self.process_pool.run(self.callback, ndarray_view(src_frame), out=ndarray_view(out_frame))
+        if src_frame is not frame:
+            self.frame_pool.release(src_frame)
+        if result is not None:
+            self.frame_pool.release(out_frame)
+        if result is None:
+            out_frame.pts = frame.pts
+            out_frame.time_base = frame.time_base
+            return out_frame
+        if hasattr(result, 'shape') and hasattr(result, 'dtype'):
+            out_frame = VideoFrame.from_ndarray(result, format=self.format)
+            out_frame.pts = frame.pts
+            out_frame.time_base = frame.time_base
+            return out_frame
+        return result
+
+
+class BatchTransformer(MediaTransformer[VideoFrame]):
+    """A video transformer collecting the frames of all the tracks using it, and calling the callback once per batch.
+    
+    The same instance can be shared by several widgets by WebCamWidget.attach_video_transformer.
+    The callback accept a stacked ndarray of shape (n, height, width, channels) and return a sequence of n results in the same order.
+    Each result can be an ndarray of the format, which becomes the output frame, a frame, None to keep the frame,
+    or any other object, which is passed to apply_result with the frame.
+    A batch is processed when batch_size frames are collected or max_delay seconds after its first frame.
+    """
+    batch_size: int
+    max_delay: float
+    format: str
+    width: int | None
+    height: int | None
+    batches: int
+    
+    def __init__(
+        self,
+        callback: Callable[..., AnyType],
+        batch_size: int = 8,
+        max_delay: float = 0.01,
+        format: str = 'bgr24',
+        width: int | None = None,
+        height: int | None = None,
+        run_in_thread: bool | None = None,
+        apply_result: Callable[[VideoFrame, AnyType], VideoFrame | None] | None = None,
+    ) -> None:
+        super().__init__(callback, run_in_thread=run_in_thread, apply_result=apply_result)
+        if batch_size <= 0:
+            raise ValueError('batch_size must be integer greater than 0')
+        check_packed_format(format)
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.format = format
+        self.width = width
+        self.height = height
+        self.batches = 0
+        self._pending: dict[tuple[int, ...], list[tuple[AnyType, asyncio.Future]]] = {}
+        self._timers: dict[tuple[int, ...], asyncio.TimerHandle] = {}
+        self._runs: set[asyncio.Task] = set()
+        
+    async def transform(self, frame: VideoFrame, track: MediaStreamTrack, pool: TransformerThreadPool | None = None) -> AnyType:
+        if not self.enabled:
+            return frame
+        img = frame.to_ndarray(format=self.format, width=self.width, height=self.height)
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future = loop.create_future()
+        # only the frames of the same shape can be stacked
+        key = img.shape
+        batch = self._pending.setdefault(key, [])
+        batch.append((img, future))
+        if len(batch) >= self.batch_size:
+            self._flush(key, pool)
+        elif len(batch) == 1:
+            self._timers[key] = loop.call_later(self.max_delay, self._flush, key, pool)
+        result = await future
+        if isinstance(result, VideoFrame):
+            return result
+        if result is not None and hasattr(result, 'shape') and hasattr(result, 'dtype'):
+            out_frame = VideoFrame.from_ndarray(result, format=self.format)
+            out_frame.pts = frame.pts
+            out_frame.time_base = frame.time_base
+            return out_frame
+        return result
+    
+    def _flush(self, key: tuple[int, ...], pool: TransformerThreadPool | None) -> None:
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(key, None)
+        if batch:
+            # the loop only keeps a weak reference to the task
+            task = asyncio.ensure_future(self._run(batch, pool))
+            self._runs.add(task)
+            task.add_done_callback(self._runs.discard)
+            
+    async def _run(self, batch: list[tuple[AnyType, asyncio.Future]], pool: TransformerThreadPool | None) -> None:
+        import numpy as np
+        self.batches += 1
+        try:
+            stacked = np.stack([img for img, _ in batch])
+            if self.iscoroutinefunction:
+                results = await self.callback(stacked) # type: ignore
+            elif pool is not None:
+                results = await pool.run(self.callback, stacked) # type: ignore
+            else:
+                results = self.callback(stacked) # type: ignore
+            if results is None:
+                results = [None] * len(batch)
+            elif len(results) != len(batch):
+                raise ValueError(f'The batch callback {self.name} should return {len(batch)} results, but got {len(results)}.')
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+
 class WithMediaTransformers:
     video_transformers: list[MediaTransformer[VideoFrame]]
     video_posters: list[MediaTransformer[VideoFrame]]
     audio_transformers: list[MediaTransformer[AudioFrame]]
     audio_posters: list[MediaTransformer[AudioFrame]]
+    run_in_thread: bool
+    thread_pool: TransformerThreadPool | None
+    process_pool: TransformerProcessPool | None
+    frame_pool: VideoFramePool
+    drop_stale_frames: bool
+    pipelined: bool
+    pipeline_queue_size: int
+    async_posters: bool
+    poster_queue_size: int
+    poster_overflow: str
+    change_threshold: float | None
+    change_thumbnail_size: tuple[int, int]
+    pacing: bool
+    pacing_delay: float
     
     def __init__(self) -> None:
         self.video_transformers = []
         self.video_posters = []
         self.audio_transformers = []
         self.audio_posters = []
+        self.run_in_thread = False
+        self.thread_pool = None
+        self.process_pool = None
+        self._own_pools: list[TransformerThreadPool | TransformerProcessPool] = []
+        self.frame_pool = VideoFramePool()
+        self.drop_stale_frames = False
+        self.pipelined = False
+        self.pipeline_queue_size = 1
+        self.async_posters = False
+        self.poster_queue_size = 8
+        self.poster_overflow = 'block'
+        self.change_threshold = None
+        self.change_thumbnail_size = (32, 24)
+        self.pacing = False
+        self.pacing_delay = 0.1
+        
+    def get_thread_pool(self) -> TransformerThreadPool:
+        if self.thread_pool is None:
+            self.thread_pool = TransformerThreadPool()
+            self._own_pools.append(self.thread_pool)
+        return self.thread_pool
+    
+    def get_process_pool(self) -> TransformerProcessPool:
+        if self.process_pool is None:
+            self.process_pool = TransformerProcessPool()
+            self._own_pools.append(self.process_pool)
+        return self.process_pool
+    
+    def shutdown_pools(self) -> None:
+        """Shut down the pools created by get_thread_pool and get_process_pool. The pools assigned by the user may be shared, so they are kept."""
+        pools, self._own_pools = self._own_pools, []
+        for pool in pools:
+            pool.shutdown(wait=False)
+            if self.thread_pool is pool:
+                self.thread_pool = None
+            if self.process_pool is pool:
+                self.process_pool = None
+        
+    def get_transformer_pool(self, transformer: MediaTransformer) -> TransformerThreadPool | None:
+        """Get the thread pool the sync callback of the transformer should run in, or None to run it in the event loop.
+        The setting of the transformer has priority over the setting of the widget.
+        """
+        run_in_thread = transformer.run_in_thread if transformer.run_in_thread is not None else self.run_in_thread
+        return self.get_thread_pool() if run_in_thread and not transformer.iscoroutinefunction else None
+    
+    def send_overlay(self, overlay: Overlay, target_id: str = "") -> None:
+        """Send the overlay of a frame to the frontend of the state target_id, which owns the track. Do nothing by default."""
+        pass
 
 class MediaTransformTrack(MediaStreamTrack, Generic[MT], metaclass=ABCMeta):
-    output: Output | None
+    output: Output | BufferedOutput | None
+    # the id of the state owning the track, the overlays are sent to its frontend only
+    state_id: str
+    drop_stale_frames: bool = False
+    received_frames: int
+    dropped_frames: int
+    unchanged_frames: int
     
-    def __init__(self, track: MediaStreamTrack, withTransformers: WithMediaTransformers, output: Output | None = None):
+    def __init__(self, track: MediaStreamTrack, withTransformers: WithMediaTransformers, output: Output | BufferedOutput | None = None, state_id: str = ""):
         super().__init__()
         self.track = track
         self.withTransformers = withTransformers
         self.output = output
+        self.state_id = state_id
+        self.received_frames = 0
+        self.dropped_frames = 0
+        self.unchanged_frames = 0
+        self._latest: MT | None = None
+        self._latest_error: BaseException | None = None
+        self._latest_event: asyncio.Event | None = None
+        self._reader: asyncio.Task | None = None
+        self._pipeline: TransformPipeline[MT] | None = None
+        self._poster_dispatcher: PosterDispatcher[MT] | None = None
+        self._overlays: dict[int | None, dict[int, Overlay]] = {}
+        self._last_overlays: dict[int, Overlay] = {}
+        self._change_reference: AnyType = None
+        self._last_output: VideoFrame | None = None
+        self._last_output_is_org = False
+        self._setups: dict[MediaTransformer[MT], asyncio.Future] = {}
+        self.pacer: FramePacer | None = None
+        # the subscriptions of the consumers, released with the track instead of kept by a module level relay
+        self.relay = MediaRelay()
         
-    async def recv(self) -> MT:
-        frame: MT = await self.track.recv()
-        org_frame = frame
-        output_context_manager = OutputContextManager(self.output) if self.output is not None else nullcontext()
-        for transformer in self.__class__.get_transformers(self.withTransformers):
-            out_frame = None
-            transformer.context[ContextHelper.KEY_ORG_FRAME] = org_frame
-            try:
-                async with output_context_manager:
-                    out_frame = await transformer.transform(frame=frame, track=self.track)
-            except Exception:
-                transformer.enabled = False
-            frame = out_frame if out_frame is not None else frame
+    def ensure_setup(self, transformer: MediaTransformer[MT]) -> bool:
+        """Start the setup of the transformer for this track if not yet, and return whether it is done.
+        Until then, the frames pass through the transformer untouched.
+        """
+        if not transformer.has_lifecycle:
+            return True
+        setup = self._setups.get(transformer)
+        if setup is None:
+            setup = self._setups[transformer] = asyncio.ensure_future(transformer.run_setup(self.track))
+        return setup.done() and not setup.cancelled() and setup.exception() is None
+    
+    def start_setup(self) -> None:
+        """Start the setup of all the transformers and posters, so they are ready before the first frames."""
+        for transformer in self.__class__.get_transformers(self.withTransformers) + self.__class__.get_posters(self.withTransformers):
+            self.ensure_setup(transformer)
             
+    async def teardown(self) -> None:
+        """Run the teardown of all the transformers set up for this track, the unfinished setups are cancelled."""
+        setups, self._setups = self._setups, {}
+        for transformer, setup in setups.items():
+            if not setup.done():
+                setup.cancel()
+            try:
+                await setup
+            except BaseException:
+                # the setup failed or was cancelled, nothing to release
+                continue
+            await transformer.run_teardown(self.track)
+        
+    async def _read_latest(self) -> None:
+        assert self._latest_event is not None
+        try:
+            while True:
+                frame = await self.track.recv()
+                self.received_frames += 1
+                if self._latest is not None:
+                    self.dropped_frames += 1
+                self._latest = frame
+                self._latest_event.set()
+        except asyncio.CancelledError:
+            raise
+        except BaseException as e:
+            self._latest_error = e
+            self._latest_event.set()
+        
+    async def _recv_source(self) -> MT:
+        """Receive the next frame from the source track.
+        When drop_stale_frames is enabled, the source track is drained by a background task and only the newest frame is kept,
+        so the transformers always work on the newest frame and the skipped frames are counted in dropped_frames.
+        """
+        if not self.drop_stale_frames:
+            frame = await self.track.recv()
+            self.received_frames += 1
+            return frame
+        if self._reader is None:
+            self._latest_event = asyncio.Event()
+            self._reader = asyncio.create_task(self._read_latest())
+        assert self._latest_event is not None
+        while self._latest is None:
+            if self._latest_error is not None:
+                raise self._latest_error
+            self._latest_event.clear()
+            await self._latest_event.wait()
+        frame, self._latest = self._latest, None
+        return frame
+        
+    async def apply_transformer(
+        self,
+        transformer: MediaTransformer[MT],
+        org_frame: MT,
+        frame: MT,
+        frame_cache: FrameConversionCache | None,
+        output_context_manager: AnyType,
+        isolated: bool = False,
+    ) -> MT:
+        """Run the transformer on the frame. With isolated, the callback gets a copy of the context of the transformer,
+        so the frames transformed at the same time do not see the original frame of each other.
+        """
+        if not transformer.enabled or not self.ensure_setup(transformer):
+            return frame
+        if transformer.should_skip(org_frame, self.track):
+            transformer.stats.record_skip()
+            self._reuse_overlay(org_frame, id(transformer.context))
+            return transformer.reuse_output(frame, self.track, self.withTransformers.frame_pool)
+        out_frame = None
+        context = transformer.context
+        token = None
+        if isolated:
+            context = dict(context)
+            context[ContextHelper.KEY_OVERLAY_LAYER] = id(transformer.context)
+            token = _call_context.set((transformer, context))
+        context[ContextHelper.KEY_ORG_FRAME] = org_frame
+        context[ContextHelper.KEY_FRAME_CACHE] = frame_cache
+        context[ContextHelper.KEY_TRANSFORM_TRACK] = self
+        start = time.perf_counter()
+        try:
+            async with output_context_manager:
+                out_frame = await transformer.transform(frame=frame, track=self.track, pool=self.withTransformers.get_transformer_pool(transformer))
+            transformer.stats.record(time.perf_counter() - start)
+        except Exception as e:
+            transformer.stats.record(time.perf_counter() - start, e)
+            logger.exception(f'The transformer {transformer.name} is disabled because of the exception.')
+            transformer.enabled = False
+        finally:
+            if token is not None:
+                _call_context.reset(token)
+        return transformer.accept_output(frame, out_frame, self.track)
+    
+    async def apply_poster(self, poster: MediaTransformer[MT], org_frame: MT, frame: MT, frame_cache: FrameConversionCache | None, output_context_manager: AnyType) -> None:
+        if not poster.enabled or not self.ensure_setup(poster):
+            return
+        poster.context[ContextHelper.KEY_ORG_FRAME] = org_frame
+        poster.context[ContextHelper.KEY_FRAME_CACHE] = frame_cache
+        poster.context[ContextHelper.KEY_TRANSFORM_TRACK] = self
+        start = time.perf_counter()
+        try:
+            async with output_context_manager:
+                await poster.transform(frame=frame, track=self.track, pool=self.withTransformers.get_transformer_pool(poster))
+            poster.stats.record(time.perf_counter() - start)
+        except Exception as e:
+            poster.stats.record(time.perf_counter() - start, e)
+            logger.exception(f'The poster {poster.name} is disabled because of the exception.')
+            poster.enabled = False
+    
+    async def post(self, org_frame: MT, frame: MT, frame_cache: FrameConversionCache | None, concurrent: bool = False) -> None:
+        posters = self.__class__.get_posters(self.withTransformers)
+        if concurrent:
+            # one context for the batch, the tasks of the posters inherit it
+            async with self.create_output_context():
+                await asyncio.gather(*[self.apply_poster(poster, org_frame, frame, frame_cache, nullcontext()) for poster in posters])
+        else:
+            output_context_manager = self.create_output_context()
+            for poster in posters:
+                await self.apply_poster(poster, org_frame, frame, frame_cache, output_context_manager)
+        if frame_cache is not None:
+            frame_cache.clear()
+    
+    async def finish(self, org_frame: MT, frame: MT, frame_cache: FrameConversionCache | None) -> MT:
+        if isinstance(frame, VideoFrame):
+            # the frame leaves the pipeline, the relay and the encoders may hold it from now on
+            self.withTransformers.frame_pool.disown(frame)
         if org_frame is not None and frame is not None:
             if hasattr(org_frame, "pts") and hasattr(frame, "pts") and frame.pts is None:
                 frame.pts = org_frame.pts
             if hasattr(org_frame, "time_base") and hasattr(frame, "time_base") and frame.time_base is None:
                 frame.time_base = org_frame.time_base
-                
-        for poster in self.__class__.get_posters(self.withTransformers):
-            poster.context[ContextHelper.KEY_ORG_FRAME] = org_frame
-            try:
-                async with output_context_manager:
-                    await poster.transform(frame=frame, track=self.track)
-            except Exception:
-                poster.enabled = False
+        
+        if self.withTransformers.async_posters:
+            if len(self.__class__.get_posters(self.withTransformers)) > 0:
+                if self._poster_dispatcher is None:
+                    self._poster_dispatcher = PosterDispatcher(self, self.withTransformers.poster_queue_size, self.withTransformers.poster_overflow)
+                await self._poster_dispatcher.put(PipelineItem(org_frame=org_frame, frame=frame, frame_cache=frame_cache))
+            elif frame_cache is not None:
+                frame_cache.clear()
+        else:
+            await self.post(org_frame, frame, frame_cache)
+        if self._overlays or self._last_overlays:
+            self._send_overlay(org_frame)
         return frame
     
+    def get_overlay(self, org_frame: MT, layer: int) -> Overlay:
+        """Get the overlay of a transformer for the frame. The overlays of all the transformers are merged and sent to the frontend
+        once the frame goes through the transformers.
+        """
+        layers = self._overlays.setdefault(org_frame.pts, {})
+        overlay = layers.get(layer)
+        if overlay is None:
+            assert isinstance(org_frame, VideoFrame)
+            overlay = layers[layer] = Overlay(org_frame.pts, org_frame.time_base, org_frame.width, org_frame.height)
+        return overlay
+    
+    def _reuse_overlay(self, org_frame: MT, layer: int) -> None:
+        last_overlay = self._last_overlays.get(layer)
+        if last_overlay is not None:
+            self.get_overlay(org_frame, layer).extend(last_overlay)
+    
+    def _send_overlay(self, org_frame: MT) -> None:
+        layers = self._overlays.pop(org_frame.pts, {})
+        # the overlays added by the async posters of the former frames are too late to be drawn
+        self._overlays = { pts: o for pts, o in self._overlays.items() if pts is not None and org_frame.pts is not None and pts > org_frame.pts }
+        if not layers and not self._last_overlays:
+            return
+        # a layer missing on this frame is cleared, so the frontend gets an empty overlay once all the layers are gone
+        self._last_overlays = layers
+        assert isinstance(org_frame, VideoFrame)
+        overlay = Overlay(org_frame.pts, org_frame.time_base, org_frame.width, org_frame.height)
+        for layer in layers.values():
+            overlay.extend(layer)
+        self.withTransformers.send_overlay(overlay, self.state_id)
+    
+    def is_unchanged(self, frame_cache: FrameConversionCache | None) -> bool:
+        """Whether the frame is nearly the same as the last processed one, so the transformers can be skipped.
+        The frames are compared by the mean absolute difference of their gray thumbnails, see WithMediaTransformers.change_threshold.
+        """
+        threshold = self.withTransformers.change_threshold
+        if threshold is None or frame_cache is None:
+            return False
+        width, height = self.withTransformers.change_thumbnail_size
+        thumbnail = frame_cache.get_ndarray(format='gray', width=width, height=height)
+        reference = self._change_reference
+        if reference is not None and reference.shape == thumbnail.shape and (self._last_output is not None or self._last_output_is_org):
+            import numpy as np
+            if np.abs(thumbnail.astype(np.int16) - reference).mean() < threshold:
+                self.unchanged_frames += 1
+                return True
+        self._change_reference = thumbnail
+        return False
+    
+    def remember_output(self, org_frame: MT, frame: MT) -> None:
+        if self.withTransformers.change_threshold is None:
+            return
+        self._last_output_is_org = frame is org_frame
+        self._last_output = None if self._last_output_is_org else cast(VideoFrame, frame)
+    
+    def reuse_last_output(self, org_frame: MT) -> MT:
+        """Get the output of an unchanged frame, a copy of the last output with the pts of the frame, and keep the last overlays."""
+        for layer in list(self._last_overlays.keys()):
+            self._reuse_overlay(org_frame, layer)
+        if self._last_output is None:
+            return org_frame
+        # the last output may still be waiting in the relay, so it is copied instead of being sent again with a new pts
+        frame = copy_frame(self._last_output, self.withTransformers.frame_pool)
+        frame.pts = org_frame.pts
+        frame.time_base = org_frame.time_base
+        return cast(MT, frame)
+    
+    async def recv(self) -> MT:
+        if self.readyState != 'live':
+            # ends the reading task of the relay
+            raise MediaStreamError
+        if self.withTransformers.pacing and self.kind == 'video':
+            return await self._recv_paced()
+        return await self._recv_transformed()
+    
+    async def _recv_paced(self) -> MT:
+        """Emit the transformed frames at the cadence of their timestamps, see FramePacer."""
+        if self.pacer is None or self.pacer.delay != self.withTransformers.pacing_delay:
+            self.pacer = FramePacer(delay=self.withTransformers.pacing_delay)
+        loop = asyncio.get_running_loop()
+        while True:
+            frame = await self._recv_transformed()
+            if frame.time is None:
+                return frame
+            target = self.pacer.schedule(frame.time, loop.time())
+            if target is None:
+                continue
+            delay = target - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self.pacer.record(target, loop.time())
+            return frame
+    
+    async def _recv_transformed(self) -> MT:
+        if self.withTransformers.pipelined and self.kind == 'video':
+            return await self._recv_pipelined()
+        frame: MT = await self._recv_source()
+        org_frame = frame
+        frame_cache = FrameConversionCache(org_frame) if isinstance(org_frame, VideoFrame) else None
+        if self.is_unchanged(frame_cache):
+            return await self.finish(org_frame, self.reuse_last_output(org_frame), frame_cache)
+        output_context_manager = self.create_output_context()
+        for transformer in self.__class__.get_transformers(self.withTransformers):
+            frame = await self.apply_transformer(transformer, org_frame, frame, frame_cache, output_context_manager)
+        self.remember_output(org_frame, frame)
+        return await self.finish(org_frame, frame, frame_cache)
+    
+    async def _recv_pipelined(self) -> MT:
+        transformers = self.__class__.get_transformers(self.withTransformers)
+        if self._pipeline is None or self._pipeline.transformers is not transformers:
+            # the transformer list is replaced on every change, rebuild the stages. The frames in flight are dropped.
+            if self._pipeline is not None:
+                self._pipeline.close()
+            self._pipeline = TransformPipeline(self, transformers, self.withTransformers.pipeline_queue_size)
+        item = await self._pipeline.get()
+        if item.error is not None:
+            raise item.error
+        assert item.org_frame is not None and item.frame is not None
+        if item.unchanged:
+            item.frame = self.reuse_last_output(item.org_frame)
+        else:
+            self.remember_output(item.org_frame, item.frame)
+        return await self.finish(item.org_frame, item.frame, item.frame_cache)
+    
+    def create_output_context(self) -> AnyType:
+        if self.output is None:
+            return nullcontext()
+        elif isinstance(self.output, BufferedOutput):
+            return self.output
+        else:
+            return OutputContextManager(self.output)
+        
+    def create_stream_context(self) -> AnyType:
+        """Like create_output_context, but only capture the stdout and stderr, so it can stay entered by a long running task."""
+        if self.output is None:
+            return nullcontext()
+        elif isinstance(self.output, BufferedOutput):
+            return self.output
+        else:
+            return StreamCapture(OutputContextManager(self.output))
+    
+    def stop(self) -> None:
+        if self._reader is not None:
+            self._reader.cancel()
+            self._reader = None
+        if self._pipeline is not None:
+            self._pipeline.close()
+            self._pipeline = None
+        if self._poster_dispatcher is not None:
+            self._poster_dispatcher.close()
+            self._poster_dispatcher = None
+        # the shared contexts of the transformers keep the last frame of the track, which would keep the closed track alive
+        for transformer in self.__class__.get_transformers(self.withTransformers) + self.__class__.get_posters(self.withTransformers):
+            if transformer.context.get(ContextHelper.KEY_TRANSFORM_TRACK) is self:
+                for key in (ContextHelper.KEY_ORG_FRAME, ContextHelper.KEY_FRAME_CACHE, ContextHelper.KEY_TRANSFORM_TRACK):
+                    transformer.context.pop(key, None)
+        super().stop()
+    
     @staticmethod        
     @abstractmethod
     def get_transformers(withTransformers: WithMediaTransformers) -> list[MediaTransformer[MT]]:
@@ -135,6 +874,17 @@ class MediaTransformTrack(MediaStreamTrack, Generic[MT], metaclass=ABCMeta):
 class VideoTransformTrack(MediaTransformTrack[VideoFrame]):
     kind = 'video'
     
+    def __init__(
+        self,
+        track: MediaStreamTrack,
+        withTransformers: WithMediaTransformers,
+        output: Output | BufferedOutput | None = None,
+        drop_stale_frames: bool | None = None,
+        state_id: str = "",
+    ):
+        super().__init__(track, withTransformers, output, state_id=state_id)
+        self.drop_stale_frames = drop_stale_frames if drop_stale_frames is not None else withTransformers.drop_stale_frames
+    
     @staticmethod
     def get_transformers(withTransformers: WithMediaTransformers) -> list[MediaTransformer[VideoFrame]]:
         return withTransformers.video_transformers
@@ -155,6 +905,277 @@ class AudioTransformTrack(MediaTransformTrack[AudioFrame]):
         return withTransformers.audio_posters
 
 
+# the encoder of RTCRtpSender is private, the supported versions of aiortc are pinned in pyproject.toml
+_SENDER_ENCODER = '_RTCRtpSender__encoder'
+_missing_encoder_logged = False
+
+def _get_sender_encoder(sender: RTCRtpSender) -> AnyType:
+    """Get the encoder created by aiortc for the sender on the first frame, or None before that.
+    When the version of aiortc does not have it, the bitrate is not clamped and the encode time is not measured, which is logged once.
+    """
+    global _missing_encoder_logged
+    if not hasattr(sender, _SENDER_ENCODER):
+        if not _missing_encoder_logged:
+            _missing_encoder_logged = True
+            logger.warning(f'RTCRtpSender has no {_SENDER_ENCODER} in this version of aiortc, max_bitrate and the encode time are not supported.')
+        return None
+    return getattr(sender, _SENDER_ENCODER)
+
+
+class OutboundVideoTrack(MediaStreamTrack):
+    """The video track sent back to a peer, limited by max_framerate, downscale and max_bitrate of the widget before the encode.
+
+    The settings are read on every frame, so they apply to the connected peers at once. The frames above max_framerate are skipped
+    by their timestamps, and the rest are resized by downscale. The encoder of the sender is created by aiortc on the first frame,
+    and its target bitrate is reset by every bandwidth estimation of the receiver, so it is clamped again before each frame.
+    With a controller, the current quality level of the controller lowers the limits further.
+    """
+    kind = 'video'
+    sender: RTCRtpSender | None
+    controller: QualityController | None
+    sent_frames: int
+    skipped_frames: int
+    encoded_frames: int
+    encode_seconds: float
+
+    def __init__(self, track: MediaStreamTrack, settings: "WebCamWidget") -> None:
+        super().__init__()
+        self.track = track
+        self.settings = settings
+        self.sender = None
+        self.controller = None
+        self.sent_frames = 0
+        self.skipped_frames = 0
+        self.encoded_frames = 0
+        self.encode_seconds = 0.0
+        self._timed_encoder: AnyType = None
+        self._next_time: float | None = None
+
+    def _skip(self, frame: VideoFrame) -> bool:
+        max_framerate = cast(Optional[float], self.settings.max_framerate)
+        if self.controller is not None and self.controller.current.framerate is not None:
+            max_framerate = min(max_framerate or self.controller.current.framerate, self.controller.current.framerate)
+        if not max_framerate or frame.pts is None or frame.time_base is None:
+            self._next_time = None
+            return False
+        frame_time = float(frame.pts * frame.time_base)
+        interval = 1.0 / max_framerate
+        if self._next_time is not None and 0.001 < self._next_time - frame_time <= interval:
+            return True
+        # keep the cadence instead of drifting by the jitter of the frames, unless the timestamps jump
+        if self._next_time is not None and -0.001 <= frame_time - self._next_time < interval:
+            self._next_time += interval
+        else:
+            self._next_time = frame_time + interval
+        return False
+
+    def _time_encoder(self, encoder: AnyType) -> None:
+        """Measure the encode time by wrapping the encode method of the encoder instance, called in the executor of aiortc."""
+        if encoder is self._timed_encoder:
+            return
+        encode = encoder.encode
+        
+        def timed_encode(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return encode(*args, **kwargs)
+            finally:
+                self.encode_seconds += time.perf_counter() - start
+                self.encoded_frames += 1
+                
+        encoder.encode = timed_encode
+        self._timed_encoder = encoder
+
+    def _clamp_bitrate(self, encoder: AnyType) -> None:
+        max_bitrate = cast(Optional[int], self.settings.max_bitrate)
+        if self.controller is not None:
+            max_bitrate = min(max_bitrate or self.controller.current.bitrate, self.controller.current.bitrate)
+        if max_bitrate and hasattr(encoder, 'target_bitrate') and encoder.target_bitrate > max_bitrate:
+            encoder.target_bitrate = max_bitrate
+
+    async def recv(self) -> VideoFrame:
+        while True:
+            frame = cast(VideoFrame, await self.track.recv())
+            if not self._skip(frame):
+                break
+            self.skipped_frames += 1
+        downscale = cast(float, self.settings.downscale)
+        if self.controller is not None:
+            downscale *= self.controller.current.scale
+        if downscale > 1:
+            # the encoders require even sizes
+            width = max(2, int(frame.width / downscale) // 2 * 2)
+            height = max(2, int(frame.height / downscale) // 2 * 2)
+            if width != frame.width or height != frame.height:
+                frame = frame.reformat(width=width, height=height)
+        encoder = _get_sender_encoder(self.sender) if self.sender is not None else None
+        if encoder is not None:
+            self._clamp_bitrate(encoder)
+            self._time_encoder(encoder)
+        self.sent_frames += 1
+        return frame
+
+    def stop(self) -> None:
+        super().stop()
+        self.track.stop()
+        if self.controller is not None:
+            self.controller.stop()
+
+
+@dataclass
+class PipelineItem(Generic[MT]):
+    org_frame: MT | None = None
+    frame: MT | None = None
+    frame_cache: FrameConversionCache | None = None
+    error: BaseException | None = None
+    # skipped by the stages because the frame is nearly the same as the last processed one
+    unchanged: bool = False
+
+class TransformPipeline(Generic[MT]):
+    """Run the transformers of a track as stages connected by bounded queues,
+    so transformer k works on frame n while transformer k - 1 works on frame n + 1.
+    
+    The throughput is close to the slowest stage instead of the sum of all the stages, at the cost of a fixed extra delay.
+    The sync transformers only overlap when they run in the thread pool, see WithMediaTransformers.run_in_thread.
+    """
+    transformers: list[MediaTransformer[MT]]
+    
+    def __init__(self, track: MediaTransformTrack[MT], transformers: list[MediaTransformer[MT]], queue_size: int = 1) -> None:
+        self.track = track
+        self.transformers = transformers
+        queues: list[asyncio.Queue[PipelineItem[MT]]] = [asyncio.Queue(maxsize=queue_size) for _ in range(len(transformers) + 1)]
+        self.output = queues[-1]
+        stages = [self._read(queues[0])]
+        for i, transformer in enumerate(transformers):
+            if transformer.concurrency > 1:
+                ordered: asyncio.Queue[tuple[PipelineItem[MT], asyncio.Future[MT]]] = asyncio.Queue()
+                semaphore = asyncio.Semaphore(transformer.concurrency)
+                stages.append(self._dispatch(transformer, queues[i], ordered, semaphore))
+                stages.append(self._collect(ordered, queues[i + 1], semaphore))
+            else:
+                stages.append(self._stage(transformer, queues[i], queues[i + 1]))
+        self.tasks = [asyncio.create_task(self._run(stages))]
+        
+    async def _run(self, stages: list[Awaitable[None]]) -> None:
+        # the output is captured once for the pipeline, the tasks of the stages inherit it
+        async with self.track.create_stream_context():
+            await asyncio.gather(*stages)
+            
+    async def _read(self, out_queue: "asyncio.Queue[PipelineItem[MT]]") -> None:
+        while True:
+            try:
+                frame = await self.track._recv_source()
+            except Exception as e:
+                await out_queue.put(PipelineItem(error=e))
+                return
+            frame_cache = FrameConversionCache(frame) if isinstance(frame, VideoFrame) else None
+            await out_queue.put(PipelineItem(org_frame=frame, frame=frame, frame_cache=frame_cache, unchanged=self.track.is_unchanged(frame_cache)))
+            
+    async def _stage(self, transformer: MediaTransformer[MT], in_queue: "asyncio.Queue[PipelineItem[MT]]", out_queue: "asyncio.Queue[PipelineItem[MT]]") -> None:
+        while True:
+            item = await in_queue.get()
+            if item.error is None and not item.unchanged:
+                assert item.org_frame is not None and item.frame is not None
+                item.frame = await self.track.apply_transformer(transformer, item.org_frame, item.frame, item.frame_cache, nullcontext())
+            await out_queue.put(item)
+            
+    async def _dispatch(
+        self,
+        transformer: MediaTransformer[MT],
+        in_queue: "asyncio.Queue[PipelineItem[MT]]",
+        ordered: "asyncio.Queue[tuple[PipelineItem[MT], asyncio.Future[MT]]]",
+        semaphore: asyncio.Semaphore,
+    ) -> None:
+        """Start the transformer on up to concurrency frames at the same time, the results are collected in order by _collect."""
+        while True:
+            item = await in_queue.get()
+            await semaphore.acquire()
+            if item.error is None and not item.unchanged:
+                assert item.org_frame is not None and item.frame is not None
+                future = asyncio.ensure_future(self.track.apply_transformer(transformer, item.org_frame, item.frame, item.frame_cache, nullcontext(), isolated=True))
+            else:
+                future = asyncio.get_running_loop().create_future()
+                future.set_result(item.frame)
+            await ordered.put((item, future))
+            
+    async def _collect(
+        self,
+        ordered: "asyncio.Queue[tuple[PipelineItem[MT], asyncio.Future[MT]]]",
+        out_queue: "asyncio.Queue[PipelineItem[MT]]",
+        semaphore: asyncio.Semaphore,
+    ) -> None:
+        while True:
+            item, future = await ordered.get()
+            try:
+                item.frame = await future
+            finally:
+                semaphore.release()
+            await out_queue.put(item)
+            
+    async def get(self) -> PipelineItem[MT]:
+        return await self.output.get()
+    
+    def close(self) -> None:
+        for task in self.tasks:
+            task.cancel()
+        self.tasks = []
+
+        
+class PosterDispatcher(Generic[MT]):
+    """Run the posters of a track from a bounded queue consumed by a separate task, so recv returns the frame as soon as the transformers finish.
+    
+    The frames are posted one by one in order, and the posters of the same frame run concurrently.
+    When the queue is full, the overflow policy decides what happens:
+    * block - recv waits for a free slot
+    * drop_oldest - the oldest queued frame is dropped
+    * drop_newest - the new frame is not posted
+    """
+    OVERFLOW_POLICIES = ('block', 'drop_oldest', 'drop_newest')
+    overflow: str
+    dropped: int
+    
+    def __init__(self, track: MediaTransformTrack[MT], maxsize: int = 8, overflow: str = 'block') -> None:
+        if overflow not in self.OVERFLOW_POLICIES:
+            raise ValueError(f'Invalid overflow policy {overflow}, should be one of {", ".join(self.OVERFLOW_POLICIES)}')
+        self.track = track
+        self.overflow = overflow
+        self.dropped = 0
+        self.queue: asyncio.Queue[PipelineItem[MT]] = asyncio.Queue(maxsize=maxsize)
+        self.task: asyncio.Task | None = None
+        
+    def _drop(self, item: PipelineItem[MT]) -> None:
+        self.dropped += 1
+        if item.frame_cache is not None:
+            item.frame_cache.clear()
+        
+    async def put(self, item: PipelineItem[MT]) -> None:
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+        if self.overflow == 'block':
+            await self.queue.put(item)
+            return
+        if self.queue.full():
+            if self.overflow == 'drop_newest':
+                self._drop(item)
+                return
+            self._drop(self.queue.get_nowait())
+        self.queue.put_nowait(item)
+        
+    async def _run(self) -> None:
+        while True:
+            item = await self.queue.get()
+            assert item.org_frame is not None and item.frame is not None
+            try:
+                await self.track.post(item.org_frame, item.frame, item.frame_cache, concurrent=True)
+            except Exception as e:
+                logger.exception(e)
+                
+    def close(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+
 def transform_devices_to_options(devices): 
     return [(device.get('label') or device.get('deviceId'), device) for device in devices]
 
@@ -177,14 +1198,44 @@ def deviceEquals(dev1: dict | None, dev2: dict | None) -> bool:
         return dev1 is None
     return dev1.get("deviceId") == dev2.get("deviceId")
 
+def parse_ice_candidate(init: dict[str, AnyType] | None) -> RTCIceCandidate | None:
+    """Convert a RTCIceCandidateInit of the browser, None or an empty candidate means the end of the candidates."""
+    if not init or not init.get("candidate"):
+        return None
+    sdp: str = init["candidate"]
+    if sdp.startswith("candidate:"):
+        sdp = sdp[len("candidate:"):]
+    candidate = candidate_from_sdp(sdp)
+    candidate.sdpMid = init.get("sdpMid")
+    candidate.sdpMLineIndex = init.get("sdpMLineIndex")
+    return candidate
+
 @dataclass
 class TrackMap:
     video: list[MediaStreamTrack] = field(default_factory=list)
     audio: list[MediaStreamTrack] = field(default_factory=list)
+    transformed: list[MediaTransformTrack] = field(default_factory=list)
+    outbound: list[OutboundVideoTrack] = field(default_factory=list)
+    # consume the transformed tracks which are not sent back in the receive only mode
+    sink: MediaBlackhole = field(default_factory=MediaBlackhole)
     
     def clear(self) -> None:
+        for track in self.transformed:
+            track.stop()
+        for outbound in self.outbound:
+            outbound.stop()
         self.video = []
         self.audio = []
+        self.transformed = []
+        self.outbound = []
+        
+    async def close(self) -> None:
+        """Stop the transformed tracks, and run the teardown of their transformers."""
+        transformed = self.transformed
+        sink, self.sink = self.sink, MediaBlackhole()
+        self.clear()
+        await sink.stop()
+        await asyncio.gather(*[track.teardown() for track in transformed])
 
 @dataclass
 class State:
@@ -208,6 +1259,9 @@ class State:
     audio_output_device_id: str | None = None
     audio_output_selector: Dropdown = field(default_factory=lambda: Dropdown(options=[], value=None, description='Audio Output', _view_count=0))
     track_map: TrackMap = field(default_factory=TrackMap)
+    stats: PeerStatsRecorder | None = None
+    # the monotonic time of the last message of the view or change of the peer, see is_idle
+    last_active: float = field(default_factory=time.monotonic)
     
     def __post_init__(self):
         def on_view_count_change(type: str, old_count, new_count):
@@ -352,56 +1406,94 @@ class State:
             selector = self.get_device_selector(type=type)
             selector.observe(handler=handler, names="value") # type: ignore
             
+    def touch(self) -> None:
+        self.last_active = time.monotonic()
+        
+    def has_views(self) -> bool:
+        return any(selector._view_count for selector in (self.video_input_selector, self.audio_input_selector, self.audio_output_selector))
+        
+    def is_idle(self, timeout: float, now: float | None = None) -> bool:
+        """Whether the peer is not connected, nothing displays the device selectors, and the view has been silent for timeout seconds."""
+        now = time.monotonic() if now is None else now
+        if self.pc is not None and self.pc.connectionState == "connected":
+            return False
+        return not self.has_views() and now - self.last_active > timeout
+    
     def log_info(self, msg: str, *args):
         logger.info(f"[{self.id}] {msg}", *args)
             
-    async def exchange_peer(self, client_desc: dict[str, str]):
+    async def exchange_peer(self, client_desc: dict[str, str], renegotiate: bool = False, host_only: bool = False):
+        self.touch()
         try:
             async with self.a_lock:
-                if self.pc:
-                    await self.pc.close()
-                    self.pc = None
-                    self.track_map.clear()
-                self.client_desc = offer = RTCSessionDescription(**client_desc)
-                self.pc = RTCPeerConnection(RTCConfiguration(self.widget.get_ice_servers()))
-                id = uuid.uuid4().hex
                 pc = self.pc
-                @pc.on("icegatheringstatechange")
-                async def on_icegatheringstatechange():
-                    self.log_info(f"[{id}] Ice connection state is {pc.iceGatheringState}")
+                if renegotiate and pc is not None and pc.connectionState not in ("closed", "failed"):
+                    # keep the transports and the transformed tracks, only the new tracks of the offer fire on_track
+                    self.log_info("Renegotiate the peer connection")
+                else:
+                    if self.pc:
+                        await self.pc.close()
+                        self.pc = None
+                        await self.track_map.close()
+                    self.pc = RTCPeerConnection(RTCConfiguration(self.widget.get_ice_servers(host_only=host_only)))
+                    id = uuid.uuid4().hex
+                    pc = self.pc
+                    self.start_stats(pc)
+                    @pc.on("icegatheringstatechange")
+                    async def on_icegatheringstatechange():
+                        self.log_info(f"[{id}] Ice connection state is {pc.iceGatheringState}")
                 
-                @pc.on("iceconnectionstatechange")
-                async def on_iceconnectionstatechange():
-                    self.log_info(f"[{id}] Ice connection state is {pc.iceConnectionState}")
+                    @pc.on("iceconnectionstatechange")
+                    async def on_iceconnectionstatechange():
+                        self.log_info(f"[{id}] Ice connection state is {pc.iceConnectionState}")
                     
-                @pc.on("signalingstatechange")
-                async def on_signalingstatechange():
-                    self.log_info(f"[{id}] Signaling state is {pc.signalingState}")
+                    @pc.on("signalingstatechange")
+                    async def on_signalingstatechange():
+                        self.log_info(f"[{id}] Signaling state is {pc.signalingState}")
                 
-                @pc.on("connectionstatechange")    
-                async def on_connectionstatechange():
-                    self.log_info(f"[{id}] Connection state is {pc.connectionState}")
-                    if pc.connectionState == "failed":
-                        async with self.a_lock:
-                            await pc.close()
-                            self.pc = None
-                            self.track_map.clear()
+                    @pc.on("connectionstatechange")    
+                    async def on_connectionstatechange():
+                        self.log_info(f"[{id}] Connection state is {pc.connectionState}")
+                        self.touch()
+                        if pc.connectionState == "failed":
+                            async with self.a_lock:
+                                await pc.close()
+                                self.pc = None
+                                await self.track_map.close()
                     
-                @pc.on("error")
-                async def on_error(error):
-                    logger.exception(error)
+                    @pc.on("error")
+                    async def on_error(error):
+                        logger.exception(error)
                 
-                @pc.on("track")
-                def on_track(track):
-                    self.log_info(f"[{id}] Track {track.kind} received")
-                    if track.kind == "video":
-                        pc.addTrack(relay.subscribe(VideoTransformTrack(track, self.widget, self.widget.output)))
-                    elif track.kind == "audio":
-                        pc.addTrack(relay.subscribe(AudioTransformTrack(track, self.widget, self.widget.output)))
-                    with self.widget.lock:
-                        asyncio.gather(*[callback(track, pc) for callback in self.widget.track_callbacks])
-                        self.track_map.video.append(track)
+                    @pc.on("track")
+                    def on_track(track):
+                        self.log_info(f"[{id}] Track {track.kind} received")
+                        transform_track: MediaTransformTrack
+                        if track.kind == "video":
+                            transform_track = VideoTransformTrack(track, self.widget, self.widget.get_output_capture(), state_id=self.id)
+                        else:
+                            transform_track = AudioTransformTrack(track, self.widget, self.widget.get_output_capture(), state_id=self.id)
+                        transform_track.start_setup()
+                        if self.widget.receive_only:
+                            # nothing is sent back, so the frames are pulled through the transformers and posters by the sink
+                            self.track_map.sink.addTrack(transform_track.relay.subscribe(transform_track))
+                            asyncio.ensure_future(self.track_map.sink.start())
+                        elif track.kind == "video":
+                            outbound = OutboundVideoTrack(transform_track.relay.subscribe(transform_track), self.widget)
+                            outbound.sender = pc.addTrack(outbound)
+                            if self.widget.adaptive_quality:
+                                outbound.controller = QualityController()
+                                outbound.controller.attach(outbound.sender)
+                            self.track_map.outbound.append(outbound)
+                        else:
+                            pc.addTrack(transform_track.relay.subscribe(transform_track))
+                        with self.widget.lock:
+                            self.track_map.transformed.append(transform_track)
+                            asyncio.gather(*[callback(track, pc) for callback in self.widget.track_callbacks])
+                            self.track_map.video.append(track)
+                        self.widget.notify_processed_track()
                     
+                self.client_desc = offer = RTCSessionDescription(**client_desc)
                 # handle offer
                 await pc.setRemoteDescription(offer)
                 # send answer
@@ -413,12 +1505,47 @@ class State:
         except Exception as e:
             logger.exception(e)
             
+    def start_stats(self, pc: RTCPeerConnection) -> None:
+        interval = cast(Optional[float], self.widget.stats_interval)
+        if self.stats is not None:
+            self.stats.stop()
+        if not interval:
+            return
+        size = cast(int, self.widget.stats_history_size)
+        if self.stats is None or self.stats.samples.maxsize != size:
+            self.stats = PeerStatsRecorder(maxsize=size, interval=interval)
+        # the time series continues across the reconnections of the view
+        self.stats.interval = interval
+        self.stats.start(pc, lambda: (self.track_map.transformed, self.track_map.outbound))
+        
+    async def add_ice_candidate(self, init: dict[str, AnyType] | None):
+        """Add a candidate trickled by the browser after its offer. The lock keeps it after the offer is handled."""
+        self.touch()
+        try:
+            async with self.a_lock:
+                if self.pc is not None:
+                    await self.pc.addIceCandidate(parse_ice_candidate(init))
+        except Exception as e:
+            logger.exception(e)
+            
     async def close(self):
         async with self.a_lock:
+            if self.stats is not None:
+                self.stats.stop()
             if self.pc:
                 await self.pc.close()
                 self.pc = None
-                self.track_map.clear()
+            await self.track_map.close()
+            
+    async def dispose(self):
+        """Close the peer and the device selectors. Called when the state is removed from the widget, it is not used after."""
+        await self.close()
+        self.stats = None
+        for selector in (self.video_input_selector, self.audio_input_selector, self.audio_output_selector):
+            # closing a widget leaves its layout and style in the registry of the widgets
+            selector.layout.close()
+            selector.style.close()
+            selector.close()
 
 OnTrackCallback = Callable[[MediaStreamTrack, RTCPeerConnection], Awaitable[None]] 
 
@@ -436,6 +1563,61 @@ class WebCamWidget(DOMWidget, BaseWidget, WithMediaTransformers):
     * height - Float (default None)
     * playsInline - Bool (default True)
     * muted - Bool (default False)
+    
+    The sync transformers and posters run in the event loop by default. Set run_in_thread to True to run them in a bounded thread pool instead.
+    The pool can be replaced by assigning a TransformerThreadPool to thread_pool, and thread_pool.stats() shows the queue depth of the pool.
+    The pure Python callbacks holding the GIL can run in the worker processes of process_pool instead, see add_video_process_transformer.
+    
+    The analysis working on smaller images can be organized as a TransformerGraph, whose branches run at the same time and whose results
+    are joined into the full resolution frame. Add it by attach_video_transformer.
+    
+    Instead of drawing the results into the frames, the transformers can add boxes, polylines and texts to ContextHelper(ctx).get_overlay().
+    The overlay is sent to the frontend as float32 buffers and drawn on a canvas over the video, synced to the frame by the rtp timestamp.
+    The transformers can then return None, and keep the frames unchanged. The last overlay stays until replaced, so a transformer limited by max_hz
+    only needs to update it when it runs.
+    
+    The transformers may have setup and teardown hooks, called with each source track when the peer attaches it and when the peer closes.
+    The frames pass through a transformer untouched until its setup finishes, so loading a model never stalls the first frames.
+    
+    For the static scenes, set change_threshold to skip the transformers on the frames nearly the same as the last processed one.
+    The frames are compared by the mean absolute difference (0 - 255) of the gray thumbnails of change_thumbnail_size,
+    and the skipped frames get a copy of the last output and the last overlays, see get_unchanged_frames.
+    
+    To show the processed video to more people, create WebCamViewer(widget) for each of them. The viewers subscribe to the transformed track
+    of the widget, so the transformers run once and only the encoding is done per viewer. The overlays are forwarded to the viewers too.
+    
+    When the transformer latency varies a lot, set pacing to True to emit the frames at the cadence of their timestamps, after a fixed delay of pacing_delay seconds.
+    The frames later than that are dropped, see get_pacing_stats.
+    
+    When the widget is only used for recording or for the analysis by the posters, set receive_only to True. The processed tracks are then
+    not sent back, which saves their encode, and the browser shows the local camera instead.
+    
+    The video sent back to the browser is limited by max_bitrate, max_framerate and downscale, which save the encode cost and the bandwidth
+    when a smaller preview is enough. They apply to the connected peers at once, and only change the returned video, never the frames of the transformers and posters.
+    Set adaptive_quality to True to lower them further on a congested link, and raise them again when it recovers, see get_quality_stats.
+    
+    When the transformers are slower than the camera, set drop_stale_frames to True before connecting.
+    The video tracks then always process the newest frame and skip the intermediate ones, see get_dropped_frames.
+    
+    Set pipelined to True to run the video transformers as stages working on consecutive frames at the same time,
+    connected by queues of pipeline_queue_size. Combined with run_in_thread, the throughput gets close to the slowest transformer.
+    
+    The posters, like the recorder, run before the frame is sent back by default. Set async_posters to True to run them from
+    a queue of poster_queue_size consumed by a separate task. poster_overflow is one of 'block', 'drop_oldest' and 'drop_newest'.
+    
+    Without iceServers, the peers use a public stun server, whose timeout delays the connection on the air-gapped machines.
+    The default ice_mode 'auto' only uses the host candidates when the page is served from a loopback or private address, and 'host' always does.
+    The browser sends its candidates as they are gathered, so the offer does not wait for the gathering to finish.
+    
+    The stats of each peer, like the fps, bitrate, loss, rtt and the encode and decode time, are polled every stats_interval seconds
+    into a time series of stats_history_size samples, see get_peer_stats and get_peer_stats_arrays.
+    
+    When the last view of the widget is removed, its peers are closed and the states of the views are released. So are the states
+    whose peer stays disconnected for idle_timeout seconds, e.g. of the closed browser tabs. Await aclose() to close the widget and wait
+    until the peers, the teardown of the transformers and the pools created by the widget are released.
+    
+    The stdout and stderr of the transformers are captured to the output widget. Set output_mode to 'buffered' to buffer them in
+    a bounded ring buffer and flush them every output_flush_interval seconds, or to 'none' to disable the capture.
     """
     output = Output()
     
@@ -446,6 +1628,8 @@ class WebCamWidget(DOMWidget, BaseWidget, WithMediaTransformers):
      
     iceServers = List(Any(), default_value=[]).tag(sync=True) # type: ignore
     
+    ice_mode = Enum(set(['auto', 'default', 'host']), default_value='auto', help="'host' only uses the host candidates, which connects at once on localhost and LAN. 'auto' does it when the page is served from a loopback or private address and no iceServers are set. 'default' always uses the stun servers.").tag(sync=True) # type: ignore
+    
     autoplay = Bool(True, allow_none=True).tag(sync=True) # type: ignore
     
     controls = Bool(True, allow_none=True).tag(sync=True) # type: ignore
@@ -466,9 +1650,25 @@ class WebCamWidget(DOMWidget, BaseWidget, WithMediaTransformers):
     video_codec = Unicode(default_value=None, allow_none=True).tag(sync=True) # type: ignore
     video_codec_selector = Dropdown(options=[], value=None, description='Video codec')
     
+    output_mode = Enum(set(['direct', 'buffered', 'none']), default_value='direct', help="How the stdout and stderr of the transformers are captured to the output. Only applied to the tracks connected later.") # type: ignore
+    output_buffer_size = Int(256, help="The max number of the texts buffered in the buffered output mode.") # type: ignore
+    output_flush_interval = Float(0.5, help="The interval in seconds to flush the buffered texts in the buffered output mode.") # type: ignore
+    
+    receive_only = Bool(False, help="Do not send the processed tracks back. The browser shows the camera directly, and the transformers and posters still get every frame. Only applied to the peers connected later.").tag(sync=True) # type: ignore
+    
+    adaptive_quality = Bool(False, help="Lower the bitrate, resolution and frame rate of the video sent back to the browser on the loss, rtt and bandwidth estimation reported by the browser, and raise them again when the link recovers. Only applied to the peers connected later.") # type: ignore
+    stats_interval = Float(1.0, allow_none=True, help="The interval in seconds to poll the stats of each peer, see get_peer_stats. None disables the polling. Only applied to the peers connected later.").tag(sync=True) # type: ignore
+    stats_history_size = Int(300, help="The max number of the stats samples kept for each peer.") # type: ignore
+    max_bitrate = Int(default_value=None, allow_none=True, help="The max bitrate in bits per second of the video sent back to the browser. None means the default of the encoder. The encoders of aiortc do not go below 250 kbps (vp8) or 500 kbps (h264).") # type: ignore
+    max_framerate = Float(default_value=None, allow_none=True, help="The max frames per second of the video sent back to the browser, the extra frames are skipped before the encode. None means no limit.") # type: ignore
+    downscale = Float(1.0, min=1.0, help="Divide the width and height of the video sent back to the browser by this factor before the encode.") # type: ignore
+    idle_timeout = Float(300.0, allow_none=True, help="Release the state of a view whose peer has not been connected for this many seconds, e.g. of a closed browser tab. None disables it.") # type: ignore
+    
     state_map: dict[str, State]
     lock: RLock
     track_callbacks: list[OnTrackCallback]
+    buffered_output: BufferedOutput | None = None
+    viewers: list[AnyType]
     
     def __init__(
         self,
@@ -487,10 +1687,19 @@ class WebCamWidget(DOMWidget, BaseWidget, WithMediaTransformers):
         self.state_map = {}
         self.lock = RLock()
         self.track_callbacks = []
+        self.viewers = []
+        self._track_waiters: list[asyncio.Future] = []
+        self._sweeper: asyncio.Task | None = None
+        # count the views in the frontend, the states are released when the last one is removed
+        self._view_count = 0
+        self.observe(self._on_view_count_change, "_view_count")
+        self.observe(self._on_idle_timeout_change, "idle_timeout")
         link((self.video_codec_selector, 'options'), (self, 'video_codecs'))
         link((self.video_codec_selector, 'value'), (self, 'video_codec'))
         self.add_answer("exchange_peer", self.answer_exchange_peer)
         self.add_answer("sync_device", self. answer_sync_device)
+        self.add_answer("ice_candidate", self.answer_ice_candidate)
+        self.add_answer("client_stats", self.answer_client_stats)
         if iceServers is not None:
             self.iceServers = iceServers
         if constraints is not None:
@@ -522,8 +1731,78 @@ class WebCamWidget(DOMWidget, BaseWidget, WithMediaTransformers):
             if state is None:
                 state = State(id=id, widget=self)
                 self.state_map[id] = state
+                self._start_sweeper()
             return state
         
+    async def close_state(self, id: str) -> None:
+        """Close the peer of the view id and release its state. The view gets a new state when it connects again."""
+        with self.lock:
+            state = self.state_map.pop(id, None)
+        if state is not None:
+            await state.dispose()
+            
+    async def close_states(self) -> None:
+        with self.lock:
+            states, self.state_map = list(self.state_map.values()), {}
+        await asyncio.gather(*[state.dispose() for state in states])
+        
+    def _release_states(self) -> None:
+        """Release the states in the background. Without a running loop, e.g. in the garbage collection of another thread,
+        the peers can not be closed, so only their tracks are stopped."""
+        if not self.state_map:
+            return
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            self._stop_states()
+            return
+        run_in_background(self.close_states())
+        
+    def _stop_states(self) -> None:
+        """Drop the states and stop their tracks at once. Closing the peers needs the event loop, so they are left to the garbage collection."""
+        with self.lock:
+            states, self.state_map = list(self.state_map.values()), {}
+        for state in states:
+            if state.stats is not None:
+                state.stats.stop()
+            state.track_map.clear()
+        
+    def _on_view_count_change(self, change: AnyType) -> None:
+        if change.new == 0 and change.old:
+            self.log_info("The last view is removed, release the states")
+            self._release_states()
+            
+    def _on_idle_timeout_change(self, change: AnyType) -> None:
+        self._stop_sweeper()
+        if self.state_map:
+            self._start_sweeper()
+            
+    def _start_sweeper(self) -> None:
+        if self.idle_timeout is None or (self._sweeper is not None and not self._sweeper.done()):
+            return
+        try:
+            self._sweeper = asyncio.get_running_loop().create_task(self._sweep_idle_states())
+        except RuntimeError:
+            self._sweeper = None
+            
+    def _stop_sweeper(self) -> None:
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+            
+    async def _sweep_idle_states(self) -> None:
+        # the task holds the widget, so it ends with the last state and is started again by the next one
+        while self.state_map:
+            timeout = cast(Optional[float], self.idle_timeout)
+            if timeout is None:
+                break
+            await asyncio.sleep(max(1.0, timeout / 2))
+            for id, state in list(self.state_map.items()):
+                if state.is_idle(timeout):
+                    self.log_info(f"Release the idle state of {id}")
+                    await self.close_state(id)
+        self._sweeper = None
+        
     def get_current_state(self, create=True) -> State:
         if create:
             return self.get_or_create_state(cast(AnyType, self.model_id))
@@ -570,7 +1849,21 @@ class WebCamWidget(DOMWidget, BaseWidget, WithMediaTransformers):
         if "desc" in args:
             client_desc: dict[str, str] = args["desc"]
             state = self.get_or_create_state(id)
-            asyncio.create_task(state.exchange_peer(client_desc=client_desc))
+            asyncio.create_task(state.exchange_peer(
+                client_desc=client_desc,
+                renegotiate=bool(args.get("renegotiate")),
+                host_only=bool(args.get("host_only")),
+            ))
+            
+    def answer_client_stats(self, id: str, cmd: str, args: dict):
+        state = self.get_or_create_state(id)
+        state.touch()
+        if state.stats is not None:
+            state.stats.record_client(args)
+            
+    def answer_ice_candidate(self, id: str, cmd: str, args: dict):
+        state = self.get_or_create_state(id)
+        asyncio.create_task(state.add_ice_candidate(args.get("candidate")))
                 
     def answer_sync_device(self, id: str, cmd: str, args: dict):
         if "type" in args and "id" in args:
@@ -580,23 +1873,142 @@ class WebCamWidget(DOMWidget, BaseWidget, WithMediaTransformers):
             state.set_device_id(type=type, id=device_id)
         
         
-    def add_video_transformer(self, callback: Callable[[VideoFrame, dict, MediaStreamTrack], Union[VideoFrame | None, Awaitable[VideoFrame | None]]]) -> MediaTransformer[VideoFrame]:
+    def add_video_transformer(
+        self,
+        callback: Callable[[VideoFrame, dict, MediaStreamTrack], Union[VideoFrame | None, Awaitable[VideoFrame | None]]],
+        run_in_thread: bool | None = None,
+        every_n_frames: int | None = None,
+        max_hz: float | None = None,
+        apply_result: Callable[[VideoFrame, AnyType], VideoFrame | None] | None = None,
+        setup: TrackHook | None = None,
+        teardown: TrackHook | None = None,
+    ) -> MediaTransformer[VideoFrame]:
         """Add a video frame processor
 
         Args:
             callback (Callable[[VideoFrame, dict], Union[VideoFrame, Awaitable[VideoFrame]] | None]): 
             a callback accept the frame and a context dict, and then return a processed frame. Support sync and async function.
             The context dict contains key "__org_frame" at least. It represent the original frame. The users can add their own data to the context dict.
+            Use ContextHelper(ctx).get_org_ndarray to share the conversions of the original frame with the other transformers.
+            The callback may also return a result which is not a frame, such as the detected boxes. It is passed to apply_result.
+            run_in_thread (bool | None, optional): Whether to run the sync callback in the thread pool of the widget. None means follow the widget setting run_in_thread. Defaults to None.
+            every_n_frames (int | None, optional): Only call the callback once every n frames. Defaults to None.
+            max_hz (float | None, optional): Call the callback at most max_hz times per second of the video. Defaults to None.
+            On the frames skipped by every_n_frames or max_hz, the last output of the callback is reused.
+            apply_result (Callable[[VideoFrame, Any], VideoFrame | None] | None, optional): a cheap sync function drawing the last result of the callback on the frame,
+            called on every frame when the callback returns something other than a frame. Defaults to None.
+            setup (Callable[[MediaStreamTrack], Awaitable[None] | None] | None, optional): a hook called with each new source track before its frames reach the callback,
+            such as loading a model or creating a tracker. The frames pass through untouched until it finishes. The sync hook runs in a thread. Defaults to None.
+            teardown (Callable[[MediaStreamTrack], Awaitable[None] | None] | None, optional): a hook called with the source track when its peer closes,
+            to release the resources created by setup. Defaults to None.
 
         Returns:
             MediaTransformer[VideoFrame]: A transformer instance which can be used to remove the callback by calling remove_video_transformer
         """        
         new_transformers = self.video_transformers.copy()
-        transformer = MediaTransformer(callback)
+        transformer = MediaTransformer(callback, run_in_thread=run_in_thread, every_n_frames=every_n_frames, max_hz=max_hz, apply_result=apply_result, setup=setup, teardown=teardown)
+        new_transformers.append(transformer)
+        self.video_transformers = new_transformers
+        return transformer
+    
+    def add_video_ndarray_transformer(
+        self,
+        callback: NdarrayCallback,
+        format: str = 'bgr24',
+        run_in_thread: bool | None = None,
+        setup: TrackHook | None = None,
+        teardown: TrackHook | None = None,
+    ) -> NdarrayTransformer:
+        """Add a video frame processor working on a writable ndarray view of the frame
+        
+        Unlike add_video_transformer, the callback does not need to call frame.to_ndarray and VideoFrame.from_ndarray,
+        the frame buffers the pipeline is done with are reused by the frame pool of the widget.
+
+        Args:
+            callback (Callable[[np.ndarray, dict, MediaStreamTrack], None]): 
+            a callback accept an ndarray of shape (height, width, channels) and a context dict, and then modify the ndarray in place. Support sync and async function.
+            The context dict contains key "__org_frame" at least. It represent the original frame. The users can add their own data to the context dict.
+            format (str, optional): The packed format of the ndarray, one of gray, rgb24, bgr24, rgba, bgra, argb and abgr. Defaults to 'bgr24'.
+            run_in_thread (bool | None, optional): Whether to run the sync callback in the thread pool of the widget. None means follow the widget setting run_in_thread. Defaults to None.
+            setup (Callable[[MediaStreamTrack], Awaitable[None] | None] | None, optional): a hook called with each new source track before its frames reach the callback. See add_video_transformer. Defaults to None.
+            teardown (Callable[[MediaStreamTrack], Awaitable[None] | None] | None, optional): a hook called with the source track when its peer closes. Defaults to None.
+
+        Returns:
+            NdarrayTransformer: A transformer instance which can be used to remove the callback by calling remove_video_transformer
+        """
+        new_transformers = self.video_transformers.copy()
+        transformer = NdarrayTransformer(callback, format=format, run_in_thread=run_in_thread, frame_pool=self.frame_pool, setup=setup, teardown=teardown)
         new_transformers.append(transformer)
         self.video_transformers = new_transformers
         return transformer
     
+    def add_video_process_transformer(
+        self,
+        callback: Callable[..., AnyType],
+        format: str = 'bgr24',
+        apply_result: Callable[[VideoFrame, AnyType], VideoFrame | None] | None = None,
+    ) -> ProcessTransformer:
+        """Add a video frame processor running in the worker processes of the process pool of the widget
+        
+        Use it for the pure Python callbacks holding the GIL, which do not run faster with run_in_thread.
+        The frames are passed by the shared memory instead of pickle. The pool can be replaced by assigning a TransformerProcessPool to process_pool before adding the transformers.
+
+        Args:
+            callback (Callable[[np.ndarray], Any]): a picklable sync callback accept an ndarray of shape (height, width, channels), and modify it in place and return None,
+            or return a small result passed to apply_result.
+            format (str, optional): The packed format of the ndarray. Defaults to 'bgr24'.
+            apply_result (Callable[[VideoFrame, Any], VideoFrame | None] | None, optional): a cheap sync function drawing a result on its frame in the kernel process. Defaults to None.
+
+        Returns:
+            ProcessTransformer: A transformer instance which can be used to remove the callback by calling remove_video_transformer
+        """
+        transformer = ProcessTransformer(callback, self.get_process_pool(), format=format, frame_pool=self.frame_pool, apply_result=apply_result)
+        return cast(ProcessTransformer, self.attach_video_transformer(transformer))
+    
+    def add_video_batch_transformer(
+        self,
+        callback: Callable[..., AnyType],
+        batch_size: int = 8,
+        max_delay: float = 0.01,
+        format: str = 'bgr24',
+        width: int | None = None,
+        height: int | None = None,
+        run_in_thread: bool | None = None,
+        apply_result: Callable[[VideoFrame, AnyType], VideoFrame | None] | None = None,
+    ) -> BatchTransformer:
+        """Add a video frame processor working on the batches of the frames from all the connected tracks
+        
+        It is useful for the models running faster with larger batches. To batch the frames of several widgets,
+        attach the returned transformer to the other widgets by attach_video_transformer.
+
+        Args:
+            callback (Callable[[np.ndarray], Sequence[Any]]): a callback accept a stacked ndarray of shape (n, height, width, channels) and return n results in order.
+            Each result can be an ndarray or frame replacing the frame, None to keep the frame, or any other result passed to apply_result. Support sync and async function.
+            batch_size (int, optional): The max number of the frames in a batch. Defaults to 8.
+            max_delay (float, optional): The max seconds waiting for a batch to be full. Defaults to 0.01.
+            format (str, optional): The packed format of the ndarray. Defaults to 'bgr24'.
+            width (int | None, optional): Resize the frames to the width before batching. Defaults to None.
+            height (int | None, optional): Resize the frames to the height before batching. Defaults to None.
+            run_in_thread (bool | None, optional): Whether to run the sync callback in the thread pool of the widget. None means follow the widget setting run_in_thread. Defaults to None.
+            apply_result (Callable[[VideoFrame, Any], VideoFrame | None] | None, optional): a cheap sync function drawing a result on its frame. Defaults to None.
+
+        Returns:
+            BatchTransformer: A transformer instance which can be used to remove the callback by calling remove_video_transformer
+        """
+        transformer = BatchTransformer(callback, batch_size=batch_size, max_delay=max_delay, format=format, width=width, height=height, run_in_thread=run_in_thread, apply_result=apply_result)
+        self.attach_video_transformer(transformer)
+        return transformer
+    
+    def attach_video_transformer(self, transformer: MediaTransformer[VideoFrame]) -> MediaTransformer[VideoFrame]:
+        """Add a video transformer instance, such as a BatchTransformer shared with another widget or a RemoteTransformer.
+        
+        Returns:
+            MediaTransformer[VideoFrame]: The transformer, which can be removed by calling remove_video_transformer
+        """
+        new_transformers = self.video_transformers.copy()
+        new_transformers.append(transformer)
+        self.video_transformers = new_transformers
+        return transformer
     
     def remove_video_transformer(self, transformer: MediaTransformer[VideoFrame]) -> None:
         """Remove the video frame processor
@@ -606,19 +2018,20 @@ class WebCamWidget(DOMWidget, BaseWidget, WithMediaTransformers):
         """        
         self.video_transformers = [t for t in self.video_transformers if t != transformer]
         
-    def add_video_poster(self, callback: Callable[[VideoFrame, dict, MediaStreamTrack], VideoFrame | None | Awaitable[VideoFrame | None]]) -> MediaTransformer[VideoFrame]:
+    def add_video_poster(self, callback: Callable[[VideoFrame, dict, MediaStreamTrack], VideoFrame | None | Awaitable[VideoFrame | None]], run_in_thread: bool | None = None) -> MediaTransformer[VideoFrame]:
         """Add a video frame post processor
 
         Args:
             callback (Callable[[VideoFrame, dict], None]): 
             a callback accept the frame and a context dict, Should not return anything. Support sync and async function.
             The context dict contains key "__org_frame" at least. It represent the original frame. The users can add their own data to the context dict.
+            run_in_thread (bool | None, optional): Whether to run the sync callback in the thread pool of the widget. None means follow the widget setting run_in_thread. Defaults to None.
 
         Returns:
             MediaTransformer[VideoFrame]: A poster instance which can be used to remove the callback by calling remove_video_poster
         """        
         new_posters = self.video_posters.copy()
-        poster = MediaTransformer(callback)
+        poster = MediaTransformer(callback, run_in_thread=run_in_thread)
         new_posters.append(poster)
         self.video_posters = new_posters
         return poster
@@ -632,18 +2045,19 @@ class WebCamWidget(DOMWidget, BaseWidget, WithMediaTransformers):
         """        
         self.video_posters = [p for p in self.video_posters if p != poster]
         
-    def add_audio_transformer(self, callback: Callable[[AudioFrame, dict, MediaStreamTrack], Union[AudioFrame, Awaitable[AudioFrame]]]) -> MediaTransformer[AudioFrame]:
+    def add_audio_transformer(self, callback: Callable[[AudioFrame, dict, MediaStreamTrack], Union[AudioFrame, Awaitable[AudioFrame]]], run_in_thread: bool | None = None) -> MediaTransformer[AudioFrame]:
         """Add a audio frame processor
 
         Args:
             callback (Callable[[AudioFrame, dict], Union[AudioFrame, Awaitable[AudioFrame]]]): 
             a callback accept the frame and a context dict, and then return a processed frame. Support sync and async function
+            run_in_thread (bool | None, optional): Whether to run the sync callback in the thread pool of the widget. None means follow the widget setting run_in_thread. Defaults to None.
 
         Returns:
             MediaTransformer[AudioFrame]: A transformer instance which can be used to remove the callback by calling remove_audio_transformer
         """        
         new_transformers = self.audio_transformers.copy()
-        transformer = MediaTransformer(callback)
+        transformer = MediaTransformer(callback, run_in_thread=run_in_thread)
         new_transformers.append(transformer)
         self.audio_transformers = new_transformers
         return transformer
@@ -657,19 +2071,20 @@ class WebCamWidget(DOMWidget, BaseWidget, WithMediaTransformers):
         """        
         self.audio_transformers = [t for t in self.audio_transformers if t != transformer]
         
-    def add_audio_poster(self, callback: Callable[[AudioFrame, dict, MediaStreamTrack], AudioFrame | None | Awaitable[AudioFrame | None]]) -> MediaTransformer[AudioFrame]:
+    def add_audio_poster(self, callback: Callable[[AudioFrame, dict, MediaStreamTrack], AudioFrame | None | Awaitable[AudioFrame | None]], run_in_thread: bool | None = None) -> MediaTransformer[AudioFrame]:
         """Add a audio frame post processor
 
         Args:
             callback (Callable[[AudioFrame, dict], None]): 
             a callback accept the frame and a context dict, Should not return anything. Support sync and async function.
             The context dict contains key "__org_frame" at least. It represent the original frame. The users can add their own data to the context dict.
+            run_in_thread (bool | None, optional): Whether to run the sync callback in the thread pool of the widget. None means follow the widget setting run_in_thread. Defaults to None.
 
         Returns:
             MediaTransformer[AudioFrame]: A poster instance which can be used to remove the callback by calling remove_video_poster
         """        
         new_posters = self.audio_posters.copy()
-        poster = MediaTransformer(callback)
+        poster = MediaTransformer(callback, run_in_thread=run_in_thread)
         new_posters.append(poster)
         self.audio_posters = new_posters
         return poster
@@ -704,9 +2119,13 @@ class WebCamWidget(DOMWidget, BaseWidget, WithMediaTransformers):
                 self.track_callbacks.remove(callback)
         
     
-    def get_ice_servers(self) -> list[RTCIceServer]:
+    def get_ice_servers(self, host_only: bool = False) -> list[RTCIceServer]:
+        """Get the ice servers of the peers. host_only is requested by the browser in the auto ice_mode, when the page is served from a loopback or private address."""
         servers: list[RTCIceServer] = []
         iceServers = cast(list[str | dict[str, AnyType]] | None, self.iceServers)
+        if self.ice_mode == 'host' or (self.ice_mode == 'auto' and host_only and not iceServers):
+            # only the host candidates, gathered at once without waiting for the stun servers
+            return servers
         if iceServers is not None and len(iceServers) > 0:
             for config in iceServers:
                 if isinstance(config, str):
@@ -723,12 +2142,215 @@ class WebCamWidget(DOMWidget, BaseWidget, WithMediaTransformers):
             servers.append(RTCIceServer(urls='stun:stun.l.google.com:19302'))
         return servers
     
-    def close_peers(self):
-        asyncio.gather(*[state.close() for state in self.state_map.values()])
+    def get_output_capture(self) -> Output | BufferedOutput | None:
+        if self.output_mode == 'none':
+            return None
+        elif self.output_mode == 'buffered':
+            if self.buffered_output is None:
+                self.buffered_output = BufferedOutput(self.output, maxsize=cast(int, self.output_buffer_size), interval=cast(float, self.output_flush_interval))
+            return self.buffered_output
+        else:
+            return self.output
+        
+    def send_overlay(self, overlay: Overlay, target_id: str = "") -> None:
+        """Send the overlay to the view of target_id, whose timestamps it matches, and to the viewers when they show the track of that view."""
+        if overlay.timestamp is None:
+            return
+        args, buffers = overlay.encode()
+        self.send_command("overlay", target_id, args, buffers=buffers)
+        if self.viewers:
+            processed = self.get_processed_track('video')
+            if processed is not None and processed.state_id == target_id:
+                for viewer in self.viewers:
+                    viewer.send_command("overlay", "", args, buffers=buffers)
+        
+    def add_viewer(self, viewer: AnyType) -> None:
+        """Forward the overlays to a WebCamViewer. Called by the viewer."""
+        if viewer not in self.viewers:
+            self.viewers = [*self.viewers, viewer]
+            
+    def remove_viewer(self, viewer: AnyType) -> None:
+        self.viewers = [v for v in self.viewers if v is not viewer]
+        
+    def get_processed_track(self, kind: str = 'video') -> MediaTransformTrack | None:
+        """Get the latest live transformed track of kind, which the viewers subscribe to, or None if not connected."""
+        with self.lock:
+            tracks = [track for state in self.state_map.values() for track in state.track_map.transformed if track.kind == kind and track.readyState == 'live']
+        return tracks[-1] if tracks else None
+    
+    async def wait_processed_track(self, kind: str = 'video', exclude: MediaTransformTrack | None = None) -> MediaTransformTrack:
+        """Wait for a live transformed track of kind other than exclude."""
+        while True:
+            track = self.get_processed_track(kind)
+            if track is not None and track is not exclude:
+                return track
+            waiter = asyncio.get_running_loop().create_future()
+            self._track_waiters.append(waiter)
+            try:
+                await waiter
+            finally:
+                if waiter in self._track_waiters:
+                    self._track_waiters.remove(waiter)
+                    
+    def notify_processed_track(self) -> None:
+        waiters, self._track_waiters = self._track_waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+        
+    def get_dropped_frames(self) -> int:
+        """Get the number of the stale frames dropped by all the video tracks. Only counted when drop_stale_frames is enabled.
+        """
+        with self.lock:
+            return sum(track.dropped_frames for state in self.state_map.values() for track in state.track_map.transformed)
+        
+    def get_peer_stats(self, id: str | None = None) -> dict[str, list[dict[str, AnyType]]]:
+        """Get the recent stats samples of each peer, or of the peer of the view id, oldest first.
+        
+        Each sample has the time, the fps, bitrate, jitter (seconds) and loss (0 - 1) of the camera stream received from the browser,
+        the fps and bitrate of the stream sent back, the rtt (seconds), the mean encode time (seconds) of the server, and the mean
+        decode time of the browser, the mean encode time of the browser and the displayed fps reported by the browser.
+        A field is None when not available. Compared with the latency of the transformers in get_pipeline_stats,
+        they tell whether a slowdown comes from the network, the codecs or the transformers.
+        """
+        with self.lock:
+            states = [state for state in self.state_map.values() if id is None or state.id == id]
+        return { state.id: state.stats.snapshot() for state in states if state.stats is not None }
+    
+    def get_peer_stats_arrays(self, id: str | None = None) -> dict[str, list[AnyType]]:
+        """Get the samples of get_peer_stats as a dict of columns with the peer id column, e.g. pandas.DataFrame(widget.get_peer_stats_arrays())."""
+        columns: dict[str, list[AnyType]] = { "peer": [], **{ name: [] for name in SAMPLE_FIELDS } }
+        for peer, samples in self.get_peer_stats(id).items():
+            for sample in samples:
+                columns["peer"].append(peer)
+                for name in SAMPLE_FIELDS:
+                    columns[name].append(sample.get(name))
+        return columns
+        
+    def get_quality_stats(self) -> list[dict[str, AnyType]]:
+        """Get the current level of the adaptive quality of each returned video track, with its scale, framerate and bitrate,
+        the last loss, rtt and remb, and the log of the level changes. Only available when adaptive_quality is enabled.
+        """
+        with self.lock:
+            return [track.controller.snapshot() for state in self.state_map.values() for track in state.track_map.outbound if track.controller is not None]
+        
+    def get_pacing_stats(self) -> list[dict[str, AnyType]]:
+        """Get the pacing stats of each video track, the frames dropped for exceeding pacing_delay, the number of the re-anchors,
+        and the pacing error in seconds. Only available when pacing is enabled.
+        """
+        with self.lock:
+            return [track.pacer.snapshot() for state in self.state_map.values() for track in state.track_map.transformed if track.pacer is not None]
+        
+    def get_unchanged_frames(self) -> tuple[int, float | None]:
+        """Get the number of the frames skipped by the change gate of all the video tracks, and its rate among the processed frames.
+        Only counted when change_threshold is set.
+        """
+        with self.lock:
+            tracks = [track for state in self.state_map.values() for track in state.track_map.transformed if track.kind == 'video']
+            unchanged = sum(track.unchanged_frames for track in tracks)
+            processed = sum(track.received_frames - track.dropped_frames for track in tracks)
+        return unchanged, unchanged / processed if processed > 0 else None
+        
+    def get_pipeline_stats(self) -> dict[str, AnyType]:
+        """Get the statistics of the transformers and posters of the widget.
+        
+        Returns:
+            dict[str, Any]: video_transformers, video_posters, audio_transformers and audio_posters are lists of dicts with
+            name, enabled, calls, exceptions, last_exception and the latency in seconds (mean, p50, p95, p99 and max).
+            dropped_frames is the number of the stale frames dropped, unchanged_frames and unchanged_rate are the frames skipped by the change gate,
+            and thread_pool and process_pool are the stats of the pools or None if not used.
+        """
+        def to_list(transformers: list[MediaTransformer]) -> list[dict[str, AnyType]]:
+            return [{ "name": t.name, "enabled": t.enabled, **t.stats.snapshot() } for t in transformers]
+        unchanged_frames, unchanged_rate = self.get_unchanged_frames()
+        return {
+            "video_transformers": to_list(self.video_transformers),
+            "video_posters": to_list(self.video_posters),
+            "audio_transformers": to_list(self.audio_transformers),
+            "audio_posters": to_list(self.audio_posters),
+            "dropped_frames": self.get_dropped_frames(),
+            "unchanged_frames": unchanged_frames,
+            "unchanged_rate": unchanged_rate,
+            "thread_pool": self.thread_pool.stats() if self.thread_pool is not None else None,
+            "process_pool": self.process_pool.stats() if self.process_pool is not None else None,
+        }
+        
+    def reset_pipeline_stats(self) -> None:
+        for transformer in self.video_transformers + self.video_posters + self.audio_transformers + self.audio_posters:
+            transformer.stats.reset()
+        if self.thread_pool is not None:
+            self.thread_pool.reset_stats()
+        if self.process_pool is not None:
+            self.process_pool.reset_stats()
+            
+    def format_pipeline_stats(self) -> str:
+        stats = self.get_pipeline_stats()
+        def ms(value: float | None) -> str:
+            return '-' if value is None else f'{value * 1000:.2f}'
+        rows: list[str] = []
+        for kind in ["video_transformers", "video_posters", "audio_transformers", "audio_posters"]:
+            for item in stats[kind]:
+                cells = [kind, html.escape(item["name"]), "yes" if item["enabled"] else "no", str(item["calls"]), str(item["exceptions"])]
+                cells += [ms(item[key]) for key in ["mean", "p50", "p95", "p99", "max"]]
+                rows.append("<tr>" + "".join(f"<td>{cell}</td>" for cell in cells) + "</tr>")
+        header = "".join(f"<th>{name}</th>" for name in ["kind", "name", "enabled", "calls", "exceptions", "mean(ms)", "p50(ms)", "p95(ms)", "p99(ms)", "max(ms)"])
+        footer = f"<p>dropped frames: {stats['dropped_frames']}"
+        if stats["unchanged_rate"] is not None and self.change_threshold is not None:
+            footer += f", unchanged frames: {stats['unchanged_frames']} ({stats['unchanged_rate']:.1%})"
+        if stats["thread_pool"] is not None:
+            footer += ", thread pool: " + ", ".join(f"{key} {value}" for key, value in stats["thread_pool"].items())
+        if stats["process_pool"] is not None:
+            footer += ", process pool: " + ", ".join(f"{key} {value}" for key, value in stats["process_pool"].items())
+        footer += "</p>"
+        return f"<table><tr>{header}</tr>{''.join(rows)}</table>{footer}"
+        
+    def create_stats_view(self, interval: float = 1.0) -> HTML:
+        """Create a widget showing the pipeline statistics, refreshed every interval seconds until it is closed.
+        """
+        view = HTML(value=self.format_pipeline_stats())
+        async def refresh() -> None:
+            while view.comm is not None:
+                await asyncio.sleep(interval)
+                view.value = self.format_pipeline_stats()
+        asyncio.ensure_future(refresh())
+        return view
+        
+    def close_peers(self) -> None:
+        """Close the peers of all the views in the background. Await aclose_peers to wait for it."""
+        run_in_background(self.aclose_peers())
+        
+    async def aclose_peers(self) -> None:
+        """Close the peers of all the views and wait for the teardown of their transformers. The views can connect again."""
+        await asyncio.gather(*[state.close() for state in list(self.state_map.values())])
+        
+    async def aclose(self) -> None:
+        """Close the widget, and wait until the states of the views, the peers of the viewers and the pools created by the widget are released."""
+        self._stop_sweeper()
+        await self.close_states()
+        await asyncio.gather(*[viewer.aclose_peers() for viewer in self.viewers])
+        waiters, self._track_waiters = self._track_waiters, []
+        for waiter in waiters:
+            waiter.cancel()
+        self.shutdown_pools()
+        if self.buffered_output is not None:
+            self.buffered_output.flush()
+        self.close()
+        
+    def close(self) -> None:
+        """Close the widget, the states are released in the background. Await aclose to wait for it."""
+        self._stop_sweeper()
+        self._release_states()
+        super().close()
         
     def _ipython_display_(self):
         display.display(super(), self.output)
             
     def __del__(self):
-        self.close_peers()
-        return super().__del__()
+        # called by the garbage collection at any time, even when __init__ failed.
+        # a task scheduled here would resurrect the widget, so the tracks are only stopped
+        try:
+            self._stop_sweeper()
+            self._stop_states()
+            super().close()
+        except Exception:
+            pass
@@ -5,3 +5,4 @@ import 'webrtc-adapter';
 export * from './version';
 export * from './webcam';
 export * from './recorder';
+export * from './viewer';
@@ -0,0 +1,253 @@
+// Copyright (c) Xiaojing Chen
+// Distributed under the terms of the Modified BSD License.
+
+export interface OverlayArgs {
+  timestamp: number;
+  width: number;
+  height: number;
+  boxes: { labels: Array<string | null>; colors: string[] };
+  polylines: { lengths: number[]; colors: string[]; closed: boolean[] };
+  texts: Array<{ x: number; y: number; text: string; color: string }>;
+}
+
+export interface OverlayData extends OverlayArgs {
+  boxCoords: Float32Array;
+  points: Float32Array;
+}
+
+function toFloat32Array(
+  buffer: ArrayBuffer | ArrayBufferView | undefined
+): Float32Array {
+  if (!buffer) {
+    return new Float32Array(0);
+  }
+  if (ArrayBuffer.isView(buffer)) {
+    // the views of the comm buffers may be not aligned to 4 bytes
+    const { byteOffset, byteLength } = buffer;
+    return new Float32Array(
+      buffer.buffer.slice(byteOffset, byteOffset + byteLength)
+    );
+  }
+  return new Float32Array(buffer);
+}
+
+export function decodeOverlay(
+  args: OverlayArgs,
+  buffers?: ArrayBuffer[] | ArrayBufferView[]
+): OverlayData {
+  return {
+    ...args,
+    boxCoords: toFloat32Array(buffers ? buffers[0] : undefined),
+    points: toFloat32Array(buffers ? buffers[1] : undefined),
+  };
+}
+
+const RTP_TIMESTAMP_MODULO = 0x100000000;
+const MAX_OVERLAYS = 64;
+// the overlays older than the frame by more than 2 seconds of the 90kHz clock are stale
+const MAX_OVERLAY_AGE = 180000;
+
+function rtpDiff(a: number, b: number): number {
+  const diff = (a - b) % RTP_TIMESTAMP_MODULO;
+  return diff < 0 ? diff + RTP_TIMESTAMP_MODULO : diff;
+}
+
+/**
+ * Keep the received overlays, and find the one of a displayed frame.
+ *
+ * The rtp timestamps of the frames are the pts of the overlays plus a random offset
+ * chosen by the sender. The offset is calibrated by the differences between the frames
+ * and the overlays which stay the same across the frames. Without rtp timestamps,
+ * e.g. when showing the local stream, the latest overlay is used.
+ */
+export class OverlayStore {
+  overlays: OverlayData[] = [];
+  offset: number | undefined;
+  private candidates: Set<number> | undefined;
+
+  push = (overlay: OverlayData): void => {
+    const overlays = this.overlays;
+    const last = overlays[overlays.length - 1];
+    if (last && overlay.timestamp < last.timestamp) {
+      // the sender is restarted, the offset changes
+      this.reset();
+    }
+    overlays.push(overlay);
+    if (overlays.length > MAX_OVERLAYS) {
+      overlays.splice(0, overlays.length - MAX_OVERLAYS);
+    }
+  };
+
+  reset = (): void => {
+    this.overlays = [];
+    this.offset = undefined;
+    this.candidates = undefined;
+  };
+
+  latest = (): OverlayData | undefined => {
+    return this.overlays[this.overlays.length - 1];
+  };
+
+  private calibrate = (rtpTimestamp: number): void => {
+    const diffs = new Set(
+      this.overlays.map((overlay) => rtpDiff(rtpTimestamp, overlay.timestamp))
+    );
+    if (diffs.size === 0) {
+      return;
+    }
+    if (!this.candidates) {
+      this.candidates = diffs;
+      return;
+    }
+    const candidates = new Set<number>();
+    this.candidates.forEach((diff) => {
+      if (diffs.has(diff)) {
+        candidates.add(diff);
+      }
+    });
+    if (candidates.size === 1) {
+      candidates.forEach((diff) => {
+        this.offset = diff;
+      });
+      this.candidates = undefined;
+    } else {
+      // nothing in common means the frames and the overlays are too far apart, start again
+      this.candidates = candidates.size > 0 ? candidates : diffs;
+    }
+  };
+
+  find = (rtpTimestamp?: number): OverlayData | undefined => {
+    if (typeof rtpTimestamp !== 'number') {
+      return this.latest();
+    }
+    if (this.offset === undefined) {
+      this.calibrate(rtpTimestamp);
+      if (this.offset === undefined) {
+        return undefined;
+      }
+    }
+    const pts = rtpDiff(rtpTimestamp, this.offset);
+    // the overlay of the frame, or the last one before it, which is kept until replaced
+    let found: OverlayData | undefined;
+    for (const overlay of this.overlays) {
+      const age = rtpDiff(pts, overlay.timestamp);
+      if (age < MAX_OVERLAY_AGE) {
+        found = overlay;
+      }
+    }
+    return found;
+  };
+}
+
+export function drawOverlay(
+  canvas: HTMLCanvasElement,
+  video: HTMLVideoElement,
+  overlay: OverlayData | undefined
+): void {
+  const width = video.clientWidth;
+  const height = video.clientHeight;
+  if (canvas.width !== width || canvas.height !== height) {
+    canvas.width = width;
+    canvas.height = height;
+  }
+  const ctx = canvas.getContext('2d');
+  if (!ctx) {
+    return;
+  }
+  ctx.clearRect(0, 0, width, height);
+  if (!overlay || !overlay.width || !overlay.height) {
+    return;
+  }
+  // the video is letterboxed in its element
+  const scale = Math.min(width / overlay.width, height / overlay.height);
+  const dx = (width - overlay.width * scale) / 2;
+  const dy = (height - overlay.height * scale) / 2;
+  const x = (v: number) => dx + v * scale;
+  const y = (v: number) => dy + v * scale;
+  ctx.lineWidth = 2;
+  ctx.font = '12px sans-serif';
+  ctx.textBaseline = 'bottom';
+  const { boxCoords, points } = overlay;
+  overlay.boxes.labels.forEach((label, i) => {
+    const color = overlay.boxes.colors[i];
+    ctx.strokeStyle = color;
+    ctx.fillStyle = color;
+    const bx = x(boxCoords[i * 4]);
+    const by = y(boxCoords[i * 4 + 1]);
+    const bw = boxCoords[i * 4 + 2] * scale;
+    const bh = boxCoords[i * 4 + 3] * scale;
+    ctx.strokeRect(bx, by, bw, bh);
+    if (label) {
+      ctx.fillText(label, bx, by);
+    }
+  });
+  let offset = 0;
+  overlay.polylines.lengths.forEach((n, i) => {
+    ctx.strokeStyle = overlay.polylines.colors[i];
+    ctx.beginPath();
+    for (let j = 0; j < n; ++j) {
+      const px = x(points[(offset + j) * 2]);
+      const py = y(points[(offset + j) * 2 + 1]);
+      if (j === 0) {
+        ctx.moveTo(px, py);
+      } else {
+        ctx.lineTo(px, py);
+      }
+    }
+    if (overlay.polylines.closed[i]) {
+      ctx.closePath();
+    }
+    ctx.stroke();
+    offset += n;
+  });
+  overlay.texts.forEach(({ x: tx, y: ty, text, color }) => {
+    ctx.fillStyle = color;
+    ctx.fillText(text, x(tx), y(ty));
+  });
+}
+
+/**
+ * Redraw the overlay of each displayed frame.
+ *
+ * requestVideoFrameCallback gives the rtp timestamp of the frame when supported,
+ * otherwise the latest overlay is drawn on every animation frame.
+ */
+export function startOverlayLoop(
+  canvas: HTMLCanvasElement,
+  video: HTMLVideoElement,
+  store: () => OverlayStore
+): () => void {
+  let stopped = false;
+  const anyVideo = video as any;
+  if (typeof anyVideo.requestVideoFrameCallback === 'function') {
+    let handle: number | undefined;
+    const onFrame = (_now: number, metadata: any) => {
+      if (stopped) {
+        return;
+      }
+      drawOverlay(canvas, video, store().find(metadata.rtpTimestamp));
+      handle = anyVideo.requestVideoFrameCallback(onFrame);
+    };
+    handle = anyVideo.requestVideoFrameCallback(onFrame);
+    return () => {
+      stopped = true;
+      if (handle !== undefined) {
+        anyVideo.cancelVideoFrameCallback(handle);
+      }
+    };
+  } else {
+    let handle = 0;
+    const onFrame = () => {
+      if (stopped) {
+        return;
+      }
+      drawOverlay(canvas, video, store().find());
+      handle = window.requestAnimationFrame(onFrame);
+    };
+    handle = window.requestAnimationFrame(onFrame);
+    return () => {
+      stopped = true;
+      window.cancelAnimationFrame(handle);
+    };
+  }
+}
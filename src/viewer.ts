@@ -0,0 +1,222 @@
+// Copyright (c) Xiaojing Chen
+// Distributed under the terms of the Modified BSD License.
+
+import { DOMWidgetModel, DOMWidgetView } from '@jupyter-widgets/base';
+import Backbone from 'backbone';
+
+import { BaseModel } from './common';
+import {
+  createPeerConnection,
+  isLocalNetwork,
+  negotiate,
+  waitForConnectionState,
+} from './webrtc';
+import {
+  OverlayArgs,
+  OverlayStore,
+  decodeOverlay,
+  startOverlayLoop,
+} from './overlay';
+
+type ViewerMsgTypeMap = {
+  overlay: OverlayArgs;
+};
+
+/**
+ * A receive only peer showing the processed video of a webcam widget.
+ *
+ * The peer is shared by all the views of the model, and created again when it fails.
+ */
+export class WebCamViewerModel extends BaseModel<ViewerMsgTypeMap> {
+  static model_name = 'WebCamViewerModel';
+  static view_name = 'WebCamViewerView'; // Set to null if no view
+
+  static serializers = {
+    ...DOMWidgetModel.serializers,
+  };
+
+  pc: RTCPeerConnection | undefined;
+  stream: MediaStream | undefined;
+  overlays = new OverlayStore();
+  private connecting: Promise<MediaStream | undefined> | undefined;
+  private viewCount = 0;
+
+  defaults(): Backbone.ObjectHash {
+    return {
+      ...super.defaults(),
+      _model_name: WebCamViewerModel.model_name,
+      _view_name: WebCamViewerModel.view_name,
+      iceServers: [],
+      ice_mode: 'auto',
+      autoplay: true,
+      controls: true,
+      width: null,
+      height: null,
+      playsInline: true,
+      muted: true,
+    };
+  }
+
+  // eslint-disable-next-line @typescript-eslint/explicit-module-boundary-types
+  constructor(...args: any[]) {
+    super(...args);
+    this.addMessageHandler('overlay', (cmdMsg, buffers) => {
+      this.overlays.push(decodeOverlay(cmdMsg.args, buffers));
+    });
+  }
+
+  isHostOnly = (): boolean => {
+    const mode = this.get('ice_mode');
+    const iceServers: any[] = this.get('iceServers');
+    return (
+      mode === 'host' ||
+      (mode === 'auto' &&
+        !(iceServers && iceServers.length > 0) &&
+        isLocalNetwork())
+    );
+  };
+
+  getPeerConfig = (): RTCConfiguration => {
+    if (this.isHostOnly()) {
+      return { iceServers: [] };
+    }
+    const iceServers: any[] = this.get('iceServers');
+    if (iceServers && iceServers.length > 0) {
+      return {
+        iceServers: iceServers.map((server) =>
+          typeof server === 'string' ? { urls: server } : server
+        ),
+      };
+    }
+    return {};
+  };
+
+  resetPeer = (pc: RTCPeerConnection): void => {
+    pc.close();
+    if (this.pc === pc) {
+      this.pc = undefined;
+      this.stream = undefined;
+      this.overlays.reset();
+    }
+  };
+
+  addView = (): void => {
+    this.viewCount += 1;
+  };
+
+  /**
+   * Close the peer when the last view is removed, the next view connects again.
+   */
+  removeView = (): void => {
+    this.viewCount -= 1;
+    if (this.viewCount <= 0 && this.pc) {
+      this.resetPeer(this.pc);
+    }
+  };
+
+  connect = (): Promise<MediaStream | undefined> => {
+    if (this.pc && this.stream) {
+      return Promise.resolve(this.stream);
+    }
+    if (!this.connecting) {
+      this.connecting = this.doConnect().finally(() => {
+        this.connecting = undefined;
+      });
+    }
+    return this.connecting;
+  };
+
+  private doConnect = async (): Promise<MediaStream | undefined> => {
+    const pc = createPeerConnection(this.getPeerConfig());
+    this.pc = pc;
+    try {
+      pc.addTransceiver('video', { direction: 'recvonly' });
+      const streamPromise = new Promise<MediaStream>((resolve) => {
+        pc.addEventListener('track', (evt) => {
+          resolve(evt.streams[0] || new MediaStream([evt.track]));
+        });
+      });
+      pc.addEventListener('connectionstatechange', () => {
+        const state = pc.connectionState;
+        if (state === 'failed' || state === 'closed') {
+          this.resetPeer(pc);
+        }
+      });
+      await negotiate(pc, async (offer) => {
+        const { content } = await this.send_cmd('exchange_peer', {
+          desc: offer,
+          host_only: this.isHostOnly(),
+        });
+        return content;
+      });
+      const pcState = await waitForConnectionState(
+        pc,
+        (state) => state !== 'connecting' && state !== 'new'
+      );
+      if (pcState !== 'connected') {
+        this.resetPeer(pc);
+        return undefined;
+      }
+      this.stream = await streamPromise;
+      return this.stream;
+    } catch (err) {
+      this.resetPeer(pc);
+      console.error(err);
+      return undefined;
+    }
+  };
+}
+
+export class WebCamViewerView extends DOMWidgetView {
+  stopOverlay: (() => void) | undefined;
+
+  render(): any {
+    const model = this.model as WebCamViewerModel;
+    const video = document.createElement('video');
+    this.el.classList.add('ipywebcam-webcam');
+    this.el.appendChild(video);
+    const canvas = document.createElement('canvas');
+    canvas.classList.add('ipywebcam-overlay');
+    this.el.appendChild(canvas);
+    this.stopOverlay = startOverlayLoop(canvas, video, () => model.overlays);
+    model.addView();
+    model.connect().then((stream) => {
+      if (stream) {
+        video.srcObject = stream;
+      }
+    });
+    const syncAttributes = () => {
+      video.autoplay = model.get('autoplay');
+      video.controls = model.get('controls');
+      video.playsInline = model.get('playsInline');
+      video.muted = model.get('muted');
+      const width = model.get('width');
+      if (width) {
+        video.width = width;
+      } else {
+        video.removeAttribute('width');
+      }
+      const height = model.get('height');
+      if (height) {
+        video.height = height;
+      } else {
+        video.removeAttribute('height');
+      }
+    };
+    syncAttributes();
+    this.listenTo(
+      model,
+      'change:autoplay change:controls change:playsInline change:muted change:width change:height',
+      syncAttributes
+    );
+  }
+
+  remove(): any {
+    if (this.stopOverlay) {
+      this.stopOverlay();
+      this.stopOverlay = undefined;
+    }
+    (this.model as WebCamViewerModel).removeView();
+    return super.remove();
+  }
+}
@@ -11,11 +11,18 @@ import Backbone from 'backbone';
 import { BaseModel } from './common';
 import {
   createPeerConnection,
+  isLocalNetwork,
   negotiate,
   waitForConnectionState,
 } from './webrtc';
 import * as OWT from './owt';
 import { arrayInclude } from './utils';
+import {
+  OverlayArgs,
+  OverlayStore,
+  decodeOverlay,
+  startOverlayLoop,
+} from './overlay';
 
 // Import the CSS
 import '../css/widget.css';
@@ -49,11 +56,13 @@ interface NotifyDeviceChangeArgs {
 type WebCamMsgTypeMap = {
   request_devices: RequestDevicesArgs;
   notify_device_change: NotifyDeviceChangeArgs;
+  overlay: OverlayArgs;
 };
 
 export class WebCamModel extends BaseModel<WebCamMsgTypeMap> {
   videoInput?: string;
   audioInput?: string;
+  overlays = new OverlayStore();
 
   defaults(): Backbone.ObjectHash {
     return {
@@ -75,6 +84,9 @@ export class WebCamModel extends BaseModel<WebCamMsgTypeMap> {
       height: null,
       playsInline: true,
       muted: false,
+      receive_only: false,
+      ice_mode: 'auto',
+      stats_interval: 1.0,
     };
   }
 
@@ -97,6 +109,12 @@ export class WebCamModel extends BaseModel<WebCamMsgTypeMap> {
     this.on('change:iceServers', () => {
       this.connect(undefined, true, true);
     });
+    this.on('change:ice_mode', () => {
+      this.connect(undefined, true, true);
+    });
+    this.on('change:receive_only', () => {
+      this.connect(undefined, true, true);
+    });
     this.addMessageHandler('request_devices', (cmdMsg) => {
       const { cmd, id, args } = cmdMsg;
       const { type } = args;
@@ -105,18 +123,21 @@ export class WebCamModel extends BaseModel<WebCamMsgTypeMap> {
         this.send({ ans: cmd, id, res: devices }, {});
       });
     });
+    this.addMessageHandler('overlay', (cmdMsg, buffers) => {
+      this.overlays.push(decodeOverlay(cmdMsg.args, buffers));
+    });
     this.addMessageHandler('notify_device_change', (cmdMsg) => {
       const { args } = cmdMsg;
       const { type, change } = args;
       if (type === 'video_input') {
         if (this.videoInput !== change.new) {
           this.videoInput = change.new;
-          this.connect(undefined, true, true);
+          this.switchDevice(type);
         }
       } else if (type === 'audio_input') {
         if (this.audioInput !== change.new) {
           this.audioInput = change.new;
-          this.connect(undefined, true, true);
+          this.switchDevice(type);
         }
       }
     });
@@ -152,10 +173,92 @@ export class WebCamModel extends BaseModel<WebCamMsgTypeMap> {
   conference: OWT.Conference.ConferenceClient | undefined;
   conferenceInfo: OWT.Conference.ConferenceInfo | undefined;
 
+  private statsTimer: number | undefined;
+  private viewCount = 0;
+
+  /**
+   * Report the decode time of the returned video, the encode time of the camera,
+   * the displayed fps and the sent bitrate to the server every stats_interval seconds.
+   */
+  startClientStats = (pc: RTCPeerConnection): void => {
+    this.stopClientStats();
+    const interval: number | null = this.get('stats_interval');
+    if (!interval) {
+      return;
+    }
+    let last: Record<string, number> | undefined;
+    this.statsTimer = window.setInterval(async () => {
+      if (this.pc !== pc || pc.connectionState === 'closed') {
+        this.stopClientStats();
+        return;
+      }
+      const report = await pc.getStats();
+      const current: Record<string, number> = {
+        time: performance.now(),
+        decodeTime: 0,
+        decoded: 0,
+        encodeTime: 0,
+        encoded: 0,
+        bytesSent: 0,
+        fps: -1,
+      };
+      report.forEach((stats: any) => {
+        if (stats.kind !== 'video' && stats.mediaType !== 'video') {
+          return;
+        }
+        if (stats.type === 'inbound-rtp') {
+          current.decodeTime += stats.totalDecodeTime || 0;
+          current.decoded += stats.framesDecoded || 0;
+          if (typeof stats.framesPerSecond === 'number') {
+            current.fps = stats.framesPerSecond;
+          }
+        } else if (stats.type === 'outbound-rtp') {
+          current.encodeTime += stats.totalEncodeTime || 0;
+          current.encoded += stats.framesEncoded || 0;
+          current.bytesSent += stats.bytesSent || 0;
+        }
+      });
+      if (last) {
+        const seconds = (current.time - last.time) / 1000;
+        const decoded = current.decoded - last.decoded;
+        const encoded = current.encoded - last.encoded;
+        this.send_cmd(
+          'client_stats',
+          {
+            decode_time:
+              decoded > 0
+                ? (current.decodeTime - last.decodeTime) / decoded
+                : null,
+            encode_time:
+              encoded > 0
+                ? (current.encodeTime - last.encodeTime) / encoded
+                : null,
+            fps: current.fps >= 0 ? current.fps : null,
+            bitrate:
+              seconds > 0
+                ? ((current.bytesSent - last.bytesSent) * 8) / seconds
+                : null,
+          },
+          false
+        );
+      }
+      last = current;
+    }, interval * 1000);
+  };
+
+  stopClientStats = (): void => {
+    if (this.statsTimer !== undefined) {
+      window.clearInterval(this.statsTimer);
+      this.statsTimer = undefined;
+    }
+  };
+
   resetPeer = (): void => {
+    this.stopClientStats();
     this.pc = undefined;
     this.client_stream = undefined;
     this.server_stream = undefined;
+    this.overlays.reset();
   };
 
   waitForStateWhen = async (
@@ -255,6 +358,26 @@ export class WebCamModel extends BaseModel<WebCamMsgTypeMap> {
     }
   };
 
+  addView = (): void => {
+    this.viewCount += 1;
+  };
+
+  /**
+   * Close the peer and stop the camera when the last view is removed.
+   * The kernel releases its state at the same time, and the next view connects again.
+   */
+  removeView = async (): Promise<void> => {
+    this.viewCount -= 1;
+    if (this.viewCount > 0 || this.getState() === 'new') {
+      return;
+    }
+    const stream = this.client_stream;
+    await this.closePeer();
+    if (stream) {
+      stream.getTracks().forEach((track) => track.stop());
+    }
+  };
+
   fetchCodecs = (): void => {
     const codecs = this.getCodecs();
     this.set('video_codecs', codecs);
@@ -280,8 +403,23 @@ export class WebCamModel extends BaseModel<WebCamMsgTypeMap> {
     }
   };
 
+  isHostOnly = (): boolean => {
+    const mode = this.get('ice_mode');
+    const iceServers: any[] = this.get('iceServers');
+    return (
+      mode === 'host' ||
+      (mode === 'auto' &&
+        !(iceServers && iceServers.length > 0) &&
+        isLocalNetwork())
+    );
+  };
+
   getPeerConfig = (): RTCConfiguration => {
     const config: RTCConfiguration = {};
+    if (this.isHostOnly()) {
+      config.iceServers = [];
+      return config;
+    }
     const iceServers: any[] = this.get('iceServers');
     if (iceServers && iceServers.length > 0) {
       config.iceServers = iceServers.map((server) => {
@@ -385,22 +523,41 @@ export class WebCamModel extends BaseModel<WebCamMsgTypeMap> {
             this.getConstraints()
           );
           this.client_stream = stream;
+          const receiveOnly: boolean = this.get('receive_only');
           stream.getTracks().forEach((track) => {
             this.syncDevice(track);
-            pc.addTrack(track, stream);
-          });
-          await negotiate(pc, async (offer) => {
-            console.log(offer);
-            const { content } = await this.send_cmd('exchange_peer', {
-              desc: offer,
-            });
-            return content;
+            if (receiveOnly) {
+              // the server does not send anything back
+              pc.addTransceiver(track, {
+                direction: 'sendonly',
+                streams: [stream],
+              });
+            } else {
+              pc.addTrack(track, stream);
+            }
           });
+          this.bindVideo(video);
+          await negotiate(
+            pc,
+            async (offer) => {
+              console.log(offer);
+              const { content } = await this.send_cmd('exchange_peer', {
+                desc: offer,
+                host_only: this.isHostOnly(),
+              });
+              return content;
+            },
+            undefined,
+            (candidate) => {
+              this.send_cmd('ice_candidate', { candidate }, false);
+            }
+          );
           const pcState = await waitForConnectionState(
             pc,
             (state) => state !== 'connecting' && state !== 'new'
           );
           if (pcState === 'connected') {
+            this.startClientStats(pc);
             this.setState('connected');
           } else {
             await this.closePeer();
@@ -418,9 +575,90 @@ export class WebCamModel extends BaseModel<WebCamMsgTypeMap> {
     }
   };
 
+  /**
+   * Switch the camera or the microphone on the connected peer.
+   *
+   * The track of the sender is replaced, so the server keeps receiving on the same transceiver
+   * and reuses its transformed tracks. A track of a new kind is added by renegotiating the same peer.
+   * Only when the peer is not connected, it is connected again.
+   */
+  switchDevice = async (type: DeviceType): Promise<void> => {
+    const pc = this.pc;
+    const stream = this.client_stream;
+    if (
+      !pc ||
+      !stream ||
+      this.conference ||
+      this.getState() !== 'connected' ||
+      pc.connectionState !== 'connected'
+    ) {
+      await this.connect(undefined, true, true);
+      return;
+    }
+    const kind = type === 'video_input' ? 'video' : 'audio';
+    const constraints = this.getConstraints();
+    if (!constraints[kind]) {
+      return;
+    }
+    try {
+      const newStream = await navigator.mediaDevices.getUserMedia(
+        kind === 'video'
+          ? { video: constraints.video }
+          : { audio: constraints.audio }
+      );
+      const [track] =
+        kind === 'video'
+          ? newStream.getVideoTracks()
+          : newStream.getAudioTracks();
+      const oldTracks =
+        kind === 'video' ? stream.getVideoTracks() : stream.getAudioTracks();
+      const sender = pc
+        .getSenders()
+        .find((sender) => sender.track && sender.track.kind === kind);
+      if (sender) {
+        await sender.replaceTrack(track);
+      } else if (this.get('receive_only')) {
+        pc.addTransceiver(track, { direction: 'sendonly', streams: [stream] });
+      } else {
+        pc.addTrack(track, stream);
+      }
+      oldTracks.forEach((oldTrack) => {
+        stream.removeTrack(oldTrack);
+        oldTrack.stop();
+      });
+      stream.addTrack(track);
+      this.syncDevice(track);
+      if (!sender) {
+        await negotiate(pc, async (offer) => {
+          const { content } = await this.send_cmd('exchange_peer', {
+            desc: offer,
+            renegotiate: true,
+          });
+          return content;
+        });
+      }
+      this.trigger('client_stream_changed');
+    } catch (err) {
+      console.error(err);
+      await this.connect(undefined, true, true);
+    }
+  };
+
   bindVideo = (video: HTMLVideoElement | undefined): void => {
     const pc = this.pc;
     const conference = this.conference;
+    if (pc && video && this.get('receive_only')) {
+      // show the local camera, without its audio to avoid the echo
+      const stream = this.client_stream;
+      const current = video.srcObject as MediaStream | null;
+      if (
+        stream &&
+        (!current || current.getVideoTracks()[0] !== stream.getVideoTracks()[0])
+      ) {
+        video.srcObject = new MediaStream(stream.getVideoTracks());
+      }
+      return;
+    }
     if (!pc || !video || !conference) {
       return;
     }
@@ -452,12 +690,26 @@ async function attachSinkId(element: HTMLMediaElement, sinkId: string) {
 
 export class WebCamView extends DOMWidgetView {
   pc: RTCPeerConnection | undefined;
+  stopOverlay: (() => void) | undefined;
 
   render(): any {
     const video = document.createElement('video');
     video.playsInline = true;
+    this.el.classList.add('ipywebcam-webcam');
     this.el.appendChild(video);
+    const canvas = document.createElement('canvas');
+    canvas.classList.add('ipywebcam-overlay');
+    this.el.appendChild(canvas);
+    this.stopOverlay = startOverlayLoop(
+      canvas,
+      video,
+      () => (this.model as WebCamModel).overlays
+    );
+    (this.model as WebCamModel).addView();
     (this.model as WebCamModel).connect(video);
+    this.listenTo(this.model, 'client_stream_changed', () => {
+      (this.model as WebCamModel).bindVideo(video);
+    });
     this.model.on('change:state', () => {
       const model = this.model as WebCamModel;
       if (model.getState() === 'connected') {
@@ -525,4 +777,13 @@ export class WebCamView extends DOMWidgetView {
       }
     });
   }
+
+  remove(): any {
+    if (this.stopOverlay) {
+      this.stopOverlay();
+      this.stopOverlay = undefined;
+    }
+    (this.model as WebCamModel).removeView();
+    return super.remove();
+  }
 }
@@ -21,6 +21,30 @@ const DEFAULT_ICE_SERVERS: RTCIceServer[] = [
   { urls: ['stun:stun.xten.com'] },
 ];
 
+/**
+ * Whether the page is served from a loopback or private address,
+ * where the host candidates are enough and the stun servers only delay the connection.
+ */
+export function isLocalNetwork(hostname = window.location.hostname): boolean {
+  const host = hostname.replace(/^\[|\]$/g, '');
+  if (host === 'localhost' || host === '::1' || host.endsWith('.local')) {
+    return true;
+  }
+  const match = host.match(/^(\d+)\.(\d+)\.\d+\.\d+$/);
+  if (!match) {
+    return false;
+  }
+  const a = parseInt(match[1]);
+  const b = parseInt(match[2]);
+  return (
+    a === 127 ||
+    a === 10 ||
+    (a === 172 && b >= 16 && b <= 31) ||
+    (a === 192 && b === 168) ||
+    (a === 169 && b === 254)
+  );
+}
+
 export function createPeerConnection(
   config: RTCConfiguration
 ): RTCPeerConnection {
@@ -106,11 +130,30 @@ export async function negotiate(
   answerFunc: (
     offer: RTCSessionDescriptionInit
   ) => Promise<RTCSessionDescriptionInit>,
-  codec?: { video?: string; audio?: string }
+  codec?: { video?: string; audio?: string },
+  sendCandidate?: (candidate: RTCIceCandidateInit | null) => void
 ): Promise<void> {
+  // with sendCandidate, the offer is sent at once and the candidates follow it as they are gathered
+  let pending: Array<RTCIceCandidateInit | null> | undefined = [];
+  const onCandidate = (evt: RTCPeerConnectionIceEvent) => {
+    const candidate = evt.candidate ? evt.candidate.toJSON() : null;
+    if (pending) {
+      pending.push(candidate);
+    } else if (sendCandidate) {
+      sendCandidate(candidate);
+    }
+    if (!evt.candidate) {
+      pc.removeEventListener('icecandidate', onCandidate);
+    }
+  };
+  if (sendCandidate) {
+    pc.addEventListener('icecandidate', onCandidate);
+  }
   let offer = await pc.createOffer();
   await pc.setLocalDescription(offer);
-  await waitIceGathering(pc);
+  if (!sendCandidate) {
+    await waitIceGathering(pc);
+  }
   offer = pc.localDescription!;
   if (codec) {
     if (codec.audio && codec.audio !== 'default') {
@@ -120,8 +163,14 @@ export async function negotiate(
       offer.sdp = sdpFilterCodec('video', codec.video, offer.sdp!);
     }
   }
-  const answer = await answerFunc(offer);
-  await pc.setRemoteDescription(answer);
+  // the offer is sent synchronously by answerFunc, so the queued candidates are sent after it
+  const answer = answerFunc(offer);
+  if (sendCandidate && pending) {
+    const queued = pending;
+    pending = undefined;
+    queued.forEach((candidate) => sendCandidate(candidate));
+  }
+  await pc.setRemoteDescription(await answer);
 }
 
 function sdpFilterCodec(kind: MediaKind, codec: string, realSdp: string) {
@@ -1,2 +1,3 @@
 export { WebCamModel, WebCamView } from './webcam';
 export { RecorderPlayerModel, RecorderPlayerView } from './recorder';
+export { WebCamViewerModel, WebCamViewerView } from './viewer';